@@ -0,0 +1,282 @@
+"""End-to-end upload benchmark on synthetic AirTable and Converted exports
+
+Generates exports of each size, then runs every upload path (serial,
+--workers, --concurrency) on a fresh collection and reports records/sec,
+peak RSS, MongoDB round trips and the per-stage seconds of the run report.
+Each run is a separate process, so peak RSS is that run's own. Results are
+written to a JSON file; pass a previous one with --compare to see the
+change in records/sec.
+
+Usage:
+    python "Mongo Upload/benchmarks/bench_upload.py" --records 1k,10k,100k --duplicate-ratio 0.1
+    python "Mongo Upload/benchmarks/bench_upload.py" --uri mongodb://localhost:27017 --output after.json \\
+        --compare before.json
+
+Without --uri the runs use mongomock, which sends no commands and slows
+down quadratically with the collection, so it only checks that the paths
+work: sizes default to MOCK_RECORDS, the dedup indexes are left out (its
+unique index check dominates otherwise) and the records/sec measure
+mongomock rather than the pipeline. The mongod runs write to the
+smart_ingest_bench database, never to the directory's.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+import pymongo
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from smart_ingest.aio import ThreadedCollection
+from smart_ingest.bulk import DEFAULT_BATCH_SIZE
+from smart_ingest.indexes import ensure_dedup_indexes
+from smart_ingest.metrics import METRICS, install_command_listener
+from smart_ingest.pipeline import upload
+from smart_ingest.sources import expand_sources
+from synthetic import iter_airtable_records, iter_converted_tools, write_airtable_file, write_converted_file
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DATABASE = 'smart_ingest_bench'
+BENCH_COLLECTION = 'tools'
+DEFAULT_OUTPUT = 'bench_results.json'
+FORMATS = {
+    'airtable': (iter_airtable_records, write_airtable_file),
+    'converted': (iter_converted_tools, write_converted_file)
+}
+PATHS = ('serial', 'workers', 'concurrency')
+DEFAULT_RECORDS = '1k,10k,100k'
+MOCK_RECORDS = '1k,2k'
+MOCK_NOTE = "mongomock backend: records/sec are not meaningful, pass --uri mongodb://... to measure"
+SUFFIXES = {'k': 1000, 'm': 1000000}
+
+
+def parse_count(value):
+    """Read a record count such as 5000, 10k or 1m"""
+    value = value.strip().lower()
+    multiplier = SUFFIXES.get(value[-1:], 1)
+    return int(value.rstrip('km')) * multiplier
+
+
+def parse_list(value, parse=str):
+    return [parse(item) for item in value.split(',') if item.strip()]
+
+
+def generate_files(directory, source_format, count, files, duplicate_ratio, seed):
+    """Write count synthetic records split over files, returning their paths"""
+    iter_records, write_file = FORMATS[source_format]
+    records = iter_records(count, seed, duplicate_ratio)
+    paths = []
+    per_file = -(-count // files)
+    for number in range(files):
+        path = Path(directory) / f"{source_format}_{count}_{number}.json"
+        write_file(path, islice(records, per_file))
+        paths.append(str(path))
+    return paths
+
+
+def peak_rss_mb(who):
+    """Peak resident set size in MiB, or None where the resource module is missing"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def open_collection(uri):
+    if uri is None:
+        import mongomock
+        return mongomock.MongoClient()
+    # Lets the --concurrency path's async client find the same server
+    os.environ['MONGODB_URI'] = uri
+    return pymongo.MongoClient(uri)
+
+
+def run_case(uri, paths, path, options, work_dir, verbose, connection):
+    """Upload the files on a fresh collection and send back the measurements (runs in its own process)"""
+    install_command_listener()
+    client = open_collection(uri)
+    collection = client[BENCH_DATABASE][BENCH_COLLECTION]
+    collection.drop()
+    METRICS.reset()
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    if uri is not None:
+        with output:
+            # As in a deployment that ran the indexes command; uploads don't create them
+            ensure_dedup_indexes(collection)
+    started = time.perf_counter()
+    with output:
+        stats = upload(collection, expand_sources(paths), confirm=True, batch_size=options['batch_size'],
+                       workers=options['workers'] if path == 'workers' else 1,
+                       concurrency=options['concurrency'] if path == 'concurrency' else None,
+                       async_collection=ThreadedCollection(collection) if uri is None else None,
+                       resume=False, manifest_path=Path(work_dir) / 'manifest.json',
+                       signatures_path=Path(work_dir) / 'signatures.json.gz',
+                       near_duplicates=options['near_duplicates'])
+    elapsed = time.perf_counter() - started
+
+    report = METRICS.report()
+    connection.send({
+        'seconds': round(elapsed, 3),
+        'records_per_second': round(stats['total_processed'] / elapsed, 1),
+        'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+        'worker_peak_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+        'round_trips': report['mongo']['round_trips'] if uri else None,
+        'write_batches': report['stages'].get('write', {}).get('count', 0),
+        'processed': stats['total_processed'],
+        'new': stats['total_new'],
+        'skipped': stats['total_skipped'],
+        'failed': stats['total_failed'],
+        'near_duplicates': stats['total_near_duplicates'],
+        'stages': {stage: data['seconds'] for stage, data in report['stages'].items()}
+    })
+    collection.drop()
+    client.close()
+
+
+def run_isolated(*args):
+    """run_case in a fresh process, so its peak RSS isn't inflated by earlier runs"""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=run_case, args=(*args, sender))
+    process.start()
+    sender.close()
+    try:
+        return receiver.recv()
+    except EOFError:
+        raise RuntimeError(f"Benchmark run failed (exit code {process.exitcode})") from None
+    finally:
+        process.join()
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(result):
+    return result['format'], result['records'], result['duplicate_ratio'], result['path']
+
+
+def print_comparison(baseline, results):
+    """Print the records/sec of each run next to the same run in a previous results file"""
+    previous = {case_key(result): result for result in baseline['results']}
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for result in results:
+        before = previous.get(case_key(result))
+        label = f"{result['format']:<10} {result['records']:>8} {result['path']:<12}"
+        if before is None:
+            print(f"{label} (not in baseline)")
+            continue
+        change = result['records_per_second'] / before['records_per_second'] - 1
+        print(f"{label} {before['records_per_second']:>10,.0f} -> {result['records_per_second']:>10,.0f} "
+              f"records/sec ({change:+.1%})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the upload paths on synthetic exports")
+    parser.add_argument("--records", type=lambda value: parse_list(value, parse_count),
+                        help=f"Comma-separated record counts, e.g. 1k,10k,100k,1m "
+                             f"(default: {DEFAULT_RECORDS} with --uri, {MOCK_RECORDS} on mongomock)")
+    parser.add_argument("--formats", type=parse_list, default="airtable,converted",
+                        help="Comma-separated formats (default: %(default)s)")
+    parser.add_argument("--paths", type=parse_list, default=",".join(PATHS),
+                        help="Comma-separated upload paths (default: %(default)s)")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1,
+                        help="Share of records repeating an earlier tool (default: %(default)s)")
+    parser.add_argument("--files", type=int, default=4, help="Files per export (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=4, help="Workers for the workers path")
+    parser.add_argument("--concurrency", type=int, default=4, help="Writes in flight for the concurrency path")
+    parser.add_argument("--no-near-duplicates", action="store_true", help="Skip the description similarity check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--uri", help="Benchmark against this mongod instead of mongomock")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Results file (default: %(default)s)")
+    parser.add_argument("--compare", metavar="RESULTS", help="Previous results file to compare with")
+    parser.add_argument("--verbose", action="store_true", help="Show the upload output")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for name in args.formats:
+        if name not in FORMATS:
+            raise SystemExit(f"Unknown format '{name}', expected one of: {', '.join(FORMATS)}")
+    for name in args.paths:
+        if name not in PATHS:
+            raise SystemExit(f"Unknown path '{name}', expected one of: {', '.join(PATHS)}")
+    if args.records is None:
+        args.records = parse_list(DEFAULT_RECORDS if args.uri else MOCK_RECORDS, parse_count)
+    if args.uri is None:
+        print(MOCK_NOTE)
+    options = {
+        'batch_size': args.batch_size,
+        'workers': args.workers,
+        'concurrency': args.concurrency,
+        'near_duplicates': not args.no_near_duplicates
+    }
+
+    results = []
+    data_dir = tempfile.mkdtemp(prefix='smart_ingest_bench_')
+    try:
+        for source_format in args.formats:
+            for count in args.records:
+                print(f"Generating {count} {source_format} records ({args.duplicate_ratio:.0%} duplicates)...")
+                paths = generate_files(data_dir, source_format, count, args.files, args.duplicate_ratio, args.seed)
+                for path in args.paths:
+                    with tempfile.TemporaryDirectory(dir=data_dir) as work_dir:
+                        result = run_isolated(args.uri, paths, path, options, work_dir, args.verbose)
+                    result = {'format': source_format, 'records': count, 'duplicate_ratio': args.duplicate_ratio,
+                              'path': path, **result}
+                    results.append(result)
+                    rss = f"{result['peak_rss_mb']} MiB" if result['peak_rss_mb'] is not None else "n/a"
+                    round_trips = result['round_trips'] if result['round_trips'] is not None else "n/a"
+                    print(f"  {path:<12} {result['seconds']:>8.2f}s {result['records_per_second']:>10,.0f} records/sec"
+                          f"  peak RSS {rss}  round trips {round_trips}  skipped {result['skipped']}")
+                for file_path in paths:
+                    os.remove(file_path)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'pymongo': pymongo.version,
+        'platform': platform.platform(),
+        'backend': 'mongod' if args.uri else 'mongomock',
+        'note': None if args.uri else MOCK_NOTE,
+        'options': dict(options, files=args.files, seed=args.seed),
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.uri is None:
+        print(MOCK_NOTE)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            print_comparison(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
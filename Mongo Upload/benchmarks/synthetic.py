@@ -0,0 +1,134 @@
+"""Synthetic export generators for the upload benchmarks
+
+Records come in the AirTable shape (AirTable/Data01.json) or the Converted
+shape ({"tools": [...]}). A duplicate_ratio of the records repeat an earlier
+tool the way real exports do: same description, but the name in another
+case or spacing, or the website with www., a tracking parameter or a
+trailing slash, so they exercise the dedup normalization. Output is
+deterministic for a given seed.
+"""
+import json
+import random
+from datetime import datetime, timedelta
+
+CATEGORIES = ["Writing", "Image Generation", "Productivity", "Marketing", "Video", "Audio", "Code", "Research"]
+PRICES = ["Free", "Freemium", "Paid", "Contact for Pricing", "Unknown"]
+# Descriptions are drawn from these so unrelated tools rarely look alike to the near-duplicate check
+WORDS = (
+    "ai assistant generate create edit enhance photos images video audio voice music text writing "
+    "content marketing emails social media posts blog articles code review debug developers teams "
+    "meetings notes summaries research papers data analysis charts reports presentations slides "
+    "design logos websites landing pages products customers support chat bots automation workflows "
+    "tasks calendar scheduling translation languages subtitles transcription podcasts avatars "
+    "portraits backgrounds remove upscale restore colorize animate 3d models games characters "
+    "stories novels poems scripts ads campaigns seo keywords sales leads outreach crm finance "
+    "budgets invoices legal contracts documents pdf search knowledge base learning courses quizzes "
+    "students teachers health fitness recipes travel plans shopping fashion interior real estate"
+).split()
+START_TIME = datetime(2023, 1, 1)
+
+
+def _variant_name(name, rng):
+    return rng.choice([name.upper(), name.lower(), f"  {name} ", name.replace(" ", "  ")])
+
+
+def _variant_website(website, rng):
+    return rng.choice([
+        website.replace("https://", "https://www."),
+        website.rstrip("/") + "?utm_source=synthetic",
+        website.replace("https://", "http://").rstrip("/"),
+        website
+    ])
+
+
+def iter_tools(count, seed=0, duplicate_ratio=0.0):
+    """Yield (index, name, description, website, categories, price, created) for each synthetic tool"""
+    rng = random.Random(seed)
+    unique = []
+    for i in range(count):
+        if unique and rng.random() < duplicate_ratio:
+            j, name, description, website, categories = unique[rng.randrange(len(unique))]
+            name = _variant_name(name, rng)
+            website = _variant_website(website, rng)
+        else:
+            j = i
+            name = f"Tool {i}"
+            description = " ".join(rng.choices(WORDS, k=rng.randint(10, 20))).capitalize()
+            website = f"https://tool{i}.example.com/"
+            categories = rng.sample(CATEGORIES, rng.randint(1, 3))
+            unique.append((j, name, description, website, categories))
+        # Exports are created in bulk, so many records share a createdTime
+        created = START_TIME + timedelta(minutes=rng.randint(0, 60 * 24 * 365) // 15 * 15)
+        yield j, name, description, website, categories, rng.choice(PRICES), created
+
+
+def iter_airtable_records(count, seed=0, duplicate_ratio=0.0):
+    """Yield AirTable records shaped like AirTable/Data01.json"""
+    for i, (j, name, description, website, categories, price, created) in enumerate(
+            iter_tools(count, seed, duplicate_ratio)):
+        yield {
+            "id": f"rec{i:010d}",
+            "createdTime": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "fields": {
+                "Title": name,
+                "Subtitle": description,
+                "Category": ", ".join(categories),
+                "Price": price,
+                "Gallery": f"https://images.example.com/{j}.png",
+                "Call To Action URL": website
+            }
+        }
+
+
+def iter_converted_tools(count, seed=0, duplicate_ratio=0.0):
+    """Yield tools shaped like the entries of an AirTable/Converted file"""
+    for j, name, description, website, categories, price, created in iter_tools(count, seed, duplicate_ratio):
+        timestamp = created.strftime("%Y-%m-%d %H:%M:%S")
+        yield {
+            "name": name,
+            "description": description,
+            "website": website,
+            "image": f"https://images.example.com/{j}.png",
+            "category": categories[0],
+            "pricing": price,
+            "features": ["Website"],
+            "tags": categories,
+            "submittedBy": "000000000000000000000000",
+            "status": "pending",
+            "rating": {"average": 0, "count": 0},
+            "createdAt": timestamp,
+            "updatedAt": timestamp
+        }
+
+
+def airtable_records(count, seed=0, duplicate_ratio=0.0):
+    """Build a list of AirTable records"""
+    return list(iter_airtable_records(count, seed, duplicate_ratio))
+
+
+def converted_tools(count, seed=0, duplicate_ratio=0.0):
+    """Build a list of Converted tools"""
+    return list(iter_converted_tools(count, seed, duplicate_ratio))
+
+
+def _write_items(file, items):
+    for i, item in enumerate(items):
+        file.write(",\n" if i else "\n")
+        file.write(json.dumps(item))
+    file.write("\n")
+
+
+def write_airtable_file(path, records):
+    """Write AirTable records as a JSON array, one record at a time"""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("[")
+        _write_items(file, records)
+        file.write("]\n")
+
+
+def write_converted_file(path, tools):
+    """Write tools as a {"tools": [...]} file, one tool at a time"""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('{"tools": [')
+        _write_items(file, tools)
+        file.write("]}\n")
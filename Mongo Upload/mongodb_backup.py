@@ -0,0 +1,7 @@
+import sys
+from smart_ingest.cli import main
+
+if __name__ == "__main__":
+    # Manage tool backups. Same as:
+    #   python -m smart_ingest backup {create,list,prune,restore} ...
+    sys.exit(main(["backup"] + sys.argv[1:]))
@@ -0,0 +1 @@
+"""Shared ingestion helpers for the MongoDB upload scripts"""
@@ -0,0 +1,177 @@
+"""asyncio upload path: several bulk writes in flight on one connection pool
+
+Used by upload --concurrency N. Files are read and transformed on a worker
+thread one block ahead, while up to N bulk_write calls are awaited at once,
+so parsing overlaps the network round trips instead of waiting on them.
+The writes go through pymongo's AsyncMongoClient (or Motor); without either,
+ThreadedCollection runs the sync collection's bulk_write on threads, which
+is also the in-process stand-in for tests.
+"""
+import asyncio
+import inspect
+import time
+
+from .bulk import DEFAULT_BATCH_SIZE, BatchAttempts, BulkWriter, new_stats
+from .config import connect_async
+
+
+class ThreadedCollection:
+    """Async bulk_write over a sync collection, run with asyncio.to_thread"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    async def bulk_write(self, operations, ordered=True):
+        return await asyncio.to_thread(self.collection.bulk_write, operations, ordered=ordered)
+
+
+def open_async_collection(collection):
+    """An async handle on the same collection, and the client to close afterwards"""
+    client = connect_async()
+    if client is None:
+        print("No async MongoDB driver installed (pymongo 4.10+ or motor), writing from threads instead")
+        return ThreadedCollection(collection), None
+    async_collection = client[collection.database.name][collection.name]
+    return async_collection.with_options(write_concern=collection.write_concern), client
+
+
+async def close_client(client):
+    # AsyncMongoClient.close() is a coroutine, Motor's is not
+    result = client.close()
+    if inspect.isawaitable(result):
+        await result
+
+
+class AsyncBulkWriter(BulkWriter):
+    """BulkWriter whose batches are written as tasks, at most concurrency at a time
+
+    flush() only waits for a free slot, so the caller keeps producing tools
+    while earlier batches are in flight. Stats, dedup and ordered commits
+    work as in BulkWriter; all of it runs on the event loop thread.
+    """
+
+    def __init__(self, collection, stats, concurrency, **options):
+        super().__init__(collection, stats, **options)
+        self.slots = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+
+    async def add(self, tool, position=None):
+        """Queue a transformed tool, starting the batch's write once it is full"""
+        if self._accept(tool, position):
+            self.pending.append(tool)
+            if len(self.pending) >= self.batch_limit():
+                await self.flush()
+
+    async def flush(self):
+        """Start writing all queued tools, waiting only for a free slot"""
+        await self.slots.acquire()
+        batch, marker = self._take_batch()
+        if not batch:
+            self.slots.release()
+            return
+        task = asyncio.create_task(self._write_async(batch, marker))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """Write any queued tools and wait for batches still in flight"""
+        await self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def _write_async(self, batch, marker):
+        attempts = BatchAttempts(batch)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    result = await self.collection.bulk_write(self._operations(attempts.pending), ordered=False)
+                except Exception as e:
+                    delay = self._after_attempt(attempts, time.perf_counter() - start, error=e)
+                else:
+                    delay = self._after_attempt(attempts, time.perf_counter() - start, result=result)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+            if self.on_written is not None and attempts.written_tools:
+                await asyncio.to_thread(self.on_written, attempts.written_tools)
+            self._record_result(marker, attempts)
+        finally:
+            self.slots.release()
+
+
+async def read_ahead(blocks):
+    """Iterate a blocking generator on a worker thread, fetching the next item while this one is used"""
+    done = object()
+    upcoming = asyncio.ensure_future(asyncio.to_thread(next, blocks, done))
+    while True:
+        item = await upcoming
+        if item is done:
+            return
+        upcoming = asyncio.ensure_future(asyncio.to_thread(next, blocks, done))
+        yield item
+
+
+async def process_file_async(source_file, collection, concurrency, batch_size=DEFAULT_BATCH_SIZE, index=None,
+                             start=0, total=None, on_commit=None, insert=False, near=None, sizer=None,
+                             on_written=None):
+    """Read, transform, dedup and write one source file, returning (stats, seen)"""
+    stats = new_stats()
+    writer = AsyncBulkWriter(collection, stats, concurrency, batch_size=batch_size, total=total, index=index,
+                             on_commit=on_commit, insert=insert, near=near, sizer=sizer, on_written=on_written)
+
+    def transform_failed(record, error):
+        writer.count_failed()
+        print(f"Error processing tool {source_file.format.label(record)}: {str(error)}")
+
+    seen = 0
+    blocks = source_file.transformed_blocks(batch_size, start, transform_failed)
+    try:
+        async for seen, block in read_ahead(blocks):
+            for position, tool in block:
+                await writer.add(tool, position)
+    finally:
+        # Let the batches already started finish, even when reading failed
+        await writer.close()
+    return stats, seen
+
+
+async def upload_files_async(source_files, collection, concurrency, batch_size=DEFAULT_BATCH_SIZE, index=None,
+                             on_file_done=None, on_file_failed=None, start_offsets=None, on_commit=None,
+                             insert=False, near=None, totals=None, async_collection=None, sizer=None,
+                             on_written=None):
+    """Upload source files one after another with up to concurrency writes in flight
+
+    Takes the same callbacks as upload_files_parallel. The writes go to
+    async_collection when given (e.g. a ThreadedCollection in tests),
+    otherwise to a new async client on the same collection.
+    """
+    client = None
+    if async_collection is None:
+        async_collection, client = open_async_collection(collection)
+    start_offsets = start_offsets or {}
+    totals = totals or {}
+    try:
+        for source_file in source_files:
+            file_path = source_file.path
+            print(f"\nProcessing file: {file_path}")
+            start = start_offsets.get(file_path, 0)
+            if start:
+                print(f"Resuming after {start} tools committed by a previous run")
+            commit = None
+            if on_commit is not None:
+                commit = lambda position, file_path=file_path: on_commit(file_path, position)
+            try:
+                file_stats, seen = await process_file_async(source_file, async_collection, concurrency, batch_size,
+                                                            index, start, totals.get(file_path), commit, insert,
+                                                            near, sizer, on_written)
+            except Exception as e:
+                if on_file_failed:
+                    on_file_failed(file_path, e)
+                continue
+            if on_file_done:
+                on_file_done(file_path, file_stats, seen)
+    finally:
+        if client is not None:
+            await close_client(client)
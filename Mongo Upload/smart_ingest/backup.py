@@ -0,0 +1,274 @@
+import gzip
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import DESCENDING
+from pymongo.errors import OperationFailure
+
+BACKUP_MODES = ('incremental', 'server', 'stream', 'file')
+DEFAULT_BACKUP_DIR = 'backups'
+# Incremental backups start a new full base after this many deltas
+MAX_DELTAS = 10
+# Number of base generations (with their deltas) kept by the retention policy
+KEEP_BASES = 3
+STREAM_BATCH_SIZE = 1000
+# Keep each insert_many well under the 48MB message limit
+STREAM_BATCH_BYTES = 8 * 1024 * 1024
+
+
+def format_bytes(size):
+    """Human readable byte count"""
+    size = float(size)
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _raw(collection):
+    # Raw documents are copied as bytes, never decoded into Python dicts
+    return collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+
+
+def _collection_size(db, name):
+    try:
+        return db.command({"collStats": name}).get("size", 0)
+    except Exception:
+        # Size is only reported, a missing collStats must not fail the backup
+        return 0
+
+
+def backup_server(collection, backup_collection_name, match=None):
+    """Copy the collection with an aggregation $out so no document leaves the server"""
+    collection.aggregate([{"$match": match or {}}, {"$out": backup_collection_name}])
+    db = collection.database
+    count = db[backup_collection_name].estimated_document_count()
+    return count, _collection_size(db, backup_collection_name)
+
+
+def backup_stream(collection, backup_collection_name, match=None, batch_size=STREAM_BATCH_SIZE):
+    """Copy the collection through the client in bounded insert_many chunks"""
+    target = _raw(collection.database[backup_collection_name])
+    count = 0
+    size = 0
+    chunk = []
+    chunk_bytes = 0
+    for doc in _raw(collection).find(match or {}, batch_size=batch_size):
+        chunk.append(doc)
+        chunk_bytes += len(doc.raw)
+        if len(chunk) >= batch_size or chunk_bytes >= STREAM_BATCH_BYTES:
+            target.insert_many(chunk, ordered=False)
+            count += len(chunk)
+            size += chunk_bytes
+            chunk = []
+            chunk_bytes = 0
+    if chunk:
+        target.insert_many(chunk, ordered=False)
+        count += len(chunk)
+        size += chunk_bytes
+    return count, size
+
+
+def backup_copy(collection, backup_collection_name, match=None):
+    """Copy with backup_server, falling back to backup_stream if the server refuses $out"""
+    try:
+        return backup_server(collection, backup_collection_name, match)
+    except OperationFailure as e:
+        print(f"Server-side backup unavailable ({str(e)}), copying through the client instead")
+        return backup_stream(collection, backup_collection_name, match)
+
+
+def backup_file(collection, backup_collection_name, backup_dir=DEFAULT_BACKUP_DIR, batch_size=STREAM_BATCH_SIZE):
+    """Write the collection to a gzipped BSON file that mongorestore --gzip can load"""
+    Path(backup_dir).mkdir(parents=True, exist_ok=True)
+    file_path = Path(backup_dir) / f"{backup_collection_name}.bson.gz"
+    count = 0
+    with gzip.open(file_path, 'wb') as file:
+        for doc in _raw(collection).find({}, batch_size=batch_size):
+            file.write(doc.raw)
+            count += 1
+    return count, os.path.getsize(file_path), file_path
+
+
+def backup_collection_name(collection, backup_name, suffix=''):
+    """A new backup name, timestamped to the millisecond and numbered if that one is taken"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+    existing = set(collection.database.list_collection_names())
+    name = f"{backup_name}_backup_{timestamp}{suffix}"
+    number = 1
+    while name in existing:
+        number += 1
+        name = f"{backup_name}_backup_{timestamp}_{number}{suffix}"
+    return name
+
+
+def catalog_collection(collection, backup_name):
+    """Collection listing the generations of incremental backups"""
+    return collection.database[f"{backup_name}_backups"]
+
+
+def list_backups(collection, backup_name):
+    """Return the catalog entries of incremental backups, oldest first"""
+    return list(catalog_collection(collection, backup_name).find({}).sort("createdAt", 1))
+
+
+def _changed_filter(since):
+    # Both the uploaders and the server set updatedAt; tools without one fall
+    # back to the creation time embedded in their ObjectId
+    return {
+        "$or": [
+            {"updatedAt": {"$gt": since}},
+            {"updatedAt": {"$exists": False}, "_id": {"$gte": ObjectId.from_datetime(since)}}
+        ]
+    }
+
+
+def backup_incremental(collection, backup_name, max_deltas=MAX_DELTAS, keep_bases=KEEP_BASES):
+    """Back up only what changed since the previous backup
+
+    The first backup is a full base. Later ones copy just the tools whose
+    updatedAt or _id is newer than the previous backup into a delta
+    collection, and nothing at all is written when no tool changed. Deletions
+    cannot be captured by a delta, so a drop in the document count (or
+    max_deltas deltas in a row) starts a new base. Every backup is recorded in
+    the <backup_name>_backups catalog, which restore_backup reads. Copies
+    use $out, or stream through the client where the server refuses it.
+    Returns (name, kind, count, size); name is None when nothing changed.
+    """
+    catalog = catalog_collection(collection, backup_name)
+    latest = catalog.find_one({}, sort=[("createdAt", DESCENDING)])
+    # Taken before copying so changes made during the backup land in the next delta.
+    # MongoDB stores dates with millisecond precision.
+    now = datetime.utcnow()
+    started_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    live_count = collection.count_documents({})
+
+    kind = 'base'
+    if latest is not None:
+        since = latest['createdAt']
+        changed_filter = _changed_filter(since)
+        # ObjectIds only have second precision, so tools created in the same
+        # second as the previous backup may already be part of it
+        newer_ids = {"_id": {"$gte": ObjectId.from_datetime(since)}}
+        inserted = collection.count_documents(newer_ids) \
+            - collection.database[latest['_id']].count_documents(newer_ids)
+        deltas = catalog.count_documents({"base": latest['base'], "kind": "delta"})
+        if live_count >= latest['count'] + inserted and deltas < max_deltas:
+            kind = 'delta'
+            if collection.count_documents(changed_filter) == 0:
+                return None, kind, 0, 0
+
+    if kind == 'base':
+        name = backup_collection_name(collection, backup_name)
+        count, size = backup_copy(collection, name)
+        base = name
+    else:
+        name = backup_collection_name(collection, backup_name, '_delta')
+        count, size = backup_copy(collection, name, changed_filter)
+        base = latest['base']
+
+    catalog.insert_one({
+        "_id": name,
+        "kind": kind,
+        "base": base,
+        "createdAt": started_at,
+        "since": latest['createdAt'] if kind == 'delta' else None,
+        "count": live_count,
+        "documents": count
+    })
+    prune_backups(collection, backup_name, keep_bases)
+    return name, kind, count, size
+
+
+def prune_backups(collection, backup_name, keep_bases=KEEP_BASES):
+    """Drop all but the newest keep_bases base generations and their deltas"""
+    catalog = catalog_collection(collection, backup_name)
+    bases = [entry['_id'] for entry in catalog.find({"kind": "base"}).sort("createdAt", DESCENDING)]
+    dropped = []
+    for base in bases[keep_bases:]:
+        for entry in catalog.find({"base": base}):
+            collection.database.drop_collection(entry['_id'])
+            dropped.append(entry['_id'])
+        catalog.delete_many({"base": base})
+    for name in dropped:
+        print(f"Pruned old backup: {name}")
+    return dropped
+
+
+def restore_backup(collection, backup_name, target_name, at=None):
+    """Rebuild the collection as it was at a point in time into target_name
+
+    Starts from the newest base taken at or before `at` (default: now) and
+    applies its deltas in order with $merge, all on the server.
+    """
+    catalog = catalog_collection(collection, backup_name)
+    query = {"createdAt": {"$lte": at}} if at else {}
+    latest = catalog.find_one(query, sort=[("createdAt", DESCENDING)])
+    if latest is None:
+        raise ValueError("No backup found at or before the requested time")
+
+    db = collection.database
+    chain = list(catalog.find({"base": latest['base'], "createdAt": {"$lte": latest['createdAt']}})
+                 .sort("createdAt", 1))
+    for entry in chain:
+        if entry['kind'] == 'base':
+            db[entry['_id']].aggregate([{"$match": {}}, {"$out": target_name}])
+        else:
+            db[entry['_id']].aggregate([{
+                "$merge": {"into": target_name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}
+            }])
+    return [entry['_id'] for entry in chain]
+
+
+def backup_collection(collection, backup_name, mode='incremental', backup_dir=DEFAULT_BACKUP_DIR):
+    """Create a backup of the existing collection
+
+    mode is "incremental" (full base, then change-only deltas, see
+    backup_incremental), "server" (aggregation $out, falling back to "stream"
+    if the server refuses it), "stream" (bounded client-side copy) or "file"
+    (gzipped BSON snapshot on disk). Prints how long the backup took and how
+    many bytes it holds.
+    """
+    try:
+        if mode not in BACKUP_MODES:
+            raise ValueError(f"Unknown backup mode '{mode}', expected one of: {', '.join(BACKUP_MODES)}")
+
+        if collection.estimated_document_count() == 0:
+            print("No existing documents found to backup")
+            return True
+
+        if mode == 'incremental':
+            started = time.perf_counter()
+            name, kind, count, size = backup_incremental(collection, backup_name)
+            elapsed = time.perf_counter() - started
+            if name is None:
+                print("No changes since the last backup, nothing to back up")
+            else:
+                print(f"Backup created successfully: {name} ({kind})")
+                print(f"Backed up {count} documents ({format_bytes(size)}) in {elapsed:.1f}s")
+            return True
+
+        name = backup_collection_name(collection, backup_name)
+        started = time.perf_counter()
+
+        if mode == 'server':
+            count, size = backup_copy(collection, name)
+        elif mode == 'stream':
+            count, size = backup_stream(collection, name)
+        else:
+            count, size, file_path = backup_file(collection, name, backup_dir)
+            name = str(file_path)
+
+        elapsed = time.perf_counter() - started
+        print(f"Backup created successfully: {name}")
+        print(f"Backed up {count} documents ({format_bytes(size)}) in {elapsed:.1f}s")
+        return True
+    except Exception as e:
+        print(f"Backup failed: {str(e)}")
+        return False
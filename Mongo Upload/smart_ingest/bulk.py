@@ -0,0 +1,439 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import bson
+from pymongo import InsertOne, UpdateOne, WriteConcern
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure, PyMongoError
+
+from .dedup import DEDUP_COLLATION
+from .metrics import METRICS
+
+DEFAULT_BATCH_SIZE = 500
+PROGRESS_INTERVAL = 5.0  # Seconds between progress lines
+DUPLICATE_KEY_ERROR = 11000
+
+# Server limits per bulk_write command: maxWriteBatchSize operations, and
+# batches are kept to one maximum BSON document size so a command never splits
+MAX_BATCH_OPS = 100000
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+MIN_BATCH_SIZE = 50
+TARGET_BATCH_SECONDS = 1.0
+
+DEFAULT_RETRIES = 5
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30.0
+# Network errors, elections, stepdowns, shutdowns and write concern timeouts
+TRANSIENT_ERROR_CODES = {6, 7, 64, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+# fast: acknowledged by the primary only, for bulk backfills that can be rerun.
+# safe: journaled on a majority, so an election can't roll the upload back.
+WRITE_CONCERNS = {
+    'fast': WriteConcern(w=1, j=False),
+    'safe': WriteConcern(w='majority', j=True)
+}
+
+
+def new_stats():
+    """Create an empty stats dict for a BulkWriter"""
+    return {
+        'processed': 0,
+        'new': 0,
+        'skipped': 0,
+        'failed': 0,
+        # The part of failed that reached MongoDB and may succeed on a rerun
+        'write_failed': 0,
+        'near_duplicates': 0
+    }
+
+
+def is_transient(error):
+    """Whether a failed write may succeed if it is simply sent again"""
+    if isinstance(error, BulkWriteError):
+        return False  # Judged per operation
+    if isinstance(error, ConnectionFailure):
+        return True
+    if isinstance(error, PyMongoError) and error.has_error_label("RetryableWriteError"):
+        return True
+    return isinstance(error, OperationFailure) and error.code in TRANSIENT_ERROR_CODES
+
+
+def retry_delay(attempt):
+    """Exponential backoff with full jitter before retry number attempt (from 0)"""
+    return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class BatchSizer:
+    """Batch size that follows the observed write latency
+
+    A batch that took under half of target_seconds (scaled to the current
+    size) grows the size by a quarter; a slower one, or a transient error,
+    halves it. The size stays between minimum and the server's limits of
+    100,000 operations and, going by the average document size, 16MB.
+    Shared by all writers of a run, so it is thread-safe.
+    """
+
+    def __init__(self, initial=DEFAULT_BATCH_SIZE, target_seconds=TARGET_BATCH_SECONDS, minimum=MIN_BATCH_SIZE,
+                 maximum=MAX_BATCH_OPS):
+        self.target_seconds = target_seconds
+        self.minimum = minimum
+        self.maximum = maximum
+        self.document_bytes = None
+        self.size = initial
+        self._lock = threading.Lock()
+
+    def observe(self, count, seconds, sample=None):
+        """Adjust the size after a batch of count tools was written in seconds"""
+        with self._lock:
+            if sample is not None:
+                size = len(bson.encode(sample))
+                self.document_bytes = size if self.document_bytes is None else 0.9 * self.document_bytes + 0.1 * size
+            if count < self.size // 2:
+                return  # The end of a file, which says little about a full batch
+            projected = seconds / count * self.size
+            if projected > self.target_seconds:
+                self.size //= 2
+            elif projected < self.target_seconds / 2:
+                self.size += self.size // 4 + 1
+            self._clamp()
+
+    def shrink(self):
+        """Halve the size after a transient error"""
+        with self._lock:
+            self.size //= 2
+            self._clamp()
+
+    def _clamp(self):
+        maximum = self.maximum
+        if self.document_bytes:
+            maximum = min(maximum, int(MAX_BATCH_BYTES // self.document_bytes))
+        self.size = max(self.minimum, min(self.size, maximum))
+
+
+class BatchAttempts:
+    """One batch on its way through write attempts: what is written, failed or left to retry"""
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.pending = batch
+        self.written = 0
+        self.written_tools = []
+        self.failed = []
+        self.attempt = 0
+
+
+def duplicate_filter(tool):
+    """Match an existing tool by name or website
+
+    An empty website is left out, as it would match every other tool
+    without one and can't use the partial website index.
+    """
+    clauses = [{"name": tool["name"]}]
+    if tool.get("website"):
+        clauses.append({"website": tool["website"]})
+    return {"$or": clauses}
+
+
+class WritePool:
+    """Bounded thread pool for bulk writes sharing one MongoClient
+
+    submit() blocks once max_pending batches are queued or in flight, which
+    keeps memory bounded when tools are produced faster than MongoDB takes them.
+    """
+
+    def __init__(self, workers, max_pending=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(max_pending or workers * 2)
+
+    def submit(self, fn, *args):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class BulkWriter:
+    """Collect transformed tools and write them as unordered upsert batches
+
+    Each tool becomes an UpdateOne with $setOnInsert, so a tool that already
+    exists is left untouched and counted as skipped without its own find_one.
+    With a DedupIndex, known duplicates are skipped before they are queued.
+    With a WritePool, full batches are written on its threads while the
+    caller keeps producing tools; call close() to wait for them.
+
+    match builds each upsert's filter (duplicate_filter by default), so the
+    same writer loads other documents keyed differently, such as prompts;
+    noun and label_key are only used in progress and error messages.
+    The filter runs with collation, so it can use the dedup indexes.
+
+    With a NearDuplicateIndex, tools whose description looks like a known
+    tool's are reported and counted as near_duplicates, but still written.
+
+    With insert, tools are written as plain inserts and the unique dedup
+    indexes reject duplicates: those duplicate key errors count as skipped.
+
+    Operations that fail transiently (network errors, elections, write
+    concern timeouts) are sent again up to retries times with jittered
+    backoff. Both kinds of writes are idempotent: an upsert finds its tool,
+    and an insert keeps the _id of its first attempt. With a BatchSizer,
+    batches are cut at its current size instead of batch_size.
+
+    Callers that pass each tool's input position get on_commit(position)
+    once every tool up to that position has been written, in input order
+    even when batches finish out of order. This is the resume checkpoint.
+    on_written(tools) receives the tools each batch actually wrote, before
+    they are committed, e.g. to keep the category stats up to date.
+    """
+
+    def __init__(self, collection, stats, batch_size=DEFAULT_BATCH_SIZE, total=None, progress_interval=PROGRESS_INTERVAL,
+                 index=None, pool=None, on_commit=None, match=duplicate_filter, noun="tool", label_key="name", collation=DEDUP_COLLATION,
+                 insert=False, near=None, retries=DEFAULT_RETRIES, sizer=None, on_written=None):
+        self.collection = collection
+        self.on_written = on_written
+        self.retries = retries
+        self.sizer = sizer
+        self.match = match
+        self.collation = collation
+        self.insert = insert
+        self.near = near
+        self.noun = noun
+        self.label_key = label_key
+        self.stats = stats
+        self.index = index
+        self.pool = pool
+        self.on_commit = on_commit
+        self.position = 0
+        self.batch_size = batch_size
+        self.total = total
+        self.progress_interval = progress_interval
+        self.pending = []
+        self._futures = []
+        self._batches = []
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._last_progress = self._started
+        self._dedup_seconds = 0.0
+        self._dedup_items = 0
+
+    def add(self, tool, position=None):
+        """Queue a transformed tool, writing the batch once it is full"""
+        if self._accept(tool, position):
+            self.pending.append(tool)
+            if len(self.pending) >= self.batch_limit():
+                self.flush()
+
+    def batch_limit(self):
+        return self.sizer.size if self.sizer is not None else self.batch_size
+
+    def flush(self):
+        """Write all queued tools in one bulk_write round trip"""
+        batch, marker = self._take_batch()
+        if not batch:
+            return
+        if self.pool is None:
+            self._write(batch, marker)
+        else:
+            self._futures.append(self.pool.submit(self._write, batch, marker))
+
+    def close(self):
+        """Write any queued tools and wait for batches still in flight"""
+        self.flush()
+        if self._futures:
+            wait(self._futures)
+            self._futures = []
+
+    def _accept(self, tool, position):
+        """Run the dedup checks on a tool, returning whether it should be written"""
+        start = time.perf_counter()
+        try:
+            return self._check(tool, position)
+        finally:
+            self._dedup_seconds += time.perf_counter() - start
+            self._dedup_items += 1
+
+    def _check(self, tool, position):
+        if position is not None:
+            self.position = position
+        if self.index is not None:
+            if self.index.contains(tool):
+                with self._lock:
+                    self.stats['processed'] += 1
+                    self.stats['skipped'] += 1
+                    self._report_progress()
+                return False
+            self.index.add(tool)
+        if self.near is not None:
+            self._check_near_duplicate(tool)
+        return True
+
+    def _take_batch(self):
+        """Take the queued tools and the marker that tracks their commit"""
+        # Dedup checks are per tool, so they are observed once per batch
+        if self._dedup_items:
+            METRICS.observe('dedup', self._dedup_seconds, items=self._dedup_items)
+            self._dedup_seconds = 0.0
+            self._dedup_items = 0
+        batch, self.pending = self.pending, []
+        # Track where this batch ends in the input so commits stay in order
+        marker = [self.position, not batch]
+        with self._lock:
+            self._batches.append(marker)
+            if not batch:
+                self._commit_ready()
+        return batch, marker
+
+    def _operations(self, batch):
+        if self.insert:
+            return [InsertOne(tool) for tool in batch]
+        return [
+            UpdateOne(self.match(tool), {"$setOnInsert": tool}, upsert=True, collation=self.collation)
+            for tool in batch
+        ]
+
+    def _write(self, batch, marker):
+        attempts = BatchAttempts(batch)
+        while True:
+            start = time.perf_counter()
+            try:
+                result = self.collection.bulk_write(self._operations(attempts.pending), ordered=False)
+            except Exception as e:
+                delay = self._after_attempt(attempts, time.perf_counter() - start, error=e)
+            else:
+                delay = self._after_attempt(attempts, time.perf_counter() - start, result=result)
+            if delay is None:
+                break
+            time.sleep(delay)
+        if self.on_written is not None and attempts.written_tools:
+            self.on_written(attempts.written_tools)
+        self._record_result(marker, attempts)
+
+    def _after_attempt(self, attempts, seconds, result=None, error=None):
+        """Fold one bulk_write attempt into attempts
+
+        Returns the delay before retrying its transient failures, or None
+        when the batch is done.
+        """
+        pending = attempts.pending
+        METRICS.observe('write', seconds, items=len(pending))
+        retry = []
+        if error is None:
+            attempts.written += result.inserted_count if self.insert else result.upserted_count
+            if self.on_written is not None:
+                written = range(len(pending)) if self.insert else result.upserted_ids
+                attempts.written_tools.extend(pending[position] for position in written)
+        elif isinstance(error, BulkWriteError):
+            # Unordered writes keep going past errors, so only the listed ops failed
+            details = error.details
+            attempts.written += details.get('nInserted' if self.insert else 'nUpserted', 0)
+            write_errors = details.get('writeErrors', [])
+            if self.on_written is not None:
+                if self.insert:
+                    errored = {write_error['index'] for write_error in write_errors}
+                    written = (position for position in range(len(pending)) if position not in errored)
+                else:
+                    written = (upserted['index'] for upserted in details.get('upserted', []))
+                attempts.written_tools.extend(pending[position] for position in written)
+            for write_error in write_errors:
+                code = write_error.get('code')
+                tool = pending[write_error['index']]
+                # A unique dedup index caught a duplicate: skipped, not failed
+                if code == DUPLICATE_KEY_ERROR:
+                    continue
+                if code in TRANSIENT_ERROR_CODES:
+                    retry.append(tool)
+                    continue
+                attempts.failed.append(tool)
+                print(f"Error processing {self.noun} {tool.get(self.label_key, 'unknown')}: "
+                      f"{write_error.get('errmsg')}")
+            if details.get('writeConcernErrors'):
+                # Applied but not acknowledged by enough members: send them again
+                errored = {write_error['index'] for write_error in write_errors}
+                retry.extend(tool for position, tool in enumerate(pending) if position not in errored)
+        elif is_transient(error):
+            retry = list(pending)
+        else:
+            attempts.failed.extend(pending)
+            print(f"Error writing batch of {len(pending)} {self.noun}s: {str(error)}")
+
+        if self.sizer is not None:
+            if retry:
+                self.sizer.shrink()
+            else:
+                self.sizer.observe(len(pending), seconds, pending[0] if pending else None)
+        if not retry:
+            return None
+        if attempts.attempt >= self.retries:
+            attempts.failed.extend(retry)
+            print(f"Giving up on {len(retry)} {self.noun}s after {self.retries} retries: {str(error)}")
+            return None
+        delay = retry_delay(attempts.attempt)
+        attempts.attempt += 1
+        attempts.pending = retry
+        METRICS.observe('retry_wait', delay, items=len(retry))
+        print(f"Transient error writing {len(retry)} {self.noun}s, retry {attempts.attempt}/{self.retries} "
+              f"in {delay:.1f}s: {str(error)}")
+        return delay
+
+    def _record_result(self, marker, attempts):
+        """Fold a finished batch into the stats and commit it"""
+        batch = attempts.batch
+        failed = len(attempts.failed)
+        for tool in attempts.failed:
+            self._forget(tool)
+        with self._lock:
+            self.stats['processed'] += len(batch) - failed
+            self.stats['new'] += attempts.written
+            self.stats['skipped'] += len(batch) - attempts.written - failed
+            self.stats['failed'] += failed
+            self.stats['write_failed'] += failed
+            self._report_progress()
+            marker[1] = True
+            self._commit_ready()
+
+    def _commit_ready(self):
+        committed = None
+        while self._batches and self._batches[0][1]:
+            committed = self._batches.pop(0)[0]
+        if committed is not None and self.on_commit is not None:
+            self.on_commit(committed)
+
+    def count_failed(self, count=1):
+        """Record tools that failed before reaching the writer, e.g. in transform"""
+        with self._lock:
+            self.stats['failed'] += count
+
+    def _check_near_duplicate(self, tool):
+        match = self.near.check(tool)
+        if match is None:
+            return
+        with self._lock:
+            self.stats['near_duplicates'] += 1
+        similar_name, score = match
+        print(f"Possible duplicate: {tool.get(self.label_key, 'unknown')} looks like {similar_name} "
+              f"({score:.0%} similar description)")
+
+    def _forget(self, tool):
+        if self.index is not None:
+            self.index.discard(tool)
+        if self.near is not None:
+            self.near.discard(tool)
+
+    def _report_progress(self):
+        now = time.monotonic()
+        if now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        done = self.stats['processed'] + self.stats['failed']
+        rate = done / (now - self._started)
+        if self.total:
+            print(f"Progress: {done}/{self.total} {self.noun}s processed ({rate:.0f}/s)")
+        else:
+            print(f"Progress: {done} {self.noun}s processed ({rate:.0f}/s)")
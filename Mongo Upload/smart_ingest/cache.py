@@ -0,0 +1,199 @@
+"""Binary cache of transformed input files
+
+Parsing the JSON exports is most of an upload's CPU time, and the same
+files are uploaded again and again. The first full pass over a file (its
+count, or an upload from the start) also writes every transformed tool to
+.ingest_cache/<content hash>-<format>.bin:
+
+    header   magic, version, record count, offset of the index
+    entries  one BSON document per record, in file order
+    index    the offset of every entry and of the end of the last, as uint64
+
+Later runs memory-map the file: the count comes from the header, resuming
+jumps straight to an entry through the index, and tools are decoded from
+BSON instead of parsed from JSON and transformed again. Fields that held
+the run's timestamp are stored by name and filled with the current time
+when read. Records that failed to transform are stored raw and retried, so
+their errors are reported as before.
+
+A file whose contents change gets a new hash, hence a new entry; bump
+CACHE_VERSION when a transform changes its output. The directory can be
+deleted at any time.
+"""
+import mmap
+import os
+import struct
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+import bson
+from bson.errors import InvalidDocument
+
+from .manifest import file_hash
+from .metrics import METRICS
+
+DEFAULT_CACHE_DIR = '.ingest_cache'
+CACHE_VERSION = 1
+MAGIC = b'SMARTIC\x00'
+# magic, version, record count, index offset
+HEADER = struct.Struct('<8sIQQ')
+
+
+class CachedFile:
+    """A memory-mapped cache entry"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.count, index_offset = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or version != CACHE_VERSION or index_offset + 8 * (self.count + 1) != len(self.map):
+                raise ValueError(f"Not a current cache file: {self.path}")
+            self.offsets = memoryview(self.map)[index_offset:].cast('Q')
+        except (struct.error, ValueError) as e:
+            self.map.close()
+            raise ValueError(f"Not a current cache file: {self.path}") from e
+
+    def close(self):
+        self.offsets.release()
+        self.map.close()
+
+    def transformed_blocks(self, block_size, start, transform_record, on_error=None):
+        """Yield the blocks SourceFile.transformed_blocks would, from the cached tools
+
+        A block's entries are contiguous, so each block is decoded in one call.
+        """
+        for block_start in range(start, self.count, block_size):
+            decode_start = time.perf_counter()
+            block_end = min(block_start + block_size, self.count)
+            data = self.map[self.offsets[block_start]:self.offsets[block_end]]
+            now = datetime.utcnow()
+            block = []
+            for position, entry in enumerate(bson.decode_all(data), block_start + 1):
+                tool = entry.get('t')
+                if tool is None:
+                    try:
+                        tool = transform_record(entry['r'], now)
+                    except Exception as e:
+                        if on_error is None:
+                            raise
+                        on_error(entry['r'], e)
+                        continue
+                else:
+                    for field in entry['n']:
+                        tool[field] = now
+                block.append((position, tool))
+            METRICS.observe('cache_read', time.perf_counter() - decode_start, items=block_end - block_start,
+                            size=len(data))
+            yield block_end, block
+
+
+class CacheWriter:
+    """Writes a cache entry next to its final path, moving it into place once complete
+
+    A record BSON cannot hold, or a full disk, drops the entry rather than
+    failing the upload.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.temp_path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, CACHE_VERSION, 0, 0))
+        self.offsets = array('Q')
+        self.broken = False
+
+    def add(self, tool, now):
+        """Store a transformed tool, remembering which fields hold the run's timestamp"""
+        self._write({'t': tool, 'n': [field for field, value in tool.items() if value is now]})
+
+    def add_failed(self, record):
+        self._write({'r': record})
+
+    def _write(self, entry):
+        if self.broken:
+            return
+        try:
+            data = bson.encode(entry)
+            self.offsets.append(self.file.tell())
+            self.file.write(data)
+        except (InvalidDocument, OverflowError, OSError) as e:
+            print(f"Not caching {self.path.name}: {str(e)}")
+            self.broken = True
+
+    def commit(self):
+        if self.broken:
+            self.discard()
+            return
+        try:
+            index_offset = self.file.tell()
+            count = len(self.offsets)
+            self.offsets.append(index_offset)
+            if index_offset % 8:
+                # Aligns the index for memoryview.cast
+                self.file.write(b'\0' * (8 - index_offset % 8))
+                index_offset = self.file.tell()
+            self.offsets.tofile(self.file)
+            self.file.seek(0)
+            self.file.write(HEADER.pack(MAGIC, CACHE_VERSION, count, index_offset))
+            self.file.close()
+            os.replace(self.temp_path, self.path)
+        except OSError as e:
+            print(f"Not caching {self.path.name}: {str(e)}")
+            self.discard()
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class ParseCache:
+    """The directory of cache entries, keyed by each file's content hash and format"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = Path(directory)
+        self._hashes = {}
+
+    def entry_path(self, source_file):
+        return self.directory / f"{self.content_hash(source_file.path)}-{source_file.format.name}.bin"
+
+    def content_hash(self, file_path):
+        """The file's hash, rehashed only when its size or mtime changed"""
+        stat = os.stat(file_path)
+        signature = (stat.st_size, stat.st_mtime)
+        known = self._hashes.get(file_path)
+        if known is None or known[0] != signature:
+            known = (signature, file_hash(file_path))
+            self._hashes[file_path] = known
+        return known[1]
+
+    def open(self, source_file):
+        """Map the file's cache entry, or return None if it has none (or an unreadable one)"""
+        try:
+            return CachedFile(self.entry_path(source_file))
+        except (OSError, ValueError):
+            return None
+
+    def count(self, source_file):
+        cached = self.open(source_file)
+        if cached is None:
+            return None
+        try:
+            return cached.count
+        finally:
+            cached.close()
+
+    def writer(self, source_file):
+        """A CacheWriter for the file's entry, or None if the cache directory is not writable"""
+        try:
+            return CacheWriter(self.entry_path(source_file))
+        except OSError as e:
+            print(f"Not caching {source_file.path}: {str(e)}")
+            return None
@@ -0,0 +1,206 @@
+"""Materialized category and tag counts in the category_stats collection
+
+Each category and each tag has one document, keyed by its normalized form
+(normalize_label, the same key as normalizeLabel in the server's
+services/categoryStats.js), so "Image Generation", "image generation" and
+"Image  Generation " are counted together:
+
+    {"_id": "category:image generation", "kind": "category", "key": "image generation",
+     "name": "Image Generation", "count": 120, "approved": 118, "updatedAt": ...}
+
+The upload $incs these after every batch, for the tools the batch actually
+wrote; the server does the same for tools created, edited or deleted
+through the API (services/categoryStats.js). A "total" document counts
+every tool, so readers can tell the stats are current when it matches the
+tools collection. Anything that can't keep the counts exact marks it stale
+instead, and readers fall back to scanning tools until the next rebuild.
+
+rebuild() recomputes everything with one aggregation per _id range, run in
+parallel, and swaps the result in with a rename. The aggregation only
+groups tools with the same raw category, tags and approval; the labels are
+normalized here by tool_labels, as for the increments, since MongoDB's
+$toLower and $trim can't reproduce the key.
+"""
+import re
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from .config import CATEGORY_STATS_COLLECTION
+from .metrics import METRICS
+from .ranges import id_ranges
+
+TOTAL_ID = 'total'
+KINDS = ('category', 'tag')
+DEFAULT_REBUILD_WORKERS = 4
+# JavaScript's \s, which normalizeLabel splits on
+LABEL_WHITESPACE = re.compile(r"[\t\n\v\f\r \u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff]+")
+
+
+def stats_collection_for(collection):
+    """The category_stats collection next to a tools collection"""
+    return collection.database[CATEGORY_STATS_COLLECTION]
+
+
+def normalize_label(label):
+    """The stats key of a category or tag: NFKC, whitespace collapsed, lower case
+
+    Must match normalizeLabel in services/categoryStats.js, so this lower()s
+    like toLowerCase() rather than casefold()ing like dedup.normalize_name.
+    """
+    text = unicodedata.normalize("NFKC", str(label if label is not None else ""))
+    return " ".join(part for part in LABEL_WHITESPACE.split(text) if part).lower()
+
+
+def tool_labels(tool):
+    """Map (kind, key) to the spelling of a tool's category and of each of its distinct tags"""
+    labels = {}
+    category = str(tool.get("category") or "Other")
+    key = normalize_label(category)
+    if key:
+        labels[('category', key)] = category.strip()
+    for tag in tool.get("tags") or []:
+        if isinstance(tag, str):
+            key = normalize_label(tag)
+            if key:
+                labels.setdefault(('tag', key), tag.strip())
+    return labels
+
+
+def stat_id(kind, key):
+    return f"{kind}:{key}"
+
+
+def _increment(stat, count, approved, now, fields):
+    return UpdateOne({"_id": stat}, {"$inc": {"count": count, "approved": approved}, "$set": {"updatedAt": now},
+                                     "$setOnInsert": fields}, upsert=True)
+
+
+class CategoryStats:
+    """Keeps category_stats in step with the tools an upload writes
+
+    record() is the BulkWriter's on_written callback: one unordered
+    bulk_write of $inc upserts per batch of new tools. It is thread-safe.
+    A failed update invalidates the stats instead of failing the upload.
+    """
+
+    def __init__(self, stats_collection):
+        self.collection = stats_collection
+        self.failed = False
+
+    def record(self, tools):
+        if not tools:
+            return
+        counts = Counter()
+        approved = Counter()
+        names = {}
+        for tool in tools:
+            is_approved = tool.get("status") == "approved"
+            for label, name in tool_labels(tool).items():
+                counts[label] += 1
+                approved[label] += is_approved
+                names.setdefault(label, name)
+        now = datetime.utcnow()
+        operations = [_increment(stat_id(kind, key), count, approved[kind, key], now,
+                                 {"kind": kind, "key": key, "name": names[kind, key]})
+                      for (kind, key), count in counts.items()]
+        operations.append(_increment(TOTAL_ID, len(tools), sum(tool.get("status") == "approved" for tool in tools),
+                                     now, {"kind": TOTAL_ID}))
+        try:
+            with METRICS.timed('category_stats', items=len(tools)):
+                self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"Error updating category stats: {str(e)}")
+            self.failed = True
+            invalidate(self.collection)
+
+
+def invalidate(stats_collection):
+    """Mark the stats as out of date until the next rebuild"""
+    try:
+        stats_collection.update_one({"_id": TOTAL_ID}, {"$set": {"stale": True}}, upsert=True)
+    except Exception as e:
+        print(f"Error invalidating category stats: {str(e)}")
+
+
+def current_total(collection, stats_collection=None):
+    """The stats' total document if it still matches the tools collection, else None"""
+    stats_collection = stats_collection if stats_collection is not None else stats_collection_for(collection)
+    total = stats_collection.find_one({"_id": TOTAL_ID})
+    if total is None or total.get("stale") or total.get("count") != collection.estimated_document_count():
+        return None
+    return total
+
+
+def top_labels(stats_collection, kind='category', limit=None):
+    """The (name, count) of the most used categories or tags"""
+    cursor = stats_collection.find({"kind": kind}, {"name": 1, "count": 1}).sort([("count", -1), ("key", 1)])
+    if limit:
+        cursor = cursor.limit(limit)
+    return [(document["name"], document["count"]) for document in cursor]
+
+
+def _aggregate_range(collection, query):
+    """The tools of one _id range counted by raw category, tags and approval"""
+    return list(collection.aggregate([
+        {"$match": query},
+        {"$group": {"_id": {"category": "$category", "tags": "$tags",
+                            "approved": {"$eq": ["$status", "approved"]}},
+                    "count": {"$sum": 1}}}
+    ], allowDiskUse=True))
+
+
+def _merge(groups, counts, approved, spellings, total):
+    for group in groups:
+        count = group["count"]
+        is_approved = group["_id"].get("approved", False)
+        total['count'] += count
+        total['approved'] += count if is_approved else 0
+        for label, name in tool_labels(group["_id"]).items():
+            counts[label] += count
+            approved[label] += count if is_approved else 0
+            spellings.setdefault(label, Counter())[name] += count
+
+
+def rebuild(collection, stats_collection=None, workers=DEFAULT_REBUILD_WORKERS):
+    """Recompute category_stats from the tools collection, returning the number of stats written
+
+    Each of up to workers _id ranges is aggregated on its own thread and
+    the groups' labels are merged under their normalized keys; the most used
+    spelling becomes the name. The new stats are written to a scratch
+    collection and renamed over the old ones, so readers never see a
+    partial rebuild. Tools an upload writes while this runs may be missed;
+    rebuild again afterwards.
+    """
+    stats_collection = stats_collection if stats_collection is not None else stats_collection_for(collection)
+    ranges = id_ranges(collection, workers)
+    counts = Counter()
+    approved = Counter()
+    spellings = {}
+    total = Counter()
+    with METRICS.timed('category_stats_rebuild'):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for groups in executor.map(lambda query: _aggregate_range(collection, query), ranges):
+                _merge(groups, counts, approved, spellings, total)
+
+    now = datetime.utcnow()
+    documents = [
+        {"_id": stat_id(kind, key), "kind": kind, "key": key,
+         "name": spellings[kind, key].most_common(1)[0][0], "count": count,
+         "approved": approved[kind, key], "updatedAt": now}
+        for (kind, key), count in counts.items()
+    ]
+    documents.append({"_id": TOTAL_ID, "kind": TOTAL_ID, "count": total['count'],
+                      "approved": total['approved'], "updatedAt": now})
+
+    scratch = stats_collection.database[f"{stats_collection.name}_rebuild"]
+    scratch.drop()
+    scratch.insert_many(documents)
+    scratch.create_index([("kind", 1), ("count", -1)])
+    scratch.rename(stats_collection.name, dropTarget=True)
+    print(f"Rebuilt {len(documents) - 1} category and tag stats over {total['count']} tools "
+          f"in {len(ranges)} ranges")
+    return len(documents)
@@ -0,0 +1,305 @@
+"""Command line entry point: python -m smart_ingest <command> ...
+
+Run from the repository root with "Mongo Upload" on the path, e.g.
+    PYTHONPATH="Mongo Upload" python -m smart_ingest upload AirTable/Converted --confirm
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from .backup import BACKUP_MODES, KEEP_BASES, backup_collection, list_backups, prune_backups, restore_backup
+from .bulk import DEFAULT_BATCH_SIZE, WRITE_CONCERNS
+from .cache import ParseCache
+from .categories import DEFAULT_REBUILD_WORKERS, KINDS, current_total, rebuild, stats_collection_for, top_labels
+from .config import USERS_COLLECTION, connect, get_prompts_collection, get_tools_collection
+from .export import COMPRESSIONS, DEFAULT_EXPORT_WORKERS, EXPORT_BATCH_SIZE, EXPORT_FORMATS, export_tools
+from .fetch import DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, DEFAULT_TIMEOUT
+from .metrics import DEFAULT_REPORT_PATH, METRICS, Profile, install_command_listener
+from .indexes import DEDUP_INDEXES, ensure_dedup_indexes, explain_dedup_queries, print_explain_report
+from .links import DEFAULT_MAX_IMAGE_BYTES, LINKS_BATCH_SIZE, TTL_DAYS, check_links
+from .pipeline import upload
+from .plan import plan_upload
+from .prompts import expand_prompt_sources, load_prompts
+from .scrape import DEFAULT_MAX_AGE_DAYS, SCRAPE_BATCH_SIZE, refresh_scraped_data
+from .sources import expand_sources
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def cmd_upload(args, collection):
+    source_files = expand_sources(args.sources, cache=None if args.no_cache else ParseCache())
+    if not source_files:
+        print("No JSON files found to process!")
+        return 1
+    if args.plan:
+        plan = plan_upload(collection, source_files, offline=args.offline, batch_size=args.batch_size)
+        METRICS.info['plan'] = plan['totals']
+        return 0
+    METRICS.info['upload'] = upload(collection, source_files, confirm=args.confirm, batch_size=args.batch_size,
+                                    workers=args.workers, backup_mode=args.backup_mode, resume=not args.no_resume,
+                                    near_duplicates=not args.no_near_duplicates, concurrency=args.concurrency,
+                                    adaptive_batches=args.adaptive_batches, write_concern=args.write_concern)
+    return 0
+
+
+def cmd_backup(args, collection):
+    if args.action == 'create':
+        return 0 if backup_collection(collection, "tools", mode=args.backup_mode) else 1
+
+    if args.action == 'list':
+        entries = list_backups(collection, "tools")
+        if not entries:
+            print("No incremental backups found")
+        for entry in entries:
+            print(f"{entry['createdAt']:%Y-%m-%d %H:%M:%S}  {entry['kind']:<5}  "
+                  f"{entry['documents']:>8} docs  {entry['_id']}")
+        return 0
+
+    if args.action == 'prune':
+        dropped = prune_backups(collection, "tools", args.keep)
+        print(f"Dropped {len(dropped)} backup collections")
+        return 0
+
+    if args.action == 'restore':
+        if args.into == collection.name:
+            raise ValueError("Restore into a collection other than the live tools collection")
+        at = datetime.strptime(args.at, "%Y-%m-%d %H:%M:%S") if args.at else None
+        chain = restore_backup(collection, "tools", args.into, at)
+        print(f"Restored {collection.database[args.into].estimated_document_count()} documents "
+              f"into {args.into} from:")
+        for name in chain:
+            print(f"- {name}")
+        return 0
+
+
+def cmd_prompts(args, collection):
+    prompt_files = expand_prompt_sources(args.sources)
+    if not prompt_files:
+        print("No prompt files found to process!")
+        return 1
+    client = collection.database.client
+    METRICS.info['prompts'] = load_prompts(get_prompts_collection(client), collection.database[USERS_COLLECTION],
+                                           prompt_files, confirm=args.confirm, batch_size=args.batch_size)
+    return 0
+
+
+def cmd_indexes(args, collection):
+    unique = ensure_dedup_indexes(collection)
+    names = ", ".join(options["name"] for options in DEDUP_INDEXES.values())
+    if unique:
+        print(f"{names} are unique: uploads insert and rely on duplicate key errors")
+    else:
+        print(f"{names} are not both unique: uploads upsert against the indexed name/website filter")
+        print("Remove the duplicates and drop the non-unique index to make it unique")
+    print("\nDuplicate probe plans:")
+    return 0 if print_explain_report(explain_dedup_queries(collection)) else 1
+
+
+def cmd_stats(args, collection):
+    if args.action == 'rebuild':
+        rebuild(collection, workers=args.workers)
+        return 0
+
+    stats_collection = stats_collection_for(collection)
+    if current_total(collection, stats_collection) is None:
+        print("Category stats are missing or out of date, run: python -m smart_ingest stats rebuild")
+        return 1
+    for name, count in top_labels(stats_collection, args.kind, args.limit):
+        print(f"{count:>8}  {name}")
+    return 0
+
+
+def cmd_export(args, collection):
+    METRICS.info['export'] = export_tools(collection, args.path, output_format=args.format,
+                                          compression=args.compress, workers=args.workers,
+                                          batch_size=args.batch_size)
+    return 0
+
+
+def cmd_scrape(args, collection):
+    METRICS.info['scrape'] = refresh_scraped_data(collection, confirm=args.confirm, limit=args.limit,
+                                                  max_age_days=args.max_age_days, concurrency=args.concurrency,
+                                                  per_host=args.per_host, timeout=args.timeout,
+                                                  batch_size=args.batch_size)
+    return 0
+
+
+def cmd_links(args, collection):
+    METRICS.info['links'] = check_links(collection, confirm=args.confirm, ttl_days=args.ttl_days,
+                                        max_image_bytes=args.max_image_kb * 1024, concurrency=args.concurrency,
+                                        per_host=args.per_host, timeout=args.timeout, batch_size=args.batch_size)
+    return 0
+
+
+def run_options():
+    """Reporting options shared by the commands that load data"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--report", default=DEFAULT_REPORT_PATH,
+                        help="Write the JSON run report with per-stage metrics here (default: %(default)s)")
+    parser.add_argument("--prometheus", metavar="PATH", help="Also write the metrics as a Prometheus textfile")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write cProfile and tracemalloc output to ingest_profile.prof/.txt")
+    return parser
+
+
+def write_run_report(args, argv, exit_code):
+    METRICS.info['command'] = argv
+    METRICS.info['exit_code'] = exit_code
+    try:
+        METRICS.write_report(args.report)
+        print(f"Run report written to {args.report}")
+        if args.prometheus:
+            METRICS.write_prometheus(args.prometheus)
+    except OSError as e:
+        print(f"Error writing run report: {str(e)}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="smart_ingest", description="Load AI tools into MongoDB")
+    commands = parser.add_subparsers(dest="command", required=True)
+    reporting = run_options()
+
+    upload_parser = commands.add_parser("upload", parents=[reporting],
+                                        help="Upload tools from AirTable or Converted JSON files")
+    upload_parser.add_argument("sources", nargs="*",
+                               help="Files, directories or globs, optionally prefixed with airtable: or "
+                                    "converted: (default: AirTable/Converted)")
+    run_mode = upload_parser.add_mutually_exclusive_group()
+    run_mode.add_argument("--confirm", action="store_true", help="Actually run the upload")
+    run_mode.add_argument("--plan", action="store_true",
+                          help="Compute the exact new/skipped counts offline and save them for --confirm")
+    upload_parser.add_argument("--offline", action="store_true",
+                               help="With --plan, use the cached snapshot of stored tools without querying MongoDB")
+    upload_parser.add_argument("--batch-size", type=positive_int, default=DEFAULT_BATCH_SIZE)
+    upload_parser.add_argument("--adaptive-batches", action="store_true",
+                               help="Grow or shrink batches with the write latency, starting at --batch-size")
+    upload_parser.add_argument("--write-concern", choices=sorted(WRITE_CONCERNS),
+                               help="fast: w=1 without journaling, for backfills; safe: majority, journaled "
+                                    "(default: the connection's)")
+    upload_parser.add_argument("--workers", type=positive_int, default=1,
+                               help="Transform files in N processes and write with N threads")
+    upload_parser.add_argument("--concurrency", type=positive_int,
+                               help="Write with asyncio, keeping up to N batches in flight")
+    upload_parser.add_argument("--backup-mode", choices=BACKUP_MODES, default="incremental")
+    upload_parser.add_argument("--no-resume", action="store_true",
+                               help="Ignore checkpoints and re-read every file")
+    upload_parser.add_argument("--no-near-duplicates", action="store_true",
+                               help="Skip the MinHash check for tools with similar descriptions")
+    upload_parser.add_argument("--no-cache", action="store_true",
+                               help="Parse every file, without reading or filling the parse cache")
+    upload_parser.set_defaults(handler=cmd_upload)
+
+    backup_parser = commands.add_parser("backup", help="Create, list, prune or restore backups of the tools")
+    backup_actions = backup_parser.add_subparsers(dest="action", required=True)
+    create_parser = backup_actions.add_parser("create", aliases=["backup"], help="Back up the tools collection")
+    create_parser.add_argument("--backup-mode", choices=BACKUP_MODES, default="incremental")
+    create_parser.set_defaults(action="create")
+    backup_actions.add_parser("list", help="List incremental backups")
+    prune_parser = backup_actions.add_parser("prune", help="Drop old backup generations")
+    prune_parser.add_argument("--keep", type=positive_int, default=KEEP_BASES, help="Base generations to keep")
+    restore_parser = backup_actions.add_parser("restore", help="Rebuild a point in time into another collection")
+    restore_parser.add_argument("--into", required=True, help="Collection to restore into")
+    restore_parser.add_argument("--at", help='Point in time, "YYYY-MM-DD HH:MM:SS" in UTC (default: latest)')
+    backup_parser.set_defaults(handler=cmd_backup)
+
+    stats_parser = commands.add_parser("stats", help="Show or rebuild the category and tag counts")
+    stats_actions = stats_parser.add_subparsers(dest="action", required=True)
+    show_parser = stats_actions.add_parser("show", help="List the most used categories or tags")
+    show_parser.add_argument("--kind", choices=KINDS, default="category")
+    show_parser.add_argument("--limit", type=positive_int, default=20)
+    rebuild_parser = stats_actions.add_parser("rebuild", help="Recompute the counts from the tools collection")
+    rebuild_parser.add_argument("--workers", type=positive_int, default=DEFAULT_REBUILD_WORKERS,
+                                help="_id ranges aggregated in parallel (default: %(default)s)")
+    stats_parser.set_defaults(handler=cmd_stats)
+
+    export_parser = commands.add_parser("export", parents=[reporting],
+                                        help="Export the tools to JSONL or Converted JSON")
+    export_parser.add_argument("path", help="Output file, e.g. tools.jsonl.gz or AirTable/Converted/snapshot.json")
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS,
+                               help="Default: jsonl for *.jsonl[.gz|.zst] paths, converted otherwise")
+    export_parser.add_argument("--compress", choices=COMPRESSIONS,
+                               help="Default: from a .gz or .zst suffix; zstd needs the zstandard package")
+    export_parser.add_argument("--workers", type=positive_int, default=DEFAULT_EXPORT_WORKERS,
+                               help="_id ranges scanned in parallel (default: %(default)s)")
+    export_parser.add_argument("--batch-size", type=positive_int, default=EXPORT_BATCH_SIZE)
+    export_parser.set_defaults(handler=cmd_export)
+
+    scrape_parser = commands.add_parser("scrape", parents=[reporting],
+                                        help="Refresh the scrapedData of the tools scraped longest ago")
+    scrape_parser.add_argument("--confirm", action="store_true", help="Actually scrape (default: count the tools due)")
+    scrape_parser.add_argument("--limit", type=positive_int, help="Scrape at most N tools, the stalest first")
+    scrape_parser.add_argument("--max-age-days", type=positive_int, default=DEFAULT_MAX_AGE_DAYS,
+                               help="Refresh tools not scraped for this long (default: %(default)s)")
+    scrape_parser.add_argument("--concurrency", type=positive_int, default=DEFAULT_CONCURRENCY,
+                               help="Requests in flight (default: %(default)s)")
+    scrape_parser.add_argument("--per-host", type=positive_int, default=DEFAULT_PER_HOST,
+                               help="Requests in flight to any one host (default: %(default)s)")
+    scrape_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds per request")
+    scrape_parser.add_argument("--batch-size", type=positive_int, default=SCRAPE_BATCH_SIZE)
+    scrape_parser.set_defaults(handler=cmd_scrape)
+
+    links_parser = commands.add_parser("links", parents=[reporting],
+                                       help="Check the tools' website and image URLs and store their health")
+    links_parser.add_argument("--confirm", action="store_true", help="Actually check (default: count the URLs due)")
+    links_parser.add_argument("--ttl-days", type=positive_int, default=TTL_DAYS,
+                              help="Recheck working URLs after this long; failures after a day (default: %(default)s)")
+    links_parser.add_argument("--max-image-kb", type=positive_int, default=DEFAULT_MAX_IMAGE_BYTES // 1024,
+                              help="Flag larger images as oversized (default: %(default)s)")
+    links_parser.add_argument("--concurrency", type=positive_int, default=DEFAULT_CONCURRENCY,
+                              help="Requests in flight (default: %(default)s)")
+    links_parser.add_argument("--per-host", type=positive_int, default=DEFAULT_PER_HOST,
+                              help="Requests in flight to any one host (default: %(default)s)")
+    links_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds per request")
+    links_parser.add_argument("--batch-size", type=positive_int, default=LINKS_BATCH_SIZE)
+    links_parser.set_defaults(handler=cmd_links)
+
+    indexes_parser = commands.add_parser("indexes", help="Create or check the dedup indexes and explain the probes")
+    indexes_parser.set_defaults(handler=cmd_indexes)
+
+    prompts_parser = commands.add_parser("prompts", parents=[reporting],
+                                         help="Load the Bulk Prompts library into smartprompts")
+    prompts_parser.add_argument("sources", nargs="*",
+                                help="Prompt files, directories or globs (default: Bulk Prompts)")
+    prompts_parser.add_argument("--confirm", action="store_true", help="Actually write the prompts")
+    prompts_parser.add_argument("--batch-size", type=positive_int, default=DEFAULT_BATCH_SIZE)
+    prompts_parser.set_defaults(handler=cmd_prompts)
+
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv)
+    reporting = hasattr(args, 'report')
+    if reporting:
+        METRICS.reset()
+        install_command_listener()
+    profile = Profile() if getattr(args, 'profile', False) else None
+    if profile is not None:
+        profile.start()
+
+    exit_code = 1
+    client = None
+    try:
+        # An offline plan reads only the cached snapshot, so it runs without MONGODB_URI
+        offline = getattr(args, 'plan', False) and getattr(args, 'offline', False)
+        if not offline:
+            client = connect()
+        exit_code = args.handler(args, get_tools_collection(client) if client is not None else None)
+        return exit_code
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        METRICS.info['error'] = str(e)
+        return 1
+    finally:
+        if client is not None:
+            client.close()
+        if profile is not None:
+            profile.stop()
+        if reporting:
+            write_run_report(args, argv, exit_code)
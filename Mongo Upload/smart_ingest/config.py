@@ -0,0 +1,53 @@
+import os
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # pymongo < 4.10
+    try:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+    except ImportError:
+        AsyncMongoClient = None
+
+# Paths are relative to the repository root, where the scripts are run from
+ENV_PATH = 'ai-tools-directory/server/.env'
+DATABASE_NAME = 'test'  # Using 'test' as it's the default MongoDB database
+TOOLS_COLLECTION = 'tools'
+PROMPTS_COLLECTION = 'smartprompts'  # Mongoose's collection for the SmartPrompt model
+USERS_COLLECTION = 'users'
+CATEGORY_STATS_COLLECTION = 'category_stats'  # Maintained by the upload, see categories.py
+
+
+def get_mongodb_uri():
+    """Read MONGODB_URI from the server's .env file"""
+    load_dotenv(ENV_PATH)
+    mongodb_uri = os.getenv('MONGODB_URI')
+    if not mongodb_uri:
+        raise ValueError("MongoDB URI not found in .env file")
+    return mongodb_uri
+
+
+def connect(**client_options):
+    """Connect to MongoDB using the URI from the server's .env file"""
+    return MongoClient(get_mongodb_uri(), **client_options)
+
+
+def connect_async(**client_options):
+    """Async client for the same URI, or None when neither pymongo's nor Motor's is installed"""
+    if AsyncMongoClient is None:
+        return None
+    return AsyncMongoClient(get_mongodb_uri(), **client_options)
+
+
+def get_database(client):
+    return client[DATABASE_NAME]
+
+
+def get_tools_collection(client):
+    return get_database(client)[TOOLS_COLLECTION]
+
+
+def get_prompts_collection(client):
+    return get_database(client)[PROMPTS_COLLECTION]
@@ -0,0 +1,164 @@
+import time
+import unicodedata
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from bson import ObjectId
+from pymongo.collation import Collation, CollationStrength
+
+DEFAULT_SCAN_BATCH_SIZE = 10000
+# Bumped whenever normalize_name or canonical_url change, so keys cached on disk are rebuilt
+DEDUP_KEY_VERSION = 2
+# Local scan state is rebuilt from scratch at least this often
+FULL_SCAN_DAYS = 7
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {'ref', 'ref_src', 'via', 'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid',
+                   'mc_cid', 'mc_eid', '_ga', '_hsenc', '_hsmi', 'igshid'}
+DEFAULT_PORTS = {'80', '443'}
+
+# Case-insensitive comparison, used by the dedup indexes and the queries that must hit them
+DEDUP_COLLATION = Collation(locale='en', strength=CollationStrength.SECONDARY)
+
+
+def normalize_name(name):
+    """Normalize a tool name for duplicate checks"""
+    return " ".join(unicodedata.normalize("NFKC", str(name or "")).split()).casefold()
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name.startswith("utm_") or name in TRACKING_PARAMS
+
+
+def canonical_url(url):
+    """Reduce a URL to the parts that identify the site
+
+    Drops the scheme, "www.", default ports, the fragment, tracking
+    parameters and trailing slashes, and sorts the remaining query, so
+    https://x.ai/ and http://www.x.ai?utm_source=feed give the same key.
+    Only the host is lower cased; paths such as github.com/Owner/Repo can
+    be case-sensitive.
+    """
+    url = str(url or "").strip()
+    if not url:
+        return ""
+    if "://" not in url:
+        url = "//" + url.lstrip("/")
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        port = parts.port
+    except ValueError:
+        return url.lower().rstrip("/")
+    if host.startswith("www."):
+        host = host[4:]
+    if port is not None and str(port) not in DEFAULT_PORTS:
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/")
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not is_tracking_param(key))
+    canonical = host + path
+    if query:
+        canonical += "?" + urlencode(query)
+    return canonical
+
+
+def normalize_website(website):
+    """Normalize a website URL for duplicate checks"""
+    return canonical_url(website)
+
+
+class IncrementalScan:
+    """Base for local state built from a scan of the tools and then kept up to date
+
+    The state records the newest _id scanned and how many tools it covers,
+    so sync() only scans tools added since. Tools deleted or inserted below
+    that _id change the number of tools at or below it, and the state is
+    then rebuilt from scratch; so it is every FULL_SCAN_DAYS, for changes
+    that cancel out. Subclasses set PROJECTION and implement _clear() and
+    _add(tool), which returns whether the tool counts towards sync()'s
+    result.
+    """
+
+    PROJECTION = {}
+
+    def reset(self):
+        self._clear()
+        self.count = 0
+        self.last_id = None
+        self.full_scan_at = None
+
+    def scan_state(self):
+        return {'count': self.count, 'last_id': str(self.last_id) if self.last_id else None,
+                'full_scan_at': self.full_scan_at}
+
+    def load_scan_state(self, data):
+        self.count = data.get('count', 0)
+        self.last_id = ObjectId(data['last_id']) if data.get('last_id') else None
+        self.full_scan_at = data.get('full_scan_at')
+
+    def sync(self, collection, batch_size=DEFAULT_SCAN_BATCH_SIZE):
+        """Scan the tools added since the last sync, or all of them if others changed, returning how many counted"""
+        if self.last_id is None or self._full_scan_due() \
+                or collection.count_documents({"_id": {"$lte": self.last_id}}) != self.count:
+            self.reset()
+            self.full_scan_at = time.time()
+            return self._scan(collection, {}, batch_size)
+        return self._scan(collection, {"_id": {"$gt": self.last_id}}, batch_size)
+
+    def _full_scan_due(self):
+        return self.full_scan_at is None or time.time() - self.full_scan_at >= FULL_SCAN_DAYS * 86400
+
+    def _scan(self, collection, query, batch_size):
+        cursor = collection.find(query, self.PROJECTION, batch_size=batch_size).sort("_id", 1)
+        counted = 0
+        for tool in cursor:
+            self.count += 1
+            self.last_id = tool["_id"]
+            counted += bool(self._add(tool))
+        return counted
+
+
+class DedupIndex:
+    """In-memory set of known tool names and canonical websites
+
+    Built from one projected scan of the collection, then kept up to date as
+    tools are queued, so duplicates inside the input and across files are
+    caught without a query per tool.
+    """
+
+    def __init__(self):
+        self.names = set()
+        self.websites = set()
+
+    @classmethod
+    def load(cls, collection, batch_size=DEFAULT_SCAN_BATCH_SIZE):
+        """Build the index from the name and website of every stored tool"""
+        index = cls()
+        cursor = collection.find({}, {"name": 1, "website": 1, "_id": 0}, batch_size=batch_size)
+        for doc in cursor:
+            index.add(doc)
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def contains(self, tool):
+        """Check whether a tool matches a known name or website"""
+        name = normalize_name(tool.get("name"))
+        website = normalize_website(tool.get("website"))
+        return bool((name and name in self.names) or (website and website in self.websites))
+
+    def add(self, tool):
+        """Record a tool's name and website"""
+        name = normalize_name(tool.get("name"))
+        website = normalize_website(tool.get("website"))
+        if name:
+            self.names.add(name)
+        if website:
+            self.websites.add(website)
+
+    def discard(self, tool):
+        """Forget a tool whose write failed so a later copy can still be inserted"""
+        self.names.discard(normalize_name(tool.get("name")))
+        self.websites.discard(normalize_website(tool.get("website")))
@@ -0,0 +1,210 @@
+"""Export the tools collection to JSONL or Converted JSON
+
+The collection is split into _id ranges (see ranges.py) and each range is
+scanned on its own thread, streaming its tools a cursor batch at a time
+into a part file next to the output. The parts are then appended in _id
+order, so the export is sorted however the ranges finish, and no more
+than a batch per worker is ever held in memory.
+
+- jsonl: one whole document per line, _id included, in MongoDB's relaxed
+  Extended JSON ({"$oid": ...}, {"$date": ...}), so bson.json_util.loads
+  or mongoimport restores every type, date precision and _id exactly
+- converted: {"tools": [...]} with exactly the fields the uploaders read,
+  so the file uploads again as a converted: source; dates are written
+  "YYYY-MM-DD HH:MM:SS" as in the Converted files
+
+With compression every part, and every
+separator between them, is its own gzip member or zstd frame; concatenated
+they form one valid stream, so parts are copied as they are instead of
+being decompressed and compressed again. zstd needs the zstandard package.
+"""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from bson import ObjectId, json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+
+from .backup import format_bytes
+from .metrics import METRICS
+from .ranges import id_ranges
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXPORT_FORMATS = ('jsonl', 'converted')
+COMPRESSIONS = ('gzip', 'zstd')
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+DEFAULT_EXPORT_WORKERS = 4
+EXPORT_BATCH_SIZE = 1000
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# The fields of a Converted entry, in the order of the files in AirTable/Converted
+CONVERTED_FIELDS = ('name', 'description', 'website', 'image', 'category', 'pricing', 'features', 'tags',
+                    'submittedBy', 'status', 'rating', 'createdAt', 'updatedAt')
+
+
+def export_options(path, output_format=None, compression=None):
+    """The format and compression of an export, inferred from the file name where not given
+
+    "tools.jsonl.gz" is gzipped JSONL, "tools.json.zst" zstd Converted JSON.
+    """
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    if compression is None and suffixes:
+        compression = COMPRESSION_SUFFIXES.get(suffixes[-1])
+    if compression is not None and suffixes and suffixes[-1] in COMPRESSION_SUFFIXES:
+        suffixes = suffixes[:-1]
+    if output_format is None:
+        output_format = 'jsonl' if suffixes and suffixes[-1] == '.jsonl' else 'converted'
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {output_format}")
+    if compression not in (None,) + COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+    return output_format, compression
+
+
+def _open(path, compression):
+    """A binary writer for path, compressing to a single gzip member or zstd frame"""
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=6)
+    file = open(path, 'wb')
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().stream_writer(file, closefd=True)
+    return file
+
+
+def _converted_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.strftime(TIMESTAMP_FORMAT)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def converted_entry(tool):
+    """A stored tool as an entry of a Converted {"tools": [...]} file"""
+    rating = tool.get("rating") or {}
+    entry = {field: tool[field] for field in CONVERTED_FIELDS if field in tool}
+    entry["rating"] = {"average": rating.get("average", 0), "count": rating.get("count", 0)}
+    return entry
+
+
+def _export_range(collection, query, part_path, output_format, compression, batch_size):
+    """Write the tools of one _id range to a part file, returning (count, bytes before compression)
+
+    Converted entries are separated by ",\\n" within the part; the
+    separators between parts are added when they are joined.
+    """
+    projection = {field: 1 for field in CONVERTED_FIELDS} if output_format == 'converted' else None
+    cursor = collection.find(query, projection, batch_size=batch_size).sort("_id", 1)
+    count = 0
+    size = 0
+    lines = []
+    started = time.perf_counter()
+    with _open(part_path, compression) as file:
+        for tool in cursor:
+            if output_format == 'converted':
+                lines.append("    " + json.dumps(converted_entry(tool), ensure_ascii=False, default=_converted_default))
+            else:
+                lines.append(json_util.dumps(tool, json_options=RELAXED_JSON_OPTIONS, ensure_ascii=False))
+            if len(lines) >= batch_size:
+                size += _write_lines(file, lines, output_format, count)
+                METRICS.observe('export', time.perf_counter() - started, items=len(lines))
+                count += len(lines)
+                lines = []
+                started = time.perf_counter()
+        if lines:
+            size += _write_lines(file, lines, output_format, count)
+            METRICS.observe('export', time.perf_counter() - started, items=len(lines))
+            count += len(lines)
+    return count, size
+
+
+def _write_lines(file, lines, output_format, written):
+    if output_format == 'converted':
+        data = (",\n" if written else "") + ",\n".join(lines)
+    else:
+        data = "\n".join(lines) + "\n"
+    data = data.encode('utf-8')
+    file.write(data)
+    return len(data)
+
+
+def _member(text, compression):
+    """text encoded as a gzip member or zstd frame of its own, or as is"""
+    data = text.encode('utf-8')
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def export_tools(collection, path, output_format=None, compression=None, workers=DEFAULT_EXPORT_WORKERS,
+                 batch_size=EXPORT_BATCH_SIZE, query=None):
+    """Export the tools matching query to path, returning a summary
+
+    The output is written to a temporary file and moved over path once
+    complete, so an interrupted export leaves any earlier one untouched.
+    """
+    output_format, compression = export_options(path, output_format, compression)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    start_time = time.time()
+    ranges = id_ranges(collection, workers, query)
+    part_dir = Path(tempfile.mkdtemp(prefix=f".{path.name}.", dir=path.parent))
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        part_paths = [part_dir / f"{number:04d}.part" for number in range(len(ranges))]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda job: _export_range(collection, job[0], job[1], output_format, compression, batch_size),
+                zip(ranges, part_paths)))
+
+        with METRICS.timed('export_join', items=len(part_paths)):
+            with open(temp_path, 'wb') as file:
+                if output_format == 'converted':
+                    file.write(_member('{\n  "tools": [\n', compression))
+                written = 0
+                for part_path, (count, _) in zip(part_paths, results):
+                    if not count:
+                        continue
+                    if written and output_format == 'converted':
+                        file.write(_member(",\n", compression))
+                    with open(part_path, 'rb') as part:
+                        shutil.copyfileobj(part, file, 1024 * 1024)
+                    written += count
+                if output_format == 'converted':
+                    file.write(_member("\n  ]\n}\n", compression))
+        os.replace(temp_path, path)
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+        if temp_path.exists():
+            temp_path.unlink()
+
+    elapsed = time.time() - start_time
+    count = sum(count for count, _ in results)
+    size = os.path.getsize(path)
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"Exported {count} tools to {path} ({format_bytes(size)}, {output_format}"
+          f"{', ' + compression if compression else ''}) from {len(ranges)} ranges "
+          f"in {elapsed:.1f}s ({rate:.0f} tools/s)")
+    return {
+        "path": str(path),
+        "format": output_format,
+        "compression": compression,
+        "documents": count,
+        "json_bytes": sum(size for _, size in results),
+        "bytes": size,
+        "ranges": len(ranges),
+        "seconds": round(elapsed, 3)
+    }
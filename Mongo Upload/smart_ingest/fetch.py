@@ -0,0 +1,154 @@
+"""Pooled async HTTP requests with a concurrency limit per host
+
+Used by the scrapedData refresh (scrape.py) and the link checker
+(links.py). Requests go through aiohttp when it is installed: one session,
+keep-alive connections shared by every task. Without it the standard
+library's urllib runs them on threads, which is slower but behaves the
+same, so the workers run (and can be tried against a local http.server)
+with nothing extra installed.
+
+Redirects are followed here rather than by the backend, so both keep the
+method (a HEAD stays a HEAD), every hop counts against its host's limit and
+the chain is reported.
+"""
+import asyncio
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from urllib.parse import urljoin, urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+USER_AGENT = 'smart-ingest/1.0 (AI tools directory)'
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST = 2
+DEFAULT_TIMEOUT = 20.0
+MAX_REDIRECTS = 10
+# Tasks a caller runs per request slot, so tasks waiting on a busy host leave others to fetch from the rest
+TASKS_PER_SLOT = 4
+# Bodies are cut here; pages this large are not read past it
+DEFAULT_MAX_BODY = 2 * 1024 * 1024
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class Response:
+    """Outcome of a request: status, headers (lower case names) and body, or the error that prevented one"""
+
+    def __init__(self, url, status=None, headers=None, body=b'', redirects=(), error=None):
+        self.url = url
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+        self.redirects = list(redirects)
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status is not None and 200 <= self.status < 300
+
+    def text(self):
+        """The body decoded with the charset of its Content-Type, UTF-8 by default"""
+        content_type = self.headers.get('content-type', '')
+        charset = 'utf-8'
+        for parameter in content_type.split(';')[1:]:
+            name, _, value = parameter.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                charset = value.strip('"\'')
+        try:
+            return self.body.decode(charset, errors='replace')
+        except LookupError:
+            return self.body.decode('utf-8', errors='replace')
+
+
+def describe_error(error):
+    message = str(error)
+    return f"{type(error).__name__}: {message}" if message else type(error).__name__
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class HttpClient:
+    """Async HTTP client limiting requests overall and per host
+
+    Use as "async with HttpClient() as client"; request() never raises for
+    network errors or timeouts, it returns a Response with error set.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT,
+                 user_agent=USER_AGENT):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.session = None
+        self.opener = None
+        self._slots = None
+        self._host_slots = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+
+    async def __aenter__(self):
+        self._slots = asyncio.Semaphore(self.concurrency)
+        if aiohttp is not None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host,
+                                             ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                                 headers={'User-Agent': self.user_agent})
+        else:
+            self.opener = urllib.request.build_opener(_NoRedirect())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.session is not None:
+            await self.session.close()
+
+    @property
+    def backend(self):
+        return 'aiohttp' if self.session is not None else 'urllib'
+
+    async def request(self, method, url, headers=None, max_body=DEFAULT_MAX_BODY):
+        """Send the request, following redirects, and read at most max_body bytes of the final body"""
+        redirects = []
+        for _ in range(MAX_REDIRECTS + 1):
+            host = urlsplit(url).netloc.lower()
+            try:
+                # The host's slot first, so tasks queued on a busy host don't hold the overall ones
+                async with self._host_slots[host], self._slots:
+                    if self.session is not None:
+                        status, response_headers, body = await self._send_aiohttp(method, url, headers, max_body)
+                    else:
+                        status, response_headers, body = await asyncio.to_thread(
+                            self._send_urllib, method, url, headers, max_body)
+            except Exception as e:
+                return Response(url, redirects=redirects, error=describe_error(e))
+            location = response_headers.get('location')
+            if status not in REDIRECT_STATUSES or not location:
+                return Response(url, status, response_headers, body, redirects)
+            redirects.append((status, url))
+            url = urljoin(url, location)
+            if status == 303 and method != 'HEAD':
+                method = 'GET'
+        return Response(url, redirects=redirects, error=f"More than {MAX_REDIRECTS} redirects")
+
+    async def _send_aiohttp(self, method, url, headers, max_body):
+        async with self.session.request(method, url, headers=headers, allow_redirects=False) as response:
+            body = await response.content.read(max_body) if method != 'HEAD' else b''
+            return response.status, {name.lower(): value for name, value in response.headers.items()}, body
+
+    def _send_urllib(self, method, url, headers, max_body):
+        request = urllib.request.Request(url, method=method, headers={'User-Agent': self.user_agent, **(headers or {})})
+        try:
+            response = self.opener.open(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            # 3xx (redirects are not followed by the opener), 4xx and 5xx
+            response = e
+        try:
+            body = response.read(max_body) if method != 'HEAD' else b''
+            return response.code, {name.lower(): value for name, value in response.headers.items()}, body
+        finally:
+            response.close()
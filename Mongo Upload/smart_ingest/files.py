@@ -0,0 +1,40 @@
+"""The state files kept between runs: manifest, snapshot, plan, signatures and link cache
+
+Each is written to a temporary file that is then moved over the old one,
+so an interrupted run leaves the previous version intact. Reading one
+that is missing or unreadable gives None, and its loader starts empty:
+a lost state file only costs the work it saved.
+"""
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def atomic_open(path, compress=False):
+    """Open a text file that replaces path once the block completes, gzipped with compress"""
+    path = Path(path)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with (gzip.open if compress else open)(temp_path, 'wt', encoding='utf-8') as file:
+            yield file
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def write_atomic(path, text, compress=False):
+    with atomic_open(path, compress) as file:
+        file.write(text)
+
+
+def read_json(path, compress=False):
+    """The parsed contents of path, or None"""
+    try:
+        with (gzip.open if compress else open)(path, 'rt', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, EOFError, ValueError):
+        return None
@@ -0,0 +1,126 @@
+"""Indexes for the duplicate checks on tools
+
+Tool.js only indexes text(name, description), category, status and the
+favorite fields, so the {"$or": [{"name"}, {"website"}]} probe of every
+upsert scans the collection. These case-insensitive indexes on name and
+website back that probe. When the stored tools have no duplicates they are
+unique, and uploads then insert and let duplicate key errors do the dedup.
+
+Only the indexes command creates them: unique ones also reject tools the
+server saves with a name or website differing only in case (the routes
+answer 409), so that is left as a deliberate step. Uploads just check
+which ones exist.
+"""
+from pymongo.errors import OperationFailure
+
+from .bulk import DUPLICATE_KEY_ERROR, duplicate_filter
+from .dedup import DEDUP_COLLATION
+
+# Keyed by field. Tools without a website are left out of its index so they don't collide
+DEDUP_INDEXES = {
+    "name": {"name": "name_dedup"},
+    "website": {"name": "website_dedup", "partialFilterExpression": {"website": {"$gt": ""}}}
+}
+
+
+def find_duplicates(collection, field, limit=5):
+    """A few values of field stored more than once, compared case-insensitively"""
+    pipeline = [
+        {"$match": {field: {"$gt": ""}}},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit}
+    ]
+    return list(collection.aggregate(pipeline, collation=DEDUP_COLLATION, allowDiskUse=True))
+
+
+def ensure_index(collection, field, options, existing):
+    """Create one dedup index, unique unless stored duplicates prevent it
+
+    Returns whether the index is unique.
+    """
+    name = options["name"]
+    if name in existing:
+        return bool(existing[name].get("unique"))
+
+    try:
+        collection.create_index(field, collation=DEDUP_COLLATION, unique=True, **options)
+        print(f"Created unique index {name}")
+        return True
+    except OperationFailure as e:
+        if e.code != DUPLICATE_KEY_ERROR:
+            raise
+
+    duplicates = find_duplicates(collection, field)
+    print(f"Stored tools share a {field}, so {name} is not unique. For example:")
+    for duplicate in duplicates:
+        print(f"- {duplicate['_id']!r} ({duplicate['count']} tools)")
+    collection.create_index(field, collation=DEDUP_COLLATION, **options)
+    print(f"Created index {name}")
+    return False
+
+
+def ensure_dedup_indexes(collection):
+    """Create or check the name and website indexes
+
+    Returns True when both are unique, i.e. inserts can rely on duplicate
+    key errors instead of upserting against a filter.
+    """
+    existing = collection.index_information()
+    unique = True
+    for field, options in DEDUP_INDEXES.items():
+        unique = ensure_index(collection, field, options, existing) and unique
+    return unique
+
+
+def dedup_indexes_unique(collection):
+    """Whether both dedup indexes exist and are unique, without creating them"""
+    existing = collection.index_information()
+    missing = [options["name"] for options in DEDUP_INDEXES.values() if options["name"] not in existing]
+    if missing:
+        print(f"No {' or '.join(missing)} index, so duplicate probes scan the collection. "
+              f"Create them with: python -m smart_ingest indexes")
+    return not missing and all(existing[options["name"]].get("unique") for options in DEDUP_INDEXES.values())
+
+
+def plan_stages(plan):
+    """Flatten a winning plan into (stage, index name) pairs"""
+    plan = plan.get("queryPlan", plan)  # The slot based engine nests the classic tree here
+    stages = [(plan.get("stage"), plan.get("indexName"))]
+    children = plan.get("inputStages", [])
+    if "inputStage" in plan:
+        children = [plan["inputStage"]]
+    for child in children:
+        stages.extend(plan_stages(child))
+    return stages
+
+
+def explain_dedup_queries(collection):
+    """Explain the duplicate probes an upload runs, returning [(label, stages)]"""
+    sample = collection.find_one({"website": {"$gt": ""}}, {"name": 1, "website": 1})
+    if sample is None:
+        sample = {"name": "Example Tool", "website": "https://example.com"}
+    probes = [
+        ("name", {"name": sample["name"]}),
+        ("website", {"website": sample["website"]}),
+        ("name or website", duplicate_filter(sample))
+    ]
+    report = []
+    for label, query in probes:
+        explanation = collection.find(query).collation(DEDUP_COLLATION).explain()
+        report.append((label, plan_stages(explanation["queryPlanner"]["winningPlan"])))
+    return report
+
+
+def print_explain_report(report):
+    """Print each probe's plan and return whether all of them use an index"""
+    all_indexed = True
+    for label, stages in report:
+        indexes = [index for stage, index in stages if stage == "IXSCAN"]
+        collection_scan = any(stage == "COLLSCAN" for stage, _ in stages)
+        indexed = bool(indexes) and not collection_scan
+        all_indexed = all_indexed and indexed
+        plan = " -> ".join(stage for stage, _ in stages)
+        result = f"IXSCAN on {', '.join(indexes)}" if indexed else "NOT INDEXED"
+        print(f"{label:<16} {result:<40} {plan}")
+    return all_indexed
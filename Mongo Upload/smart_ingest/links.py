@@ -0,0 +1,253 @@
+"""Check that the tools' websites and images still load
+
+Every distinct website and image URL is requested once, concurrently,
+through fetch.HttpClient: a HEAD first, then a GET of the first byte
+(Range: bytes=0-0) when the server rejects HEAD or it fails, since many
+do. Each tool then gets a linkHealth.website and linkHealth.image state:
+
+    ok          answered 2xx at the URL itself
+    redirected  answered 2xx after redirects; url holds where it ended up
+    broken      4xx, 5xx, or no answer at all (DNS, TLS, timeout...)
+    oversized   an image larger than max_image_bytes
+    not_image   an image URL that does not serve an image
+    invalid     not an http(s) URL, such as a raw AirTable Gallery value
+
+Results are kept in .ingest_links.json.gz: working links for TTL_DAYS and
+failures for FAILED_TTL_DAYS, so a rerun only requests the expired ones and
+a dead site is retried sooner. The states are written with unordered
+bulk_writes, with updatedAt so incremental backups pick them up, only
+for tools whose health changed.
+"""
+import asyncio
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import zip_longest
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from pymongo import UpdateOne
+
+from .bulk import PROGRESS_INTERVAL
+from .fetch import DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, DEFAULT_TIMEOUT, TASKS_PER_SLOT, HttpClient
+from .files import atomic_open, read_json
+from .metrics import METRICS
+
+DEFAULT_LINKS_PATH = '.ingest_links.json.gz'
+LINKS_CACHE_VERSION = 1
+TTL_DAYS = 7
+FAILED_TTL_DAYS = 1
+DEFAULT_MAX_IMAGE_BYTES = 500 * 1024
+LINKS_BATCH_SIZE = 500
+LINK_FIELDS = ('website', 'image')
+EPOCH = datetime(1970, 1, 1)
+
+
+def now_ms():
+    # Milliseconds, as MongoDB stores dates, so stored checkedAt values compare equal
+    return int(time.time() * 1000)
+
+
+class LinkCache:
+    """The last result for each URL, persisted between runs"""
+
+    def __init__(self, path=DEFAULT_LINKS_PATH, entries=None):
+        self.path = Path(path)
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_LINKS_PATH):
+        """Read the cached results"""
+        data = read_json(path, compress=True)
+        if data is None or data.get('version') != LINKS_CACHE_VERSION:
+            return cls(path)
+        return cls(path, data.get('urls', {}))
+
+    def save(self):
+        """Write the results atomically"""
+        with atomic_open(self.path, compress=True) as file:
+            json.dump({'version': LINKS_CACHE_VERSION, 'urls': self.entries}, file)
+
+    def is_fresh(self, url, ttl_days=TTL_DAYS, now=None):
+        entry = self.entries.get(url)
+        if entry is None:
+            return False
+        working = entry.get('error') is None and entry.get('status') is not None and entry['status'] < 400
+        ttl = ttl_days if working else min(ttl_days, FAILED_TTL_DAYS)
+        return (now or now_ms()) - entry['checked'] < ttl * 86400 * 1000
+
+
+def is_checkable(url):
+    return isinstance(url, str) and url.strip().lower().startswith(('http://', 'https://'))
+
+
+def _content_size(response):
+    """The resource's full size from Content-Range (bytes 0-0/N) or Content-Length, if given"""
+    content_range = response.headers.get('content-range', '')
+    if '/' in content_range:
+        total = content_range.rsplit('/', 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    if response.status != 206 and response.headers.get('content-length', '').isdigit():
+        return int(response.headers['content-length'])
+    return None
+
+
+async def check_url(client, url):
+    """Request url, HEAD then a one byte GET, returning its cache entry"""
+    response = await client.request('HEAD', url)
+    if response.error or response.status >= 400:
+        ranged = await client.request('GET', url, {'Range': 'bytes=0-0'}, max_body=1)
+        if ranged.status is not None or response.status is None:
+            response = ranged
+    return {
+        'status': response.status,
+        'url': response.url,
+        'redirects': len(response.redirects),
+        'bytes': _content_size(response),
+        'type': response.headers.get('content-type', '').split(';')[0].strip().lower() or None,
+        'error': response.error,
+        'checked': now_ms()
+    }
+
+
+def link_health(url, entry, field, max_image_bytes=DEFAULT_MAX_IMAGE_BYTES):
+    """The linkHealth of one of a tool's URLs, from its cache entry"""
+    if not is_checkable(url):
+        return {"state": "invalid"}
+    if entry is None:
+        return None
+    status = entry.get('status')
+    is_image = field == 'image'
+    if entry.get('error') or status is None or status >= 400:
+        state = 'broken'
+    elif is_image and entry.get('type') and not entry['type'].startswith('image/'):
+        state = 'not_image'
+    elif is_image and entry.get('bytes') and entry['bytes'] > max_image_bytes:
+        state = 'oversized'
+    elif entry.get('redirects'):
+        state = 'redirected'
+    else:
+        state = 'ok'
+    health = {"state": state, "status": status, "checkedAt": EPOCH + timedelta(milliseconds=entry['checked'])}
+    if entry.get('redirects'):
+        health["url"] = entry['url']
+    if entry.get('error'):
+        health["error"] = entry['error']
+    if is_image and entry.get('bytes') is not None:
+        health["bytes"] = entry['bytes']
+    return health
+
+
+def due_urls(collection, cache, ttl_days=TTL_DAYS):
+    """The distinct website and image URLs without a fresh cached result"""
+    now = now_ms()
+    urls = set()
+    for tool in collection.find({}, {field: 1 for field in LINK_FIELDS}, batch_size=LINKS_BATCH_SIZE):
+        for field in LINK_FIELDS:
+            url = tool.get(field)
+            if is_checkable(url) and not cache.is_fresh(url, ttl_days, now):
+                urls.add(url)
+    return urls
+
+
+def interleave_hosts(urls):
+    """The URLs taking each host in turn, so the tasks spread over hosts instead of queuing on one"""
+    by_host = {}
+    for url in sorted(urls):
+        by_host.setdefault(urlsplit(url).netloc.lower(), []).append(url)
+    return [url for round_urls in zip_longest(*by_host.values()) for url in round_urls if url is not None]
+
+
+async def _check_all(urls, cache, concurrency, per_host, timeout):
+    pending = iter(interleave_hosts(urls))
+    checked = 0
+    start_time = time.time()
+    last_progress = start_time
+
+    async def work():
+        nonlocal checked, last_progress
+        # The tasks share one iterator, so each URL is taken once
+        for url in pending:
+            with METRICS.timed('link_check', items=1):
+                cache.entries[url] = await check_url(client, url)
+            checked += 1
+            if time.time() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.time()
+                print(f"Checked {checked}/{len(urls)} URLs ({checked / (last_progress - start_time):.1f}/s)")
+
+    async with HttpClient(concurrency=concurrency, per_host=per_host, timeout=timeout) as client:
+        await asyncio.gather(*(work() for _ in range(min(concurrency * TASKS_PER_SLOT, max(len(urls), 1)))))
+        return client.backend
+
+
+def write_link_health(collection, cache, max_image_bytes=DEFAULT_MAX_IMAGE_BYTES, batch_size=LINKS_BATCH_SIZE):
+    """Set linkHealth on the tools whose health changed, returning (updated, counts by field and state)"""
+    counts = {field: Counter() for field in LINK_FIELDS}
+    updated = 0
+    operations = []
+
+    def flush():
+        nonlocal operations, updated
+        if operations:
+            with METRICS.timed('link_write', items=len(operations)):
+                collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+
+    now = datetime.utcnow()
+    projection = {"linkHealth": 1, **{field: 1 for field in LINK_FIELDS}}
+    for tool in collection.find({}, projection, batch_size=batch_size):
+        stored = tool.get("linkHealth") or {}
+        changes = {}
+        for field in LINK_FIELDS:
+            url = tool.get(field)
+            entry = cache.entries.get(url) if is_checkable(url) else None
+            health = link_health(url, entry, field, max_image_bytes)
+            if health is None:
+                continue
+            counts[field][health["state"]] += 1
+            if stored.get(field) != health:
+                changes[f"linkHealth.{field}"] = health
+        if changes:
+            changes["updatedAt"] = now
+            operations.append(UpdateOne({"_id": tool["_id"]}, {"$set": changes}))
+            if len(operations) >= batch_size:
+                flush()
+    flush()
+    return updated, counts
+
+
+def check_links(collection, confirm=False, path=DEFAULT_LINKS_PATH, ttl_days=TTL_DAYS,
+                max_image_bytes=DEFAULT_MAX_IMAGE_BYTES, concurrency=DEFAULT_CONCURRENCY,
+                per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT, batch_size=LINKS_BATCH_SIZE):
+    """Check the URLs without a fresh result and write every tool's linkHealth, returning a summary
+
+    Without confirm only the number of URLs due is printed.
+    """
+    cache = LinkCache.load(path)
+    urls = due_urls(collection, cache, ttl_days)
+    print(f"{len(urls)} website and image URLs are due for a check ({len(cache.entries)} cached)")
+    if not confirm:
+        print("Run with --confirm to check them")
+        return {"due": len(urls)}
+
+    start_time = time.time()
+    try:
+        backend = asyncio.run(_check_all(urls, cache, concurrency, per_host, timeout))
+    finally:
+        # Keep what was checked even if the run is interrupted
+        try:
+            cache.save()
+        except OSError as e:
+            print(f"Error saving link results: {str(e)}")
+    print(f"Checked {len(urls)} URLs in {time.time() - start_time:.1f}s with {backend}")
+
+    updated, counts = write_link_health(collection, cache, max_image_bytes, batch_size)
+    for field in LINK_FIELDS:
+        summary = ", ".join(f"{count} {state}" for state, count in counts[field].most_common())
+        print(f"{field}: {summary or 'no tools'}")
+    print(f"Updated the link health of {updated} tools")
+    return {"due": len(urls), "updated": updated, "backend": backend,
+            **{field: dict(counts[field]) for field in LINK_FIELDS}}
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from .files import atomic_open, read_json
+
+DEFAULT_MANIFEST_PATH = '.ingest_manifest.json'
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_hash(file_path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Local JSON sidecar with facts about previously read input files
+
+    Entries are keyed by absolute path and only trusted while the file's size
+    and modification time are unchanged. For resumable uploads an entry also
+    holds the content hash, the number of leading items already committed
+    ("offset") and whether the whole file was uploaded ("complete").
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH, files=None):
+        self.path = Path(path)
+        self.files = files or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=DEFAULT_MANIFEST_PATH):
+        """Read the manifest"""
+        data = read_json(path)
+        return cls(path, data.get('files', {}) if data is not None else {})
+
+    def save(self):
+        """Write the manifest atomically"""
+        with self._lock:
+            with atomic_open(self.path) as file:
+                json.dump({'files': self.files}, file, indent=2)
+
+    @staticmethod
+    def _key(file_path):
+        return str(Path(file_path).resolve())
+
+    @staticmethod
+    def _signature(file_path):
+        stat = os.stat(file_path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def entry(self, file_path):
+        """Return the stored entry for a file if the file has not changed since"""
+        entry = self.files.get(self._key(file_path))
+        if not entry:
+            return None
+        signature = self._signature(file_path)
+        if entry.get('size') != signature['size'] or entry.get('mtime') != signature['mtime']:
+            return None
+        return entry
+
+    def update(self, file_path, **values):
+        """Store values for a file, resetting the entry if the file has changed"""
+        entry = self.entry(file_path) or self._signature(file_path)
+        entry.update(values)
+        self.files[self._key(file_path)] = entry
+        return entry
+
+    def cached_count(self, file_path):
+        entry = self.entry(file_path)
+        return entry.get('count') if entry else None
+
+    def record_count(self, file_path, count):
+        self.update(file_path, count=count)
+
+    def file_state(self, file_path):
+        """Return the entry for an input file, checked against its content hash
+
+        The file is only rehashed when its size or mtime changed. A file with
+        new contents gets a fresh entry, dropping any old checkpoint.
+        """
+        key = self._key(file_path)
+        stored = self.files.get(key)
+        signature = self._signature(file_path)
+        if stored and stored.get('hash') and stored.get('size') == signature['size'] \
+                and stored.get('mtime') == signature['mtime']:
+            return stored
+
+        digest = file_hash(file_path)
+        if stored and stored.get('hash') == digest:
+            # Touched but identical, keep the checkpoint
+            stored.update(signature)
+            return stored
+
+        entry = dict(signature, hash=digest)
+        self.files[key] = entry
+        return entry
+
+    def resume_offset(self, file_path):
+        """Return how many leading items to skip, or None if the file is already fully uploaded"""
+        entry = self.file_state(file_path)
+        if entry.get('complete'):
+            return None
+        return entry.get('offset', 0)
+
+    def checkpoint(self, file_path, offset):
+        """Record that the first offset items of a file are committed"""
+        with self._lock:
+            entry = self.files[self._key(file_path)]
+            entry['offset'] = offset
+            entry['complete'] = False
+
+    def mark_complete(self, file_path, count):
+        """Record a file whose every item was uploaded"""
+        with self._lock:
+            entry = self.files[self._key(file_path)]
+            entry['offset'] = count
+            entry['count'] = count
+            entry['complete'] = True
+
+    def reset(self, file_path):
+        """Forget a file's checkpoint so the next run reads it from the start"""
+        with self._lock:
+            entry = self.files[self._key(file_path)]
+            entry['offset'] = 0
+            entry['complete'] = False
@@ -0,0 +1,113 @@
+"""Read tools from GitHub-style markdown, such as ai-tools-directory/data/*.md
+
+Follows the Node scripts/parseTools.js parser, so those sources load straight
+into the pipeline without its intermediate tools.json:
+
+- table rows "| [Name](url) | title | description | :emoji: |" under a
+  heading (source1.md); the emoji gives the pricing
+- list items "- [Name](url) - description" under "## Category" and
+  "### Subcategory" headings (the awesome-list source2.md)
+
+Records keep parseTools.js's deterministic id, the first 8 hex digits of the
+md5 of the lowercased name. Nothing is random: list items have no pricing
+column, so theirs is "Unknown". Links to anchors or other non-web targets
+are not tools, and entries without a description are left out, as
+importMarkdownTools.js does, and so are the sections of SKIP_SECTIONS.
+"""
+import hashlib
+import re
+
+from .stream import iter_lines
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+# The row pattern of parseTools.js: name link, two text columns, pricing emoji
+TABLE_ROW = re.compile(r"\|\s*\[([^\]]+)\]\(([^)]+)\)\s*\|(.*?)\|(.*?)\|\s*:([^:|]+):\s*\|")
+LIST_ITEM = re.compile(r"^\s*[-*+]\s+\[([^\]]+)\]\(([^)\s]+)\)\s*(?:[-–—:]\s*(.*))?$")
+# "*[reviews](...)* - " between a list item's link and its description
+REVIEW_LINK = re.compile(r"^\*\[[^\]]*\]\([^)]*\)\*\s*[-–—]\s*")
+LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+HASHTAG = re.compile(r"(?:^|\s)#(\w+)")
+LEADING_SYMBOLS = re.compile(r"^[^\w]+")
+WHITESPACE = re.compile(r"\s+")
+
+# Awesome-list sections that link to other lists, courses or the list itself, not to tools
+SKIP_SECTIONS = {'contents', 'table of contents', 'learning resources', 'learn ai free',
+                 'related awesome lists', 'contributing', 'license'}
+
+PRICING_EMOJI = {
+    'white_check_mark': 'Free',
+    'grey_question': 'Contact for Pricing'
+}
+
+
+def tool_id(name):
+    """parseTools.js's generateToolId: md5 of the lowercased name, first 8 hex digits"""
+    return hashlib.md5(name.lower().encode('utf-8')).hexdigest()[:8]
+
+
+def clean_text(text):
+    """Plain text of a markdown fragment: links become their text, emphasis and extra spaces go"""
+    text = LINK.sub(r"\1", text)
+    text = text.replace('**', '').replace('__', '')
+    return WHITESPACE.sub(' ', text).strip(' *_')
+
+
+def _record(name, url, description, categories, pricing, tags=()):
+    name = clean_text(name)
+    url = url.strip()
+    if not name or not description or not url.startswith(('http://', 'https://')):
+        return None
+    return {
+        "id": tool_id(name),
+        "name": name,
+        "description": description,
+        "url": url,
+        "categories": categories,
+        "tags": list(tags),
+        "pricing": pricing
+    }
+
+
+def parse_table_row(line, category):
+    match = TABLE_ROW.search(line)
+    if match is None:
+        return None
+    name, url, title, description, emoji = match.groups()
+    pricing = PRICING_EMOJI.get(emoji.strip(), 'Paid')
+    return _record(name, url, clean_text(description) or clean_text(title),
+                   [category] if category else [], pricing)
+
+
+def parse_list_item(line, categories):
+    match = LIST_ITEM.match(line)
+    if match is None:
+        return None
+    name, url, description = match.groups()
+    description = REVIEW_LINK.sub('', description or '')
+    tags = HASHTAG.findall(description)
+    description = clean_text(HASHTAG.sub('', description))
+    return _record(name, url, description, categories, 'Unknown', tags)
+
+
+def iter_markdown_records(file_path):
+    """Yield the tools of a markdown file, one line at a time
+
+    Table rows are filed under the nearest heading; list items under their
+    "##" heading and, if any, the "###" one below it.
+    """
+    headings = {}
+    for line in iter_lines(file_path):
+        heading = HEADING.match(line)
+        if heading:
+            depth = len(heading.group(1))
+            headings = {level: text for level, text in headings.items() if level < depth}
+            headings[depth] = LEADING_SYMBOLS.sub('', clean_text(heading.group(2)))
+            continue
+        if any(text.lower() in SKIP_SECTIONS for text in headings.values()):
+            continue
+        if line.lstrip().startswith('|'):
+            record = parse_table_row(line, headings[max(headings)] if headings else None)
+        else:
+            record = parse_list_item(line, [headings[level] for level in (2, 3) if headings.get(level)])
+        if record is not None:
+            yield record
@@ -0,0 +1,237 @@
+"""Per-stage timings, counters and MongoDB round trips for one run
+
+Stages (read, parse, transform, dedup, backup, write, ...) are observed
+into METRICS, a process-wide registry: each observation adds a latency to
+the stage's histogram together with the items and bytes it covered. A
+pymongo CommandListener counts every command sent to the server, i.e. the
+round trips. At the end of a run the registry is written as a JSON report
+and, optionally, as a Prometheus textfile for node_exporter.
+
+Worker processes have their own registry; parallel.py sends a snapshot
+back with each finished file and merges it into the main one.
+"""
+import bisect
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from pymongo import monitoring
+
+from .files import write_atomic
+
+DEFAULT_REPORT_PATH = '.ingest_report.json'
+DEFAULT_PROFILE_PATH = 'ingest_profile'
+# Upper bounds in seconds, as in Prometheus histograms; the last bucket is +Inf
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PROMETHEUS_PREFIX = 'smart_ingest'
+
+
+class StageMetrics:
+    """Count, total and histogram of one stage's latencies, with the items and bytes they covered"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.items = 0
+        self.bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds, items=0, size=0):
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.items += items
+        self.bytes += size
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def merge(self, data):
+        self.count += data['count']
+        self.seconds += data['seconds']
+        self.max_seconds = max(self.max_seconds, data['max_seconds'])
+        self.items += data['items']
+        self.bytes += data['bytes']
+        self.buckets = [a + b for a, b in zip(self.buckets, data['buckets'])]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'seconds': round(self.seconds, 6),
+            'max_seconds': round(self.max_seconds, 6),
+            'items': self.items,
+            'bytes': self.bytes,
+            'items_per_second': round(self.items / self.seconds, 1) if self.seconds else None,
+            'buckets': self.buckets
+        }
+
+
+class Metrics:
+    """Thread-safe registry of stage metrics and MongoDB command counts"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.commands = {}
+        self.info = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, items=0, size=0):
+        """Record one timed piece of work in a stage"""
+        with self._lock:
+            self.stages.setdefault(stage, StageMetrics()).observe(seconds, items, size)
+
+    @contextmanager
+    def timed(self, stage, items=0, size=0):
+        """Time the block as one observation of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, items, size)
+
+    def stage_seconds(self, stage):
+        with self._lock:
+            metrics = self.stages.get(stage)
+            return metrics.seconds if metrics else 0.0
+
+    def record_command(self, name, seconds, failed=False):
+        with self._lock:
+            command = self.commands.setdefault(name, {'count': 0, 'failed': 0, 'seconds': 0.0})
+            command['count'] += 1
+            command['seconds'] += seconds
+            if failed:
+                command['failed'] += 1
+
+    def snapshot(self):
+        """The stage metrics as plain data, e.g. to send from a worker process"""
+        with self._lock:
+            return {stage: metrics.to_dict() for stage, metrics in self.stages.items()}
+
+    def merge(self, snapshot):
+        """Add a snapshot taken in another process"""
+        with self._lock:
+            for stage, data in snapshot.items():
+                self.stages.setdefault(stage, StageMetrics()).merge(data)
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.stages = {}
+            self.commands = {}
+            self.info = {}
+
+    def report(self):
+        """The run report as a JSON-serializable dict"""
+        finished = time.time()
+        with self._lock:
+            return {
+                'started': datetime.utcfromtimestamp(self.started).isoformat() + 'Z',
+                'finished': datetime.utcfromtimestamp(finished).isoformat() + 'Z',
+                'duration_seconds': round(finished - self.started, 3),
+                'latency_buckets': list(LATENCY_BUCKETS) + ['+Inf'],
+                'stages': {stage: metrics.to_dict() for stage, metrics in self.stages.items()},
+                'mongo': {
+                    'round_trips': sum(command['count'] for command in self.commands.values()),
+                    'commands': {name: dict(command, seconds=round(command['seconds'], 6))
+                                 for name, command in self.commands.items()}
+                },
+                **self.info
+            }
+
+    def write_report(self, path=DEFAULT_REPORT_PATH):
+        write_atomic(path, json.dumps(self.report(), indent=2, default=str))
+
+    def write_prometheus(self, path):
+        """Write the metrics in the Prometheus text format, for the node_exporter textfile collector"""
+        report = self.report()
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_seconds Time spent per pipeline stage",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds histogram"
+        ]
+        for stage, data in report['stages'].items():
+            cumulative = 0
+            for bound, count in zip(report['latency_buckets'], data['buckets']):
+                cumulative += count
+                lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {data["seconds"]}')
+            lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds_count{{stage="{stage}"}} {data["count"]}')
+        for name, field in (('items', 'items'), ('bytes', 'bytes')):
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_{name}_total counter")
+            for stage, data in report['stages'].items():
+                lines.append(f'{PROMETHEUS_PREFIX}_stage_{name}_total{{stage="{stage}"}} {data[field]}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_mongo_commands_total counter")
+        for command, data in report['mongo']['commands'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_mongo_commands_total{{command="{command}"}} {data["count"]}')
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_run_duration_seconds {report['duration_seconds']}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds {int(time.time())}")
+        write_atomic(path, "\n".join(lines) + "\n")
+
+
+METRICS = Metrics()
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Count each command sent to MongoDB, one per round trip"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        METRICS.record_command(event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        METRICS.record_command(event.command_name, event.duration_micros / 1e6, failed=True)
+
+
+_listener_installed = False
+
+
+def install_command_listener():
+    """Count round trips of every client created afterwards"""
+    global _listener_installed
+    if not _listener_installed:
+        monitoring.register(CommandMetrics())
+        _listener_installed = True
+
+
+class Profile:
+    """cProfile and tracemalloc over a run
+
+    Writes <path>.prof (for pstats or snakeviz) and <path>.txt with the
+    slowest calls by cumulative time and the largest allocations. cProfile
+    only sees the main thread; tracemalloc sees every thread.
+    """
+
+    def __init__(self, path=DEFAULT_PROFILE_PATH):
+        self.path = Path(path)
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        tracemalloc.start()
+        self.profiler.enable()
+
+    def stop(self, top=30):
+        self.profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profile_path = self.path.with_name(self.path.name + '.prof')
+        text_path = self.path.with_name(self.path.name + '.txt')
+        self.profiler.dump_stats(profile_path)
+        text = io.StringIO()
+        pstats.Stats(self.profiler, stream=text).sort_stats('cumulative').print_stats(top)
+        text.write(f"Peak traced memory: {peak / (1 << 20):.1f} MiB\n\nLargest allocations:\n")
+        for statistic in snapshot.statistics('lineno')[:top]:
+            text.write(f"{statistic}\n")
+        write_atomic(text_path, text.getvalue())
+        print(f"Profile written to {profile_path} and {text_path}")
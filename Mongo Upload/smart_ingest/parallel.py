@@ -0,0 +1,120 @@
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+
+from .bulk import BulkWriter, WritePool, new_stats
+from .cache import ParseCache
+from .metrics import METRICS
+from .sources import FORMATS, SourceFile
+
+# Set in each worker process by _init_worker
+_results = None
+
+
+def _init_worker(results):
+    global _results
+    _results = results
+
+
+def _transform_file(file_path, format_name, batch_size, start, cache_dir=None):
+    """Stream and transform one file in a worker process, sending batches back
+
+    Tools are sent as (position, tool) pairs so the main process can
+    checkpoint; the first start items were committed by an earlier run.
+    With a cache_dir the file goes through that ParseCache.
+    The file's stage metrics are sent with its last message.
+    """
+    METRICS.reset()
+    try:
+        cache = ParseCache(cache_dir) if cache_dir is not None else None
+        source_file = SourceFile(file_path, FORMATS[format_name], cache)
+
+        def report(record, error):
+            _results.put(('error', file_path, source_file.format.label(record), str(error)))
+
+        seen = 0
+        for seen, batch in source_file.transformed_blocks(batch_size, start, report):
+            if batch:
+                _results.put(('batch', file_path, batch))
+        _results.put(('done', file_path, seen, METRICS.snapshot()))
+    except Exception as e:
+        _results.put(('failed', file_path, str(e), METRICS.snapshot()))
+
+
+def upload_files_parallel(source_files, collection, workers, batch_size, index=None,
+                          on_file_done=None, on_file_failed=None, start_offsets=None, on_commit=None, insert=False,
+                          near=None, sizer=None, on_written=None):
+    """Upload several source files using a process pool for parsing and transforms
+
+    Worker processes stream and transform whole files and hand back batches
+    through a bounded queue. The main process runs the dedup index and passes
+    batches to a bounded pool of writer threads sharing the collection's
+    MongoClient. Each file keeps its own stats, which are passed to
+    on_file_done(file_path, file_stats, seen) once its last write finishes.
+    start_offsets maps a file to the number of leading tools to skip, and
+    on_commit(file_path, position) receives each file's resume checkpoint.
+    insert, near, sizer and on_written are passed on to the BulkWriters.
+    """
+    start_offsets = {str(file_path): offset for file_path, offset in (start_offsets or {}).items()}
+    context = multiprocessing.get_context()
+    results = context.Queue(maxsize=workers * 4)
+    pool = WritePool(workers)
+    writers = {}
+    remaining = set(source_file.path for source_file in source_files)
+
+    def new_writer(file_path):
+        commit = None
+        if on_commit is not None:
+            commit = lambda position: on_commit(file_path, position)
+        return BulkWriter(collection, new_stats(), batch_size=batch_size, index=index, pool=pool,
+                          on_commit=commit, insert=insert, near=near, sizer=sizer, on_written=on_written)
+
+    def finish(file_path, seen=None, error=None):
+        writer = writers.pop(file_path, None) or new_writer(file_path)
+        writer.close()
+        remaining.discard(file_path)
+        if error is not None:
+            if on_file_failed:
+                on_file_failed(file_path, error)
+        elif on_file_done:
+            on_file_done(file_path, writer.stats, seen)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(results,)) as executor:
+            futures = {
+                executor.submit(_transform_file, source_file.path, source_file.format.name, batch_size,
+                                start_offsets.get(source_file.path, 0),
+                                str(source_file.cache.directory) if source_file.cache else None): source_file.path
+                for source_file in source_files
+            }
+            while remaining:
+                try:
+                    message = results.get(timeout=1)
+                except queue.Empty:
+                    # A worker that crashed never reports back, so check the futures
+                    for future, file_path in futures.items():
+                        if file_path in remaining and future.done() and future.exception():
+                            finish(file_path, error=str(future.exception()))
+                    continue
+
+                kind, file_path = message[0], message[1]
+                if file_path not in writers:
+                    writers[file_path] = new_writer(file_path)
+                writer = writers[file_path]
+
+                if kind == 'batch':
+                    for position, tool in message[2]:
+                        writer.add(tool, position)
+                    writer.flush()
+                elif kind == 'error':
+                    writer.count_failed()
+                    print(f"Error processing tool {message[2]}: {message[3]}")
+                elif kind == 'done':
+                    METRICS.merge(message[3])
+                    finish(file_path, seen=message[2])
+                elif kind == 'failed':
+                    METRICS.merge(message[3])
+                    finish(file_path, error=message[2])
+    finally:
+        pool.shutdown()
@@ -0,0 +1,343 @@
+import asyncio
+import os
+
+from .aio import upload_files_async
+from .backup import backup_collection
+from .bulk import DEFAULT_BATCH_SIZE, WRITE_CONCERNS, BatchSizer, BulkWriter, new_stats
+from .categories import CategoryStats, current_total, stats_collection_for, top_labels
+from .dedup import DedupIndex
+from .indexes import dedup_indexes_unique
+from .manifest import Manifest
+from .metrics import METRICS
+from .parallel import upload_files_parallel
+from .plan import DEFAULT_PLAN_PATH, load_plan, planned_index
+from .similarity import NearDuplicateIndex
+
+
+def check_existing_data(collection):
+    """Check and display information about existing data
+
+    Reads the category stats when they are current, and only scans the
+    tools collection when they are not.
+    """
+    try:
+        stats_collection = stats_collection_for(collection)
+        total = current_total(collection, stats_collection)
+        if total is not None:
+            existing_count = total['count']
+            print(f"\nExisting tools in MongoDB: {existing_count}")
+            categories = [f"{name} ({count})" for name, count in top_labels(stats_collection, limit=5)]
+        else:
+            existing_count = collection.count_documents({})
+            print(f"\nExisting tools in MongoDB: {existing_count}")
+            # Get some sample categories
+            categories = collection.distinct("category")[:5]
+            if existing_count:
+                print("Category stats are missing or out of date, run: python -m smart_ingest stats rebuild")
+        print(f"Current categories: {', '.join(categories)}...")
+
+        return existing_count
+    except Exception as e:
+        print(f"Error checking existing data: {str(e)}")
+        return 0
+
+
+def new_upload_stats():
+    """Create the overall stats dict for an upload run"""
+    return {
+        'total_processed': 0,
+        'total_new': 0,
+        'total_skipped': 0,
+        'total_failed': 0,
+        'total_near_duplicates': 0,
+        'files_processed': 0,
+        'files_unchanged': 0,
+        'failed_files': []
+    }
+
+
+def record_file_stats(file_path, file_stats, stats):
+    """Add one file's results to the overall stats and print its summary"""
+    stats['total_processed'] += file_stats['processed']
+    stats['total_new'] += file_stats['new']
+    stats['total_skipped'] += file_stats['skipped']
+    stats['total_failed'] += file_stats['failed']
+    stats['total_near_duplicates'] += file_stats['near_duplicates']
+    stats['files_processed'] += 1
+
+    print(f"\nFile Summary: {file_path}")
+    print(f"Processed: {file_stats['processed']}")
+    print(f"New tools added: {file_stats['new']}")
+    print(f"Skipped (duplicates): {file_stats['skipped']}")
+    if file_stats['failed']:
+        print(f"Failed: {file_stats['failed']}")
+    if file_stats['near_duplicates']:
+        print(f"Possible duplicates (written, check them): {file_stats['near_duplicates']}")
+
+
+def record_file_checkpoint(manifest, file_path, file_stats, seen):
+    """Mark a file complete, or reset it so the next run retries its failed writes
+
+    Records that failed to transform fail the same way every time, so they
+    alone don't keep the file from being marked complete.
+    """
+    if file_stats['write_failed']:
+        manifest.record_count(file_path, seen)
+        manifest.reset(file_path)
+    else:
+        manifest.mark_complete(file_path, seen)
+    manifest.save()
+
+
+def record_file_failure(file_path, error, stats):
+    """Record a file that could not be processed"""
+    print(f"Error processing file {file_path}: {str(error)}")
+    stats['failed_files'].append(str(file_path))
+
+
+def process_source_file(source_file, collection, stats, batch_size=DEFAULT_BATCH_SIZE, index=None, manifest=None,
+                        start=0, insert=False, near=None, sizer=None, on_written=None):
+    """Read, transform, dedup and write one source file, updating stats
+
+    The first start records were committed by an earlier run and are skipped.
+    With a manifest, the committed position is checkpointed after every batch.
+    With insert, duplicates are left to the unique dedup indexes.
+    With a NearDuplicateIndex, tools similar to known ones are reported.
+    With a BatchSizer, batches adapt to the write latency.
+    on_written(tools) gets the tools each batch wrote.
+    """
+    file_path = source_file.path
+    try:
+        print(f"\nProcessing file: {file_path}")
+        total_tools = manifest.cached_count(file_path) if manifest else None
+        if total_tools is not None:
+            print(f"Found {total_tools} tools in file")
+        if start:
+            print(f"Resuming after {start} tools committed by a previous run")
+
+        def commit(position):
+            manifest.checkpoint(file_path, position)
+            manifest.save()
+
+        file_stats = new_stats()
+        writer = BulkWriter(collection, file_stats, batch_size=batch_size, total=total_tools, index=index,
+                            on_commit=commit if manifest else None, insert=insert, near=near, sizer=sizer,
+                            on_written=on_written)
+
+        def transform_failed(record, error):
+            writer.count_failed()
+            print(f"Error processing tool {source_file.format.label(record)}: {str(error)}")
+
+        seen = 0
+        try:
+            for seen, block in source_file.transformed_blocks(batch_size, start, transform_failed):
+                for position, tool in block:
+                    writer.add(tool, position)
+        finally:
+            # The queued tools are already in the dedup indexes, so they must be written even when reading failed
+            writer.close()
+        if manifest is not None:
+            record_file_checkpoint(manifest, file_path, file_stats, seen)
+
+        record_file_stats(file_path, file_stats, stats)
+        return True
+    except Exception as e:
+        record_file_failure(file_path, e, stats)
+        return False
+
+
+def count_source_tools(source_files, manifest, confirmed):
+    """Count the tools in all source files for the pre-upload check
+
+    Counts are cached in the manifest and the parse cache. Without a parse
+    cache a confirmed run skips uncounted files rather than parsing them
+    twice; with one, counting fills the cache the upload then reads.
+    """
+    total_tools = 0
+    uncounted_files = 0
+    for source_file in source_files:
+        try:
+            if confirmed and source_file.cache is None and manifest.cached_count(source_file.path) is None:
+                uncounted_files += 1
+                continue
+            total_tools += source_file.count(manifest)
+        except Exception as e:
+            print(f"Error reading file {source_file.path}: {str(e)}")
+            continue
+    manifest.save()
+    return total_tools, uncounted_files
+
+
+def pending_source_files(source_files, manifest, stats, resume=True):
+    """Drop files uploaded completely by an earlier run and find where partial ones resume"""
+    start_offsets = {}
+    pending_files = []
+    for source_file in source_files:
+        try:
+            if resume:
+                start = manifest.resume_offset(source_file.path)
+            else:
+                # Still registers the file, which its checkpoints are stored in
+                manifest.file_state(source_file.path)
+                start = 0
+        except Exception as e:
+            record_file_failure(source_file.path, e, stats)
+            continue
+        if start is None:
+            print(f"Unchanged since its last complete upload, skipping: {source_file.path}")
+            stats['files_unchanged'] += 1
+            continue
+        start_offsets[source_file.path] = start
+        pending_files.append(source_file)
+    manifest.save()
+    return pending_files, start_offsets
+
+
+def print_summary(collection, stats, file_count):
+    print("\n=== Final Summary ===")
+    print(f"Files processed successfully: {stats['files_processed']}/{file_count}")
+    if stats['files_unchanged']:
+        print(f"Files unchanged and skipped: {stats['files_unchanged']}")
+    if stats['failed_files']:
+        print(f"Failed files: {', '.join(stats['failed_files'])}")
+    print(f"Total tools processed: {stats['total_processed']}")
+    print(f"Total new tools added: {stats['total_new']}")
+    print(f"Total tools skipped: {stats['total_skipped']}")
+    if stats['total_failed']:
+        print(f"Total tools failed: {stats['total_failed']}")
+    if stats['total_near_duplicates']:
+        print(f"Possible duplicates written: {stats['total_near_duplicates']}")
+    print(f"Final total in database: {collection.count_documents({})}")
+
+
+def upload(collection, source_files, confirm=False, batch_size=DEFAULT_BATCH_SIZE, workers=1,
+           backup_mode='incremental', resume=True, manifest_path=None, near_duplicates=True,
+           signatures_path=None, concurrency=None, async_collection=None, plan_path=DEFAULT_PLAN_PATH,
+           adaptive_batches=False, write_concern=None):
+    """Upload source files into the tools collection: read, transform, dedup, batched write
+
+    With near_duplicates, descriptions are also compared with MinHash/LSH
+    and similar tools are reported. With concurrency, up to that many
+    batches are written at once from asyncio (see aio.upload_files_async).
+    A plan saved by upload --plan for the same files and an unchanged
+    collection replaces the scan of the stored names and websites.
+    adaptive_batches sizes batches by write latency, starting at
+    batch_size, and write_concern names a WRITE_CONCERNS profile for the
+    tool writes (the backup keeps the client's). The category_stats
+    counts are $inc'ed with every batch of new tools.
+    Without confirm only the pre-upload numbers are printed. Returns the
+    overall stats dict, or None when the upload did not run.
+    """
+    if workers > 1 and concurrency:
+        raise ValueError("Use either --workers or --concurrency, not both")
+
+    print(f"Found {len(source_files)} files to process:")
+    for source_file in source_files:
+        print(f"- {source_file.path} ({source_file.format.name})")
+
+    # Check existing data first
+    print("\nChecking existing data...")
+    check_existing_data(collection)
+
+    manifest = Manifest.load(manifest_path) if manifest_path else Manifest.load()
+    total_tools, uncounted_files = count_source_tools(source_files, manifest, confirm)
+    print(f"\nTotal tools found in all files: {total_tools}")
+    if uncounted_files:
+        print(f"({uncounted_files} files not counted yet, they are counted during the upload)")
+
+    # Ask for confirmation
+    print("\nPlease check the numbers above.")
+    print("To proceed with the upload, run again with the --confirm flag")
+    if not confirm:
+        print("Upload cancelled. Run with --confirm to proceed, or with --plan for the exact new and skipped counts")
+        return None
+
+    # Create backup before making any changes
+    print("\nCreating backup of existing data...")
+    with METRICS.timed('backup'):
+        backed_up = backup_collection(collection, "tools", mode=backup_mode)
+    if not backed_up:
+        raise Exception("Backup failed. Aborting upload process for safety.")
+
+    stats = new_upload_stats()
+    pending_files, start_offsets = pending_source_files(source_files, manifest, stats, resume)
+
+    print("\nChecking dedup indexes...")
+    with METRICS.timed('indexes'):
+        insert = dedup_indexes_unique(collection)
+    if insert:
+        print("Names and websites are unique, inserting and skipping duplicate key errors")
+
+    # Load the names and websites already in MongoDB in one pass, shared by
+    # every file so cross-file duplicates are caught too. The indexes only
+    # ignore case, so the canonical forms (no scheme, www or tracking
+    # parameters) are still needed even when inserting.
+    saved_plan = load_plan(collection, source_files, plan_path)
+    if saved_plan is not None:
+        print(f"\nUsing the plan from {saved_plan['created']}: {saved_plan['totals']['inserts']} tools to insert")
+        index = planned_index(saved_plan)
+    else:
+        print("\nLoading existing tool names and websites...")
+        with METRICS.timed('dedup_load'):
+            index = DedupIndex.load(collection)
+
+    near = None
+    if near_duplicates:
+        print("\nLoading description signatures...")
+        near = NearDuplicateIndex.load(signatures_path) if signatures_path else NearDuplicateIndex.load()
+        with METRICS.timed('signatures_load'):
+            hashed = near.sync(collection)
+        print(f"{len(near)} signatures ({hashed} new stored tools hashed)")
+
+    # Only the tool writes use the profile; the backup and scans above keep the client's
+    if write_concern:
+        collection = collection.with_options(write_concern=WRITE_CONCERNS[write_concern])
+        print(f"\nWriting with the {write_concern} write concern profile")
+    sizer = BatchSizer(batch_size) if adaptive_batches else None
+    category_stats = CategoryStats(stats_collection_for(collection))
+
+    def file_done(file_path, file_stats, seen):
+        record_file_checkpoint(manifest, file_path, file_stats, seen)
+        record_file_stats(file_path, file_stats, stats)
+
+    def file_commit(file_path, position):
+        manifest.checkpoint(file_path, position)
+        manifest.save()
+
+    def file_failed(file_path, error):
+        record_file_failure(file_path, error, stats)
+
+    if workers > 1:
+        print(f"\nProcessing files with {workers} workers...")
+        upload_files_parallel(pending_files, collection, workers, batch_size, index,
+                              on_file_done=file_done, on_file_failed=file_failed,
+                              start_offsets=start_offsets, on_commit=file_commit, insert=insert,
+                              near=near, sizer=sizer, on_written=category_stats.record)
+    elif concurrency:
+        print(f"\nProcessing files with up to {concurrency} writes in flight...")
+        totals = {source_file.path: manifest.cached_count(source_file.path) for source_file in pending_files}
+        asyncio.run(upload_files_async(pending_files, collection, concurrency, batch_size, index,
+                                       on_file_done=file_done, on_file_failed=file_failed,
+                                       start_offsets=start_offsets, on_commit=file_commit, insert=insert,
+                                       near=near, totals=totals, async_collection=async_collection,
+                                       sizer=sizer, on_written=category_stats.record))
+    else:
+        for source_file in pending_files:
+            process_source_file(source_file, collection, stats, batch_size, index, manifest,
+                                start_offsets[source_file.path], insert, near, sizer, category_stats.record)
+
+    if near is not None:
+        # Advance past this run's tools, which are already in the index
+        near.sync(collection)
+        near.save()
+
+    print_summary(collection, stats, len(source_files))
+    if category_stats.failed:
+        print("Category stats could not be updated, run: python -m smart_ingest stats rebuild")
+    if sizer is not None:
+        print(f"Adaptive batch size ended at {sizer.size}")
+    if saved_plan is not None:
+        print(f"Planned new tools: {saved_plan['totals']['inserts']}")
+        # Carried out: the collection no longer matches it
+        os.remove(plan_path)
+    return stats
@@ -0,0 +1,225 @@
+"""Dry-run planner: the exact upload diff, computed before --confirm
+
+upload --plan diffs the input files against a snapshot of the stored
+tools' dedup keys (normalized names, canonical websites) and category
+counts, entirely in memory. The snapshot comes from one projected scan and
+is cached locally; later plans only scan tools added since (see
+dedup.IncrementalScan), or read the cache as is with --offline.
+
+The plan reports the tools that would be inserted, those skipped as stored
+or as repeated inside the input, and the change per category. It is saved
+with the stored keys the input actually hit, so a confirmed upload over the
+same files and an unchanged collection dedups against those few keys
+instead of loading every stored name and website again.
+"""
+import json
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from .bulk import DEFAULT_BATCH_SIZE
+from .dedup import DEDUP_KEY_VERSION, DedupIndex, IncrementalScan, normalize_name, normalize_website
+from .files import atomic_open, read_json
+from .manifest import Manifest, file_hash
+from .metrics import METRICS
+
+DEFAULT_SNAPSHOT_PATH = '.ingest_snapshot.json.gz'
+DEFAULT_PLAN_PATH = '.ingest_plan.json'
+
+
+def newest_id(collection):
+    newest = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return newest["_id"] if newest else None
+
+
+def collection_state(collection):
+    """The document count and newest _id, which a plan is only valid for"""
+    last_id = newest_id(collection)
+    return {'count': collection.estimated_document_count(), 'last_id': str(last_id) if last_id else None}
+
+
+class KeySnapshot(IncrementalScan):
+    """Dedup keys and category counts of the stored tools, kept in a local file"""
+
+    PROJECTION = {"name": 1, "website": 1, "category": 1}
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH):
+        self.path = Path(path)
+        self.reset()
+
+    def _clear(self):
+        self.index = DedupIndex()
+        self.categories = Counter()
+
+    @classmethod
+    def load(cls, path=DEFAULT_SNAPSHOT_PATH):
+        """Read the cached snapshot"""
+        snapshot = cls(path)
+        data = read_json(path, compress=True)
+        if data is None or data.get('key_version') != DEDUP_KEY_VERSION:
+            return snapshot
+        snapshot.index.names = set(data.get('names', []))
+        snapshot.index.websites = set(data.get('websites', []))
+        snapshot.categories = Counter(data.get('categories', {}))
+        snapshot.load_scan_state(data)
+        return snapshot
+
+    def save(self):
+        """Write the snapshot atomically"""
+        data = {
+            'key_version': DEDUP_KEY_VERSION,
+            **self.scan_state(),
+            'names': sorted(self.index.names),
+            'websites': sorted(self.index.websites),
+            'categories': dict(self.categories)
+        }
+        with atomic_open(self.path, compress=True) as file:
+            json.dump(data, file)
+
+    def state(self):
+        return {'count': self.count, 'last_id': str(self.last_id) if self.last_id else None}
+
+    def _add(self, tool):
+        self.index.add(tool)
+        self.categories[tool.get("category") or "Other"] += 1
+        return True
+
+
+def compute_plan(source_files, snapshot, batch_size=DEFAULT_BATCH_SIZE):
+    """Diff the input files against the snapshot, returning the plan as a dict"""
+    planned = DedupIndex()
+    matched_names = set()
+    matched_websites = set()
+    added = Counter()
+    files = []
+    for source_file in source_files:
+        counts = {'path': source_file.path, 'hash': file_hash(source_file.path), 'records': 0, 'inserts': 0,
+                  'stored_duplicates': 0, 'input_duplicates': 0, 'invalid': 0}
+
+        def transform_failed(record, error):
+            counts['invalid'] += 1
+            print(f"Error processing tool {source_file.format.label(record)}: {str(error)}")
+
+        for seen, block in source_file.transformed_blocks(batch_size, 0, transform_failed):
+            counts['records'] = seen
+            for _, tool in block:
+                name = normalize_name(tool.get("name"))
+                website = normalize_website(tool.get("website"))
+                stored_name = bool(name) and name in snapshot.index.names
+                stored_website = bool(website) and website in snapshot.index.websites
+                if stored_name or stored_website:
+                    counts['stored_duplicates'] += 1
+                    if stored_name:
+                        matched_names.add(name)
+                    if stored_website:
+                        matched_websites.add(website)
+                elif planned.contains(tool):
+                    counts['input_duplicates'] += 1
+                else:
+                    planned.add(tool)
+                    counts['inserts'] += 1
+                    added[tool.get("category") or "Other"] += 1
+        files.append(counts)
+
+    totals = {key: sum(counts[key] for counts in files)
+              for key in ('records', 'inserts', 'stored_duplicates', 'input_duplicates', 'invalid')}
+    return {
+        'created': datetime.utcnow().isoformat() + 'Z',
+        'key_version': DEDUP_KEY_VERSION,
+        'collection': snapshot.state(),
+        'files': files,
+        'totals': totals,
+        'categories': {category: {'stored': snapshot.categories.get(category, 0), 'added': count}
+                       for category, count in added.most_common()},
+        'stored_matches': {'names': sorted(matched_names), 'websites': sorted(matched_websites)}
+    }
+
+
+def print_plan(plan):
+    print("\n=== Upload Plan ===")
+    for counts in plan['files']:
+        print(f"{counts['path']}: {counts['records']} records, {counts['inserts']} new, "
+              f"{counts['stored_duplicates']} already stored, {counts['input_duplicates']} repeated in the input"
+              + (f", {counts['invalid']} invalid" if counts['invalid'] else ""))
+    totals = plan['totals']
+    print(f"\nTools to insert: {totals['inserts']}")
+    print(f"Skipped, already stored: {totals['stored_duplicates']}")
+    print(f"Skipped, repeated in the input: {totals['input_duplicates']}")
+    if totals['invalid']:
+        print(f"Invalid records: {totals['invalid']}")
+    print(f"Tools in MongoDB: {plan['collection']['count']} -> {plan['collection']['count'] + totals['inserts']}")
+    if plan['categories']:
+        print("\nCategory changes:")
+        for category, counts in plan['categories'].items():
+            print(f"- {category}: {counts['stored']} -> {counts['stored'] + counts['added']} (+{counts['added']})")
+
+
+def save_plan(plan, path=DEFAULT_PLAN_PATH):
+    with atomic_open(path) as file:
+        json.dump(plan, file, indent=2)
+
+
+def plan_upload(collection, source_files, offline=False, batch_size=DEFAULT_BATCH_SIZE, snapshot_path=None,
+                plan_path=DEFAULT_PLAN_PATH, manifest_path=None):
+    """Compute, print and save the upload plan for source_files, returning it
+
+    With offline the cached snapshot is used as is, without querying MongoDB.
+    The record counts go into the manifest, so the confirmed run can show them.
+    """
+    print(f"Found {len(source_files)} files to plan:")
+    for source_file in source_files:
+        print(f"- {source_file.path} ({source_file.format.name})")
+
+    snapshot = KeySnapshot.load(snapshot_path) if snapshot_path else KeySnapshot.load()
+    if offline:
+        if not snapshot.path.exists():
+            raise ValueError(f"No cached snapshot in {snapshot.path}, run --plan once without --offline")
+        print(f"\nUsing the cached snapshot of {snapshot.count} tools")
+    else:
+        print("\nUpdating the snapshot of stored tools...")
+        with METRICS.timed('snapshot'):
+            scanned = snapshot.sync(collection)
+        snapshot.save()
+        print(f"Snapshot of {snapshot.count} tools ({scanned} scanned)")
+
+    with METRICS.timed('plan'):
+        plan = compute_plan(source_files, snapshot, batch_size)
+    print_plan(plan)
+
+    manifest = Manifest.load(manifest_path) if manifest_path else Manifest.load()
+    for counts in plan['files']:
+        manifest.record_count(counts['path'], counts['records'])
+    manifest.save()
+    save_plan(plan, plan_path)
+    print(f"\nPlan saved to {plan_path}. Run with --confirm to carry it out")
+    return plan
+
+
+def load_plan(collection, source_files, path=DEFAULT_PLAN_PATH):
+    """Read the saved plan if it still holds for these files and the collection, else None"""
+    plan = read_json(path)
+    if plan is None:
+        return None
+    if plan.get('key_version') != DEDUP_KEY_VERSION:
+        print(f"The plan in {path} was made by an older version, not using it")
+        return None
+    planned_files = {counts['path']: counts['hash'] for counts in plan['files']}
+    if set(planned_files) != {source_file.path for source_file in source_files}:
+        print(f"The plan in {path} is for other files, not using it")
+        return None
+    for file_path, digest in planned_files.items():
+        if file_hash(file_path) != digest:
+            print(f"{file_path} changed since the plan in {path}, not using it")
+            return None
+    if collection_state(collection) != plan['collection']:
+        print(f"The tools collection changed since the plan in {path}, not using it")
+        return None
+    return plan
+
+
+def planned_index(plan):
+    """A DedupIndex holding only the stored keys the planned input hits"""
+    index = DedupIndex()
+    index.names = set(plan['stored_matches']['names'])
+    index.websites = set(plan['stored_matches']['websites'])
+    return index
@@ -0,0 +1,274 @@
+"""Load the Bulk Prompts library into the smartprompts collection
+
+Every prompt file is {"prompts": [...]}; an entry can itself hold a nested
+"prompts" list, which is flattened. Prompts are validated, deduplicated on a
+hash of their normalized title and content, and written in batched upserts,
+so a rerun only inserts prompts that are not stored yet. Those upserts match
+on contentHash, which gets a unique index before the first write; without it
+every upsert would scan the collection.
+"""
+import glob
+import hashlib
+import re
+from datetime import datetime
+from pathlib import Path
+
+from pymongo.errors import OperationFailure
+
+from .bulk import DEFAULT_BATCH_SIZE, DUPLICATE_KEY_ERROR, BulkWriter, new_stats
+from .dedup import DEFAULT_SCAN_BATCH_SIZE, normalize_name
+from .stream import iter_json_items
+
+DEFAULT_PROMPTS_DIR = 'Bulk Prompts'
+PROMPT_INDEX_NAME = 'contentHash_dedup'
+
+# Must match the category enum of the server's SmartPrompt model
+PROMPT_CATEGORIES = {
+    'Content Creation', 'Marketing', 'Business', 'Education', 'Creative Writing', 'Technical',
+    'Health & Wellness', 'Personal Development', 'Finance', 'Legal', 'Social Media', 'Sales',
+    'Human Resources', 'Travel', 'E-commerce', 'Customer Support', 'Real Estate', 'Event Planning',
+    'News & Media', 'Science & Research', 'Gaming', 'Technology', 'Food & Beverage',
+    'Non-profit & Charity', 'Retail'
+}
+
+# The server's bulkImportPrompts mapping, less its 'Creative Writing' -> 'Creative'
+# entry, which would turn a valid category into one the enum rejects
+CATEGORY_MAP = {
+    'Content Writing': 'Content Creation',
+    'Technical Documentation': 'Technical',
+    'Business Writing': 'Business',
+    'Educational Content': 'Education',
+    'Marketing': 'Business'
+}
+
+# The library uses both {{name}} and {name}
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}|\{(\w+)\}")
+
+
+def prompt_hash(title, content):
+    """Hash of a prompt's normalized title and content, used as its dedup key"""
+    key = f"{normalize_name(title)}\n{normalize_name(content)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def placeholders(content):
+    """Names of the variables referenced in a prompt's content"""
+    return {double or single for double, single in PLACEHOLDER_PATTERN.findall(content)}
+
+
+def validate_prompt(prompt):
+    """Check a library prompt, returning (errors, warnings)
+
+    A placeholder without a matching variable is an error, as the prompt
+    could not be filled in; a variable the content never uses is a warning.
+    """
+    errors = []
+    warnings = []
+    for field in ('title', 'content', 'description', 'category'):
+        if not prompt.get(field):
+            errors.append(f"missing {field}")
+    category = CATEGORY_MAP.get(prompt.get('category'), prompt.get('category'))
+    if category and category not in PROMPT_CATEGORIES:
+        errors.append(f"unknown category {category!r}")
+
+    declared = set()
+    for variable in prompt.get('variables') or []:
+        if not variable.get('name') or not variable.get('description'):
+            errors.append("variable without a name or description")
+            continue
+        declared.add(variable['name'])
+
+    used = placeholders(prompt.get('content') or '')
+    undeclared = sorted(used - declared)
+    unused = sorted(declared - used)
+    if undeclared:
+        errors.append(f"undeclared placeholders {', '.join(undeclared)}")
+    if unused:
+        warnings.append(f"unused variables {', '.join(unused)}")
+    return errors, warnings
+
+
+def transform_prompt(prompt, creator, now):
+    """Convert a validated library prompt to a SmartPrompt document
+
+    Mongoose defaults are filled in here because the documents bypass the model.
+    """
+    return {
+        "title": prompt["title"].strip(),
+        "content": prompt["content"],
+        "description": prompt["description"],
+        "category": CATEGORY_MAP.get(prompt["category"], prompt["category"]),
+        **({"subcategory": prompt["subcategory"].strip()} if prompt.get("subcategory") else {}),
+        "tags": [tag.strip() for tag in prompt.get("tags") or []],
+        "variables": [
+            {
+                "name": variable["name"].strip(),
+                "description": variable["description"],
+                "defaultValue": str(variable.get("defaultValue", variable.get("example", "")))
+            }
+            for variable in prompt.get("variables") or []
+        ],
+        "creator": creator,
+        "visibility": "public",
+        "aiModels": [],
+        "stats": {"uses": 0, "shares": 0, "averageRating": 0, "totalRatings": 0},
+        "version": 1,
+        "likes": [],
+        "saves": [],
+        "contentHash": prompt_hash(prompt["title"], prompt["content"]),
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+
+def flatten_prompts(entries):
+    """Yield prompts from a list that may hold {"prompts": [...]} groups, at any depth"""
+    for entry in entries:
+        if isinstance(entry.get("prompts"), list) and not entry.get("content"):
+            yield from flatten_prompts(entry["prompts"])
+        else:
+            yield entry
+
+
+def iter_prompts(file_path):
+    """Yield the prompts of a library file"""
+    return flatten_prompts(iter_json_items(file_path, "prompts"))
+
+
+def expand_prompt_sources(specs=None):
+    """Resolve files, directories (searched recursively) and globs into prompt files"""
+    files = []
+    for spec in specs or [DEFAULT_PROMPTS_DIR]:
+        path = Path(spec)
+        if path.is_dir():
+            matches = sorted(path.rglob('*.json'))
+        elif any(char in spec for char in '*?['):
+            matches = sorted(Path(match) for match in glob.glob(spec, recursive=True))
+        else:
+            matches = [path]
+        files.extend(match for match in matches if match not in files)
+    return files
+
+
+def find_admin_user(users):
+    """The admin user that owns imported prompts, as in the server's bulk import"""
+    admin = users.find_one({"role": "admin"}, {"_id": 1})
+    if admin is None:
+        raise ValueError("Admin user not found")
+    return admin["_id"]
+
+
+class PromptIndex:
+    """Set of the content hashes of stored prompts, with the DedupIndex interface
+
+    Hashes are computed from title and content, so prompts created through
+    the server, which have no contentHash field, are recognised too.
+    """
+
+    def __init__(self):
+        self.hashes = set()
+
+    @classmethod
+    def load(cls, collection, batch_size=DEFAULT_SCAN_BATCH_SIZE):
+        index = cls()
+        cursor = collection.find({}, {"title": 1, "content": 1, "_id": 0}, batch_size=batch_size)
+        for prompt in cursor:
+            index.hashes.add(prompt_hash(prompt.get("title"), prompt.get("content")))
+        return index
+
+    def contains(self, prompt):
+        return prompt["contentHash"] in self.hashes
+
+    def add(self, prompt):
+        self.hashes.add(prompt["contentHash"])
+
+    def discard(self, prompt):
+        self.hashes.discard(prompt["contentHash"])
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+def prompt_filter(prompt):
+    """Match a stored prompt by its content hash"""
+    return {"contentHash": prompt["contentHash"]}
+
+
+def ensure_prompt_index(collection):
+    """Create the contentHash index the upserts match on, unique unless stored prompts share a hash
+
+    Prompts created through the server have no contentHash, so only those
+    with one are indexed.
+    """
+    if PROMPT_INDEX_NAME in collection.index_information():
+        return
+    options = {"name": PROMPT_INDEX_NAME, "partialFilterExpression": {"contentHash": {"$type": "string"}}}
+    try:
+        collection.create_index("contentHash", unique=True, **options)
+        print(f"Created unique index {PROMPT_INDEX_NAME}")
+        return
+    except OperationFailure as e:
+        if e.code != DUPLICATE_KEY_ERROR:
+            raise
+    print(f"Stored prompts share a contentHash, so {PROMPT_INDEX_NAME} is not unique")
+    collection.create_index("contentHash", **options)
+    print(f"Created index {PROMPT_INDEX_NAME}")
+
+
+def load_prompts(collection, users, prompt_files, confirm=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate prompt files and, with confirm, write the new prompts
+
+    Returns the stats dict with an extra 'invalid' count, or None when
+    nothing was written.
+    """
+    print(f"Found {len(prompt_files)} prompt files:")
+    for file_path in prompt_files:
+        print(f"- {file_path}")
+    print(f"\nExisting prompts in MongoDB: {collection.count_documents({})}")
+
+    creator = None
+    if confirm:
+        creator = find_admin_user(users)
+        ensure_prompt_index(collection)
+    index = PromptIndex.load(collection)
+    now = datetime.utcnow()
+    stats = new_stats()
+    stats['invalid'] = 0
+    writer = BulkWriter(collection, stats, batch_size=batch_size, index=index, match=prompt_filter,
+                        noun="prompt", label_key="title", collation=None)
+
+    for file_path in prompt_files:
+        try:
+            for prompt in iter_prompts(file_path):
+                errors, warnings = validate_prompt(prompt)
+                label = prompt.get('title', 'unknown')
+                for warning in warnings:
+                    print(f"Warning for prompt {label} in {file_path}: {warning}")
+                if errors:
+                    stats['invalid'] += 1
+                    print(f"Invalid prompt {label} in {file_path}: {'; '.join(errors)}")
+                    continue
+                if confirm:
+                    writer.add(transform_prompt(prompt, creator, now))
+                else:
+                    content_hash = prompt_hash(prompt["title"], prompt["content"])
+                    stats['processed'] += 1
+                    if content_hash in index.hashes:
+                        stats['skipped'] += 1
+                    index.hashes.add(content_hash)
+        except Exception as e:
+            print(f"Error processing file {file_path}: {str(e)}")
+    writer.close()
+
+    print("\n=== Prompt Summary ===")
+    print(f"Valid prompts: {stats['processed'] + stats['failed']}")
+    print(f"Invalid prompts: {stats['invalid']}")
+    if not confirm:
+        print(f"Duplicates (stored or repeated): {stats['skipped']}")
+        print("Run again with --confirm to write the new prompts")
+        return None
+    print(f"New prompts added: {stats['new']}")
+    print(f"Skipped (duplicates): {stats['skipped']}")
+    if stats['failed']:
+        print(f"Failed: {stats['failed']}")
+    return stats
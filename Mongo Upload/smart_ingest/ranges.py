@@ -0,0 +1,39 @@
+"""Split a collection into _id ranges that can be scanned in parallel
+
+Boundaries come from walking the _id index once, skipping an equal share
+of documents between them, so each range holds about the same number of
+documents however unevenly the _ids are spread over time. The ranges
+assume ObjectId _ids, as every tool has.
+"""
+
+MIN_RANGE_DOCUMENTS = 1000
+
+
+def id_boundaries(collection, parts, query=None):
+    """The _ids splitting the documents matching query into parts ranges of similar size"""
+    query = query or {}
+    count = collection.count_documents(query) if query else collection.estimated_document_count()
+    if parts < 2 or count < parts * MIN_RANGE_DOCUMENTS:
+        return []
+    step = count // parts
+    boundaries = []
+    for _ in range(parts - 1):
+        condition = {"_id": {"$gt": boundaries[-1]}} if boundaries else {}
+        cursor = collection.find({**query, **condition}, {"_id": 1}).sort("_id", 1).skip(step - 1).limit(1)
+        document = next(iter(cursor), None)
+        if document is None:
+            break
+        boundaries.append(document["_id"])
+    return boundaries
+
+
+def id_ranges(collection, parts, query=None):
+    """Filters covering the documents matching query in up to parts _id ranges, in _id order"""
+    query = query or {}
+    boundaries = id_boundaries(collection, parts, query)
+    if not boundaries:
+        return [query]
+    ranges = [{"$lte": boundaries[0]}]
+    ranges.extend({"$gt": low, "$lte": high} for low, high in zip(boundaries, boundaries[1:]))
+    ranges.append({"$gt": boundaries[-1]})
+    return [{**query, "_id": id_range} for id_range in ranges]
@@ -0,0 +1,311 @@
+"""Refresh the tools' scrapedData in the background, stalest first
+
+The server scrapes a tool's website only when someone asks for it
+(POST /api/tools/:id/scrape, services/websiteScraper.js), so imported
+tools have no scrapedData at all. This worker walks the scrapedData.lastScraped
+index in ascending order, which puts tools never scraped first and then the
+oldest, up to those scraped within max_age. That cursor feeds a bounded
+queue consumed by async tasks fetching through fetch.HttpClient, several
+hosts at a time but never more than per_host requests to one.
+
+A page is requested with the ETag and Last-Modified of the previous scrape,
+so an unchanged site answers 304 and only lastScraped moves. Otherwise the
+page is read as websiteScraper.js reads it: title, meta description, up to
+10 feature lines and 3 paragraphs of description. A failed fetch records
+its error and still moves lastScraped, so a dead site goes to the back of
+the queue instead of blocking it. Results are written with unordered
+bulk_writes of $set on the scrapedData fields and updatedAt, so the
+next incremental backup includes the refreshed tools.
+"""
+import asyncio
+import re
+import time
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from itertools import islice
+
+from pymongo import UpdateOne
+
+from .bulk import PROGRESS_INTERVAL
+from .fetch import DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, DEFAULT_TIMEOUT, TASKS_PER_SLOT, HttpClient, describe_error
+from .metrics import METRICS
+
+LAST_SCRAPED = 'scrapedData.lastScraped'
+SCRAPE_INDEX_NAME = 'scrapedData_lastScraped'
+DEFAULT_MAX_AGE_DAYS = 30
+SCRAPE_BATCH_SIZE = 100
+MAX_FEATURES = 10
+MAX_PARAGRAPHS = 3
+# websiteScraper.js's filters
+MIN_FEATURE_LENGTH = 10
+MAX_FEATURE_LENGTH = 200
+MIN_PARAGRAPH_LENGTH = 50
+FEATURE_EXCLUDES = ('cookie', 'privacy', 'login', 'sign up')
+FEATURE_MARKERS = ('feature', 'benefit')
+CONTENT_TAGS = {'main', 'article'}
+CONTENT_MARKERS = ('content', 'description', 'about')
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source',
+             'track', 'wbr'}
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg'}
+# Block elements that end an open <p>
+CLOSES_P = {'address', 'article', 'aside', 'blockquote', 'div', 'dl', 'fieldset', 'figure', 'footer', 'form',
+            'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'main', 'nav', 'ol', 'p', 'pre', 'section',
+            'table', 'ul'}
+WHITESPACE = re.compile(r"\s+")
+
+
+class PageParser(HTMLParser):
+    """Collects what websiteScraper.js's selectors pick out of a page
+
+    Feature candidates are the text of elements whose class or id mentions
+    a feature or benefit, then of list items; paragraphs are the <p>s inside
+    <main>, <article> or content, description or about containers.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ''
+        self.meta_description = ''
+        self.marked_features = []
+        self.list_items = []
+        self.paragraphs = []
+        # Open elements: (tag, in content, text buffers they capture)
+        self._stack = []
+        self._skipping = 0
+        self._title = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'meta':
+            if (attrs.get('name') or '').lower() == 'description' and not self.meta_description:
+                self.meta_description = (attrs.get('content') or '').strip()
+            return
+        # Text on either side of a tag belongs to different words
+        self.handle_data(' ')
+        if tag in VOID_TAGS:
+            return
+        if self._stack and (tag == 'li' == self._stack[-1][0] or tag in CLOSES_P and self._stack[-1][0] == 'p'):
+            # An unclosed <li> ends where the next one starts, an unclosed <p> at the next block
+            self._close(len(self._stack) - 1)
+        if tag in SKIP_TAGS:
+            self._skipping += 1
+        marker = f"{attrs.get('class') or ''} {attrs.get('id') or ''}".lower()
+        in_content = bool(self._stack and self._stack[-1][1]) or tag in CONTENT_TAGS or \
+            any(word in marker for word in CONTENT_MARKERS)
+        captures = []
+        if any(word in marker for word in FEATURE_MARKERS):
+            captures.append((self.marked_features, []))
+        if tag == 'li' and any(open_tag in ('ul', 'ol') for open_tag, _, _ in self._stack):
+            captures.append((self.list_items, []))
+        if tag == 'p' and in_content:
+            captures.append((self.paragraphs, []))
+        if tag == 'title':
+            self._title = []
+        self._stack.append((tag, in_content, captures))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self.handle_data(' ')
+        if tag == 'title' and self._title is not None:
+            self.title = clean(''.join(self._title))
+            self._title = None
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                self._close(depth)
+                return
+
+    def _close(self, depth):
+        """Close the element at depth and everything opened inside it"""
+        while len(self._stack) > depth:
+            tag, _, captures = self._stack.pop()
+            if tag in SKIP_TAGS:
+                self._skipping -= 1
+            for results, parts in captures:
+                text = clean(''.join(parts))
+                if text:
+                    results.append(text)
+
+    def handle_data(self, data):
+        if self._title is not None:
+            self._title.append(data)
+        if self._skipping:
+            return
+        for _, _, captures in self._stack:
+            for _, parts in captures:
+                parts.append(data)
+
+
+def clean(text):
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def parse_page(html):
+    """The scrapedData fields of a page, as websiteScraper.js would extract them"""
+    parser = PageParser()
+    parser.feed(html)
+    parser.close()
+    features = []
+    for text in parser.marked_features + parser.list_items:
+        lowered = text.lower()
+        if MIN_FEATURE_LENGTH < len(text) < MAX_FEATURE_LENGTH and text not in features and \
+                not any(word in lowered for word in FEATURE_EXCLUDES):
+            features.append(text)
+            if len(features) == MAX_FEATURES:
+                break
+    paragraphs = []
+    for text in parser.paragraphs:
+        if len(text) > MIN_PARAGRAPH_LENGTH and text not in paragraphs:
+            paragraphs.append(text)
+            if len(paragraphs) == MAX_PARAGRAPHS:
+                break
+    return {
+        "features": features,
+        "extendedDescription": "\n\n".join(paragraphs),
+        "metadata": {"title": parser.title, "metaDescription": parser.meta_description}
+    }
+
+
+def ensure_scrape_index(collection):
+    collection.create_index([(LAST_SCRAPED, 1)], name=SCRAPE_INDEX_NAME)
+
+
+def stale_filter(max_age_days=DEFAULT_MAX_AGE_DAYS, now=None):
+    """Tools with a website that were never scraped or not within max_age_days"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=max_age_days)
+    # $not $gte also matches a missing or null lastScraped, and both are one range of the index
+    return {"website": {"$type": "string", "$ne": ""}, LAST_SCRAPED: {"$not": {"$gte": cutoff}}}
+
+
+def stale_tools(collection, max_age_days=DEFAULT_MAX_AGE_DAYS, limit=None):
+    """Cursor over the tools to refresh, never scraped first, then the longest ago"""
+    cursor = collection.find(stale_filter(max_age_days), {"website": 1, "scrapedData.etag": 1,
+                                                          "scrapedData.lastModified": 1})
+    cursor = cursor.sort(LAST_SCRAPED, 1).hint(SCRAPE_INDEX_NAME)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def _failed_update(tool, error, now):
+    return UpdateOne({"_id": tool["_id"]}, {"$set": {LAST_SCRAPED: now, "scrapedData.error": error,
+                                                     "updatedAt": now}})
+
+
+async def scrape_tool(client, tool):
+    """Fetch a tool's website, returning the outcome and the update for its scrapedData"""
+    scraped = tool.get("scrapedData") or {}
+    headers = {'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.5'}
+    if scraped.get("etag"):
+        headers['If-None-Match'] = scraped["etag"]
+    if scraped.get("lastModified"):
+        headers['If-Modified-Since'] = scraped["lastModified"]
+
+    response = await client.request('GET', tool["website"], headers)
+    now = datetime.utcnow()
+    if response.status == 304:
+        return 'not_modified', UpdateOne({"_id": tool["_id"]}, {"$set": {LAST_SCRAPED: now, "updatedAt": now},
+                                                                "$unset": {"scrapedData.error": ""}})
+    content_type = response.headers.get('content-type', '').lower()
+    if response.ok and content_type and 'html' not in content_type:
+        response.error = f"Not an HTML page ({content_type.split(';')[0]})"
+    if not response.ok or response.error:
+        return 'failed', _failed_update(tool, response.error or f"HTTP {response.status}", now)
+
+    page = await asyncio.to_thread(parse_page, response.text())
+    fields = {f"scrapedData.{name}": value for name, value in page.items()}
+    fields[LAST_SCRAPED] = now
+    fields["updatedAt"] = now
+    fields["scrapedData.etag"] = response.headers.get('etag')
+    fields["scrapedData.lastModified"] = response.headers.get('last-modified')
+    return 'updated', UpdateOne({"_id": tool["_id"]}, {"$set": fields, "$unset": {"scrapedData.error": ""}})
+
+
+async def _refresh(collection, cursor, concurrency, per_host, timeout, batch_size):
+    stats = {"queued": 0, "updated": 0, "not_modified": 0, "failed": 0, "written": 0, "write_errors": 0}
+    queue = asyncio.Queue(maxsize=concurrency * TASKS_PER_SLOT * 2)
+    pending = []
+    start_time = time.time()
+    last_progress = start_time
+
+    async def flush():
+        nonlocal pending, last_progress
+        operations, pending = pending, []
+        if not operations:
+            return
+        try:
+            with METRICS.timed('scrape_write', items=len(operations)):
+                result = await asyncio.to_thread(collection.bulk_write, operations, ordered=False)
+            stats["written"] += result.modified_count
+        except Exception as e:
+            print(f"Error writing scraped data: {str(e)}")
+            stats["write_errors"] += len(operations)
+        if time.time() - last_progress >= PROGRESS_INTERVAL:
+            last_progress = time.time()
+            done = stats["updated"] + stats["not_modified"] + stats["failed"]
+            print(f"Scraped {done}/{stats['queued']} tools ({done / (last_progress - start_time):.1f}/s)")
+
+    async def work():
+        while True:
+            tool = await queue.get()
+            if tool is None:
+                return
+            try:
+                with METRICS.timed('scrape', items=1):
+                    outcome, operation = await scrape_tool(client, tool)
+            except Exception as e:
+                # A task that died would leave the producer blocked on a full queue
+                outcome, operation = 'failed', _failed_update(tool, describe_error(e), datetime.utcnow())
+            stats[outcome] += 1
+            pending.append(operation)
+            if len(pending) >= batch_size:
+                await flush()
+
+    async with HttpClient(concurrency=concurrency, per_host=per_host, timeout=timeout) as client:
+        tasks = [asyncio.create_task(work()) for _ in range(concurrency * TASKS_PER_SLOT)]
+        try:
+            while True:
+                tools = await asyncio.to_thread(lambda: list(islice(cursor, batch_size)))
+                if not tools:
+                    break
+                for tool in tools:
+                    stats["queued"] += 1
+                    await queue.put(tool)
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await flush()
+        stats["backend"] = client.backend
+    stats["seconds"] = round(time.time() - start_time, 3)
+    return stats
+
+
+def refresh_scraped_data(collection, confirm=False, limit=None, max_age_days=DEFAULT_MAX_AGE_DAYS,
+                         concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT,
+                         batch_size=SCRAPE_BATCH_SIZE):
+    """Scrape the stalest tools' websites and store their scrapedData, returning the run's counts
+
+    Without confirm only the number of tools due for a refresh is printed.
+    """
+    due = collection.count_documents(stale_filter(max_age_days))
+    print(f"{due} tools were not scraped in the last {max_age_days} days")
+    if not confirm:
+        print("Run with --confirm to scrape them")
+        return {"due": due}
+
+    ensure_scrape_index(collection)
+
+    stats = asyncio.run(_refresh(collection, stale_tools(collection, max_age_days, limit), concurrency,
+                                 per_host, timeout, batch_size))
+    stats["due"] = due
+    print(f"Scraped {stats['queued']} tools in {stats['seconds']:.1f}s with {stats['backend']}: "
+          f"{stats['updated']} updated, {stats['not_modified']} unchanged (304), {stats['failed']} failed")
+    if stats["write_errors"]:
+        print(f"{stats['write_errors']} results could not be written; those tools stay due")
+    return stats
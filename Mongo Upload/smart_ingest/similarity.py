@@ -0,0 +1,172 @@
+"""Near-duplicate detection over tool descriptions with MinHash and LSH
+
+Exact dedup only catches tools whose normalized name or canonical website
+is already known. The same tool listed under a slightly different name
+usually keeps much of its description (the AirTable "Subtitle"), so each
+description gets a MinHash signature, and signatures are bucketed by band
+(locality-sensitive hashing). A new tool is only compared with the tools
+sharing one of its buckets, instead of with every stored description.
+
+Signatures are kept in a local sidecar file between runs, and a run only
+hashes tools added since, or all of them again when older ones changed
+(see dedup.IncrementalScan).
+"""
+import base64
+import json
+import random
+import re
+import threading
+import zlib
+from array import array
+from pathlib import Path
+
+from .dedup import IncrementalScan, normalize_name
+from .files import atomic_open, read_json
+
+DEFAULT_SIGNATURES_PATH = '.ingest_signatures.json.gz'
+NUM_PERM = 60
+BANDS = 20  # 20 bands of 3 rows: a pair at 0.5 similarity shares a bucket 93% of the time
+SIMILARITY_THRESHOLD = 0.5  # Estimated Jaccard similarity of word pairs needed to flag a candidate
+SHINGLE_SIZE = 2
+MIN_WORDS = 6  # Shorter descriptions are too generic to compare
+
+MERSENNE_PRIME = (1 << 31) - 1
+_random = random.Random(1)  # Fixed seed: persisted signatures must stay comparable
+PERMUTATIONS = [(_random.randrange(1, MERSENNE_PRIME), _random.randrange(0, MERSENNE_PRIME))
+                for _ in range(NUM_PERM)]
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text):
+    """Hashes of the word pairs of a description, or None if it is too short"""
+    words = WORD_PATTERN.findall(normalize_name(text))
+    if len(words) < MIN_WORDS:
+        return None
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode('utf-8'))
+            for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """MinHash signature of a description, or None if it is too short"""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    return tuple(min((a * value + b) % MERSENNE_PRIME for value in hashes) for a, b in PERMUTATIONS)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERM
+
+
+def band_keys(signature):
+    rows = NUM_PERM // BANDS
+    return [(band, hash(signature[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+
+
+def encode_signature(signature):
+    return base64.b64encode(array('I', signature).tobytes()).decode('ascii')
+
+
+def decode_signature(text):
+    values = array('I')
+    values.frombytes(base64.b64decode(text))
+    return tuple(values)
+
+
+class NearDuplicateIndex(IncrementalScan):
+    """LSH index of description signatures, keyed by normalized tool name
+
+    check() flags a tool whose description is close to a known one and then
+    adds it, so near-duplicates inside the input are flagged too.
+    """
+
+    PROJECTION = {"name": 1, "description": 1}
+
+    def __init__(self, path=DEFAULT_SIGNATURES_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _clear(self):
+        self.signatures = {}
+        self.names = {}
+        self.buckets = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_SIGNATURES_PATH):
+        """Read the persisted signatures"""
+        index = cls(path)
+        data = read_json(path, compress=True)
+        if data is None or data.get('num_perm') != NUM_PERM or data.get('bands') != BANDS:
+            return index
+        index.load_scan_state(data)
+        for key, (name, signature) in data.get('tools', {}).items():
+            index._insert(key, name, decode_signature(signature))
+        return index
+
+    def save(self):
+        """Write the signatures atomically"""
+        with self._lock:
+            data = {
+                'num_perm': NUM_PERM,
+                'bands': BANDS,
+                **self.scan_state(),
+                'tools': {key: [self.names[key], encode_signature(signature)]
+                          for key, signature in self.signatures.items()}
+            }
+            with atomic_open(self.path, compress=True) as file:
+                json.dump(data, file)
+
+    def _add(self, tool):
+        """Hash a stored tool, returning whether it got a signature"""
+        key = normalize_name(tool.get("name"))
+        if not key or key in self.signatures:
+            return False
+        signature = minhash(tool.get("description"))
+        if signature is None:
+            return False
+        self._insert(key, tool.get("name"), signature)
+        return True
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _insert(self, key, name, signature):
+        self.signatures[key] = signature
+        self.names[key] = name
+        for band_key in band_keys(signature):
+            self.buckets.setdefault(band_key, set()).add(key)
+
+    def check(self, tool):
+        """Add a tool, returning (similar tool name, similarity) if it looks like a known tool"""
+        key = normalize_name(tool.get("name"))
+        signature = minhash(tool.get("description"))
+        if not key or signature is None:
+            return None
+        with self._lock:
+            if key in self.signatures:
+                return None
+            best = None
+            candidates = set()
+            for band_key in band_keys(signature):
+                candidates.update(self.buckets.get(band_key, ()))
+            for candidate in candidates:
+                score = similarity(signature, self.signatures[candidate])
+                if score >= SIMILARITY_THRESHOLD and (best is None or score > best[1]):
+                    best = (self.names[candidate], score)
+            self._insert(key, tool.get("name"), signature)
+            return best
+
+    def discard(self, tool):
+        """Forget a tool whose write failed"""
+        key = normalize_name(tool.get("name"))
+        with self._lock:
+            signature = self.signatures.pop(key, None)
+            self.names.pop(key, None)
+            if signature is None:
+                return
+            for band_key in band_keys(signature):
+                bucket = self.buckets.get(band_key)
+                if bucket is not None:
+                    bucket.discard(key)
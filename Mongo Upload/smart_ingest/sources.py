@@ -0,0 +1,210 @@
+import glob
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .metrics import METRICS
+from .markdown import iter_markdown_records
+from .stream import iter_blocks, iter_json_items
+from .transform import transform_airtable_record, transform_block, transform_converted_record, transform_markdown_record
+
+DEFAULT_SOURCE = 'AirTable/Converted'
+COUNT_BLOCK_SIZE = 1000
+
+
+class SourceFormat:
+    """How to read and transform one kind of input file
+
+    key is the top-level field holding the record array (None for a
+    top-level array), transform_record(record, now) turns a record into a
+    tool document and label names a record in error messages. Formats
+    that are not JSON arrays pass read(file_path), which yields the records.
+    """
+
+    def __init__(self, name, key, transform_record, label, read=None):
+        self.name = name
+        self.key = key
+        self.transform_record = transform_record
+        self.label = label
+        self.read = read
+
+    def __repr__(self):
+        return f"SourceFormat({self.name!r})"
+
+
+def _airtable_label(record):
+    return record.get('fields', {}).get('Title', 'unknown')
+
+
+def _converted_label(record):
+    return record.get('name', 'unknown')
+
+
+# AirTable/Data01.json: [{"id": ..., "createdTime": ..., "fields": {...}}, ...]
+AIRTABLE = SourceFormat('airtable', None, transform_airtable_record, _airtable_label)
+# AirTable/Converted/*.json: {"tools": [{"name": ..., "website": ...}, ...]}
+CONVERTED = SourceFormat('converted', 'tools', transform_converted_record, _converted_label)
+# ai-tools-directory/data/*.md: GitHub-style tables and lists of tool links
+MARKDOWN = SourceFormat('markdown', None, transform_markdown_record, _converted_label, read=iter_markdown_records)
+
+FORMATS = {source_format.name: source_format for source_format in (AIRTABLE, CONVERTED, MARKDOWN)}
+MARKDOWN_SUFFIXES = {'.md', '.markdown'}
+SOURCE_SUFFIXES = {'.json'} | MARKDOWN_SUFFIXES
+
+
+class SourceFile:
+    """One input file together with its format, and the ParseCache its transformed tools are kept in"""
+
+    def __init__(self, path, source_format, cache=None):
+        self.path = str(path)
+        self.format = source_format
+        self.cache = cache
+
+    def __repr__(self):
+        return f"SourceFile({self.path!r}, {self.format.name!r})"
+
+    def records(self):
+        """Stream the raw records of the file"""
+        if self.format.read is not None:
+            return self.format.read(self.path)
+        return iter_json_items(self.path, self.format.key)
+
+    def cached_count(self, manifest=None):
+        """The record count from the manifest or the parse cache, or None if neither has it"""
+        count = manifest.cached_count(self.path) if manifest is not None else None
+        if count is None and self.cache is not None:
+            count = self.cache.count(self)
+        return count
+
+    def count(self, manifest=None):
+        """Count the records, reading the file only if no count is cached
+
+        With a parse cache the read also fills it, so the upload that
+        follows does not parse the file again.
+        """
+        count = self.cached_count(manifest)
+        if count is None:
+            if self.cache is not None:
+                count = 0
+                for count, _ in self.transformed_blocks(COUNT_BLOCK_SIZE, on_error=lambda record, error: None):
+                    pass
+            else:
+                count = sum(1 for _ in self.records())
+        if manifest is not None:
+            manifest.record_count(self.path, count)
+        return count
+
+    def transformed_blocks(self, block_size, start=0, on_error=None):
+        """Yield (position, [(position, tool), ...]) blocks of transformed tools
+
+        Positions count records from 1 and the first start records are
+        skipped. Records that fail to transform are passed to
+        on_error(record, error) and left out. Each block shares one updatedAt.
+        The time to pull each block from the parser, less its reads, is
+        observed as the "parse" stage and its transforms as "transform".
+
+        With a parse cache, a cached file is read from the cache instead,
+        and a full pass over an uncached one fills it.
+        """
+        transform_record = self.format.transform_record
+        cache_writer = None
+        if self.cache is not None:
+            cached = self.cache.open(self)
+            if cached is not None:
+                try:
+                    yield from cached.transformed_blocks(block_size, start, transform_record, on_error)
+                finally:
+                    cached.close()
+                return
+            if start == 0:
+                cache_writer = self.cache.writer(self)
+
+        try:
+            yield from self._parsed_blocks(block_size, start, on_error, cache_writer)
+        except BaseException:
+            if cache_writer is not None:
+                cache_writer.discard()
+            raise
+        if cache_writer is not None:
+            cache_writer.commit()
+
+    def _parsed_blocks(self, block_size, start, on_error, cache_writer):
+        position = 0
+        transform_record = self.format.transform_record
+        blocks = iter_blocks(self.records(), block_size)
+        while True:
+            read_before = METRICS.stage_seconds('read')
+            parse_start = time.perf_counter()
+            block = next(blocks, None)
+            if block is None:
+                return
+            parse_seconds = time.perf_counter() - parse_start - (METRICS.stage_seconds('read') - read_before)
+            METRICS.observe('parse', max(parse_seconds, 0.0), items=len(block))
+
+            transform_start = time.perf_counter()
+            now = datetime.utcnow()
+            skip = min(max(start - position, 0), len(block))
+            records = block[skip:]
+            first = position + skip + 1
+            position += len(block)
+            transformed = transform_block(records, transform_record, now, on_error, first)
+            if cache_writer is not None:
+                # Cache entries follow the file's order, failed records included
+                tools = dict(transformed)
+                for record_position, record in enumerate(records, first):
+                    tool = tools.get(record_position)
+                    if tool is None:
+                        cache_writer.add_failed(record)
+                    else:
+                        cache_writer.add(tool, now)
+            METRICS.observe('transform', time.perf_counter() - transform_start, items=len(block))
+            yield position, transformed
+
+
+def detect_format(file_path):
+    """Guess a file's format: markdown by its suffix, otherwise an array is AirTable and an object Converted"""
+    if Path(file_path).suffix.lower() in MARKDOWN_SUFFIXES:
+        return MARKDOWN
+    with open(file_path, 'rb') as file:
+        while True:
+            char = file.read(1)
+            if not char:
+                raise ValueError(f"Empty file: {file_path}")
+            if char in b'[{':
+                return AIRTABLE if char == b'[' else CONVERTED
+            if char not in b' \t\r\n\xef\xbb\xbf':
+                raise ValueError(f"Not a JSON array or object: {file_path}")
+
+
+def expand_source(spec, cache=None):
+    """Expand a source spec into SourceFiles
+
+    A spec is a file, a directory (all *.json and *.md inside it) or a glob
+    pattern, optionally prefixed with a format name such as "airtable:",
+    "converted:" or "markdown:"; without a prefix each file's format is
+    detected. cache is the ParseCache the files use, if any.
+    """
+    source_format = None
+    name, separator, rest = spec.partition(':')
+    if separator and name in FORMATS:
+        source_format = FORMATS[name]
+        spec = rest
+
+    path = Path(spec)
+    if path.is_dir():
+        paths = sorted(child for child in path.iterdir()
+                       if child.is_file() and child.suffix.lower() in SOURCE_SUFFIXES)
+    elif glob.has_magic(spec):
+        paths = sorted(Path(match) for match in glob.glob(spec, recursive=True))
+    else:
+        paths = [path]
+
+    return [SourceFile(file_path, source_format or detect_format(file_path), cache) for file_path in paths]
+
+
+def expand_sources(specs, cache=None):
+    """Expand several source specs, defaulting to the Converted directory"""
+    source_files = []
+    for spec in specs or [DEFAULT_SOURCE]:
+        source_files.extend(expand_source(spec, cache))
+    return source_files
@@ -0,0 +1,170 @@
+import codecs
+import json
+import re
+import time
+from itertools import islice
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from .metrics import METRICS
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# What a number may still continue with, e.g. "1." or "2e" cut at a chunk boundary
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+
+
+class _Scanner:
+    """Incremental JSON reader that decodes one value at a time from a file"""
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size=CHUNK_SIZE):
+        chunk = self.file.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has already been consumed so memory stays bounded
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found or 'end of file'}'")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        size = CHUNK_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number running to the end of the buffer may continue in the next chunk
+                number = self.buffer[self.pos] in '-0123456789'
+                if self.eof or not (number and _NUMBER_TAIL.match(self.buffer, end)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+    def array_items(self):
+        """Yield the items of the array starting at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' but found '{separator or 'end of file'}'")
+
+    def seek_key(self, key):
+        """Move to the value of a top-level object key, returning False if it is missing"""
+        self.expect('{')
+        if self.peek() == '}':
+            return False
+        while True:
+            name = self.value()
+            self.expect(':')
+            if name == key:
+                return True
+            self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return False
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' but found '{separator or 'end of file'}'")
+
+
+class MeteredFile:
+    """File wrapper that observes each read as the "read" stage, with the bytes it took from disk"""
+
+    def __init__(self, file):
+        self.file = file
+        self.raw = getattr(file, 'buffer', file)
+
+    def read(self, size=-1):
+        before = self.raw.tell()
+        start = time.perf_counter()
+        data = self.file.read(size)
+        METRICS.observe('read', time.perf_counter() - start, size=self.raw.tell() - before)
+        return data
+
+
+def iter_lines(file_path):
+    """Yield the lines of a text file without their line endings, read in chunks"""
+    with open(file_path, 'r', encoding='utf-8-sig') as file:
+        metered = MeteredFile(file)
+        rest = ''
+        while True:
+            chunk = metered.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            lines = (rest + chunk).split('\n')
+            rest = lines.pop()
+            for line in lines:
+                yield line.rstrip('\r')
+        if rest:
+            yield rest.rstrip('\r')
+
+
+def iter_json_items(file_path, key=None):
+    """Yield the items of a JSON array one at a time
+
+    With no key the file must hold a top-level array (the AirTable export);
+    with a key the array is read from that top-level field, e.g. the "tools"
+    list of the Converted files. Uses ijson when it is installed. A leading
+    UTF-8 byte order mark is skipped, as detect_format allows one.
+    """
+    if ijson is not None:
+        with open(file_path, 'rb') as file:
+            if file.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+                file.seek(0)
+            prefix = f"{key}.item" if key else "item"
+            yield from ijson.items(MeteredFile(file), prefix, use_float=True)
+        return
+
+    with open(file_path, 'r', encoding='utf-8-sig') as file:
+        scanner = _Scanner(MeteredFile(file))
+        if key is not None and not scanner.seek_key(key):
+            return
+        yield from scanner.array_items()
+
+
+def iter_blocks(items, size):
+    """Group an iterable into lists of at most size items"""
+    items = iter(items)
+    while True:
+        block = list(islice(items, size))
+        if not block:
+            return
+        yield block
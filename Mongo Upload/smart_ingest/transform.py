@@ -0,0 +1,152 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+# Default admin user ID (you should replace this with a real admin user ID)
+ADMIN_USER_ID = ObjectId("000000000000000000000000")
+DEFAULT_IMAGE = "https://via.placeholder.com/400x225?text=AI+Tool"
+AIRTABLE_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Ensure pricing matches the enum values in the schema
+PRICING_MAP = {
+    "free": "Free",
+    "freemium": "Freemium",
+    "paid": "Paid",
+    "contact for pricing": "Contact for Pricing",
+    "unknown": "Unknown"
+}
+
+# Exports repeat the same createdTime many times, so parsed values are memoized
+_TIME_CACHE_LIMIT = 100000
+_time_cache = {}
+
+
+def parse_airtable_time(value):
+    """Parse an AirTable createdTime such as 2024-01-31T12:00:00Z into a naive UTC datetime"""
+    parsed = _time_cache.get(value)
+    if parsed is not None:
+        return parsed
+    try:
+        # fromisoformat is much faster than strptime for the plain "...Z" form
+        if len(value) != 20 or value[10] != 'T' or value[-1] != 'Z':
+            raise ValueError(value)
+        parsed = datetime.fromisoformat(value[:-1])
+    except ValueError:
+        parsed = datetime.strptime(value, AIRTABLE_TIME_FORMAT)
+    if len(_time_cache) >= _TIME_CACHE_LIMIT:
+        _time_cache.clear()
+    _time_cache[value] = parsed
+    return parsed
+
+
+def transform_airtable_record(tool, now=None):
+    """Transform one AirTable record to match our MongoDB schema"""
+    fields = tool["fields"]
+    if now is None:
+        now = datetime.utcnow()
+
+    # Split Category once: the first entry is the category, all of them are tags
+    raw_category = fields.get("Category")
+    if raw_category is None:
+        category = "Other"
+        tags = []
+    else:
+        parts = raw_category.split(",")
+        category = parts[0].strip()
+        tags = [tag for tag in (part.strip() for part in parts) if tag]
+
+    created_time = tool.get("createdTime")
+
+    return {
+        "name": fields.get("Title", ""),
+        "description": fields.get("Subtitle", ""),
+        "website": fields.get("Call To Action URL", ""),
+        "image": fields.get("Gallery", DEFAULT_IMAGE),
+        "category": category,
+        "pricing": PRICING_MAP.get(fields.get("Price", "Unknown").lower(), "Unknown"),
+        "features": [],  # No direct mapping from AirTable data
+        "tags": tags,
+        "submittedBy": ADMIN_USER_ID,
+        "status": "approved",  # Since these are imported tools, mark them as approved
+        "rating": {
+            "average": 0,
+            "count": 0
+        },
+        "createdAt": parse_airtable_time(created_time) if created_time else now,
+        "updatedAt": now
+    }
+
+
+def transform_converted_record(tool, now=None):
+    """Transform a Converted {"tools": [...]} entry to ensure it matches our MongoDB schema"""
+    if now is None:
+        now = datetime.utcnow()
+    rating = tool.get("rating", {})
+
+    # Ensure all required fields are present with default values if missing
+    return {
+        "name": tool.get("name", ""),
+        "description": tool.get("description", ""),
+        "website": tool.get("website", ""),
+        "image": tool.get("image", DEFAULT_IMAGE),
+        "category": tool.get("category", "Other"),
+        "pricing": PRICING_MAP.get(tool.get("pricing", "").lower(), "Unknown"),
+        "features": tool.get("features", []),
+        "tags": tool.get("tags", []),
+        "submittedBy": ObjectId(tool["submittedBy"]) if "submittedBy" in tool else ADMIN_USER_ID,
+        "status": "approved",  # Set all tools to approved status
+        "rating": {
+            "average": rating.get("average", 0),
+            "count": rating.get("count", 0)
+        },
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+
+def transform_markdown_record(tool, now=None):
+    """Transform a tool read from a markdown list (see markdown.py) to match our MongoDB schema"""
+    if now is None:
+        now = datetime.utcnow()
+    categories = tool["categories"]
+    return {
+        "name": tool["name"],
+        "description": tool["description"],
+        "website": tool["url"],
+        "image": DEFAULT_IMAGE,
+        "category": categories[0] if categories else "Other",
+        "pricing": tool["pricing"],
+        "features": [],
+        "tags": categories + [tag for tag in tool["tags"] if tag not in categories],
+        "submittedBy": ADMIN_USER_ID,
+        "status": "approved",
+        "rating": {
+            "average": 0,
+            "count": 0
+        },
+        "sourceId": tool["id"],  # parseTools.js's id, stable across runs
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+
+
+def transform_block(records, transform_record, now=None, on_error=None, first=1):
+    """Transform a block of records sharing one updatedAt, returning (position, tool) pairs
+
+    Positions count from first. A record that fails to transform is left out and passed to
+    on_error(record, error), or the error is raised if there is no on_error.
+    """
+    if now is None:
+        now = datetime.utcnow()
+    transformed = []
+    for position, record in enumerate(records, first):
+        try:
+            tool = transform_record(record, now)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(record, e)
+            continue
+        transformed.append((position, tool))
+    return transformed
@@ -0,0 +1,28 @@
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# The package and the benchmarks' synthetic data, as the benchmark scripts import them
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+
+@pytest.fixture
+def http_server():
+    """Start a local server for a BaseHTTPRequestHandler class, returning its base URL"""
+    servers = []
+
+    def serve(handler):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,112 @@
+"""The asyncio upload path (--concurrency) against the serial one, on mongomock
+
+ThreadedCollection runs the synchronous collection's calls on threads, so
+AsyncBulkWriter is exercised without a mongod; both paths must store the
+same tools and count the same duplicates.
+"""
+from itertools import islice
+
+import mongomock
+import pytest
+
+from smart_ingest.aio import ThreadedCollection
+from smart_ingest.manifest import Manifest
+from smart_ingest.pipeline import upload
+from smart_ingest.sources import expand_sources
+from synthetic import iter_converted_tools, write_converted_file
+
+RECORDS = 400
+FILES = 2
+
+
+@pytest.fixture
+def converted_files(tmp_path):
+    """Converted files with duplicates within and across them"""
+    tools = iter_converted_tools(RECORDS, seed=7, duplicate_ratio=0.25)
+    paths = []
+    for number in range(FILES):
+        path = tmp_path / f"tools{number}.json"
+        write_converted_file(path, islice(tools, RECORDS // FILES))
+        paths.append(path)
+    return paths
+
+
+def run_upload(collection, paths, work_dir, concurrency=None, **options):
+    return upload(collection, expand_sources([str(path) for path in paths]), confirm=True, batch_size=50,
+                  concurrency=concurrency,
+                  async_collection=ThreadedCollection(collection) if concurrency else None,
+                  manifest_path=work_dir / 'manifest.json', signatures_path=work_dir / 'signatures.json.gz',
+                  plan_path=work_dir / 'plan.json.gz', near_duplicates=False, **options)
+
+
+def stored(collection):
+    return sorted((tool["name"], tool["website"]) for tool in collection.find({}, {"_id": 0, "name": 1, "website": 1}))
+
+
+def counts(stats):
+    return {key: stats[key] for key in ('total_processed', 'total_new', 'total_skipped', 'total_failed')}
+
+
+@pytest.fixture
+def work_dirs(tmp_path, monkeypatch):
+    # Backups and any other relative paths stay in the test's directory
+    monkeypatch.chdir(tmp_path)
+    dirs = {}
+    for name in ('serial', 'async'):
+        dirs[name] = tmp_path / name
+        dirs[name].mkdir()
+    return dirs
+
+
+def test_async_upload_dedups_like_serial(converted_files, work_dirs):
+    client = mongomock.MongoClient()
+    serial = client.db.serial
+    concurrent = client.db.concurrent
+
+    serial_stats = run_upload(serial, converted_files, work_dirs['serial'], resume=False)
+    async_stats = run_upload(concurrent, converted_files, work_dirs['async'], concurrency=4, resume=False)
+
+    assert serial_stats['total_skipped'] > 0
+    assert counts(async_stats) == counts(serial_stats)
+    assert stored(concurrent) == stored(serial)
+    assert concurrent.count_documents({}) == serial_stats['total_new']
+
+
+def test_async_upload_skips_stored_tools(converted_files, work_dirs):
+    client = mongomock.MongoClient()
+    collection = client.db.tools
+    first = run_upload(collection, converted_files, work_dirs['serial'], resume=False)
+
+    again = run_upload(collection, converted_files, work_dirs['async'], concurrency=4, resume=False)
+
+    assert again['total_processed'] == RECORDS
+    assert again['total_new'] == 0
+    assert again['total_skipped'] == RECORDS
+    assert collection.count_documents({}) == first['total_new']
+
+
+def checkpoint(manifest_path, path, offset):
+    """Leave a manifest as an upload interrupted after offset items of path would"""
+    manifest = Manifest.load(manifest_path)
+    manifest.file_state(path)
+    manifest.checkpoint(path, offset)
+    manifest.save()
+
+
+def test_async_upload_resumes_like_serial(converted_files, work_dirs):
+    client = mongomock.MongoClient()
+    serial = client.db.serial
+    concurrent = client.db.concurrent
+    offset = 120
+    for work_dir in work_dirs.values():
+        checkpoint(work_dir / 'manifest.json', converted_files[0], offset)
+
+    serial_stats = run_upload(serial, converted_files, work_dirs['serial'])
+    async_stats = run_upload(concurrent, converted_files, work_dirs['async'], concurrency=4)
+
+    assert serial_stats['total_processed'] == RECORDS - offset
+    assert counts(async_stats) == counts(serial_stats)
+    assert stored(concurrent) == stored(serial)
+    for work_dir in work_dirs.values():
+        manifest = Manifest.load(work_dir / 'manifest.json')
+        assert all(manifest.resume_offset(path) is None for path in converted_files)
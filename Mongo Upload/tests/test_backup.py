@@ -0,0 +1,100 @@
+"""Incremental backups and restores, on mongomock"""
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from pymongo.errors import OperationFailure
+
+from smart_ingest import backup
+from smart_ingest.backup import backup_incremental, list_backups, restore_backup
+
+
+def tool(number, updated):
+    return {"name": f"Tool {number}", "updatedAt": updated}
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().db.tools
+
+
+@pytest.fixture
+def merge_stage(monkeypatch):
+    """mongomock has no $merge; apply the whenMatched replace / whenNotMatched insert that restores use"""
+    aggregate = mongomock.Collection.aggregate
+
+    def aggregate_with_merge(self, pipeline, *args, **kwargs):
+        if not pipeline or "$merge" not in pipeline[-1]:
+            return aggregate(self, pipeline, *args, **kwargs)
+        target = self.database[pipeline[-1]["$merge"]["into"]]
+        for document in aggregate(self, pipeline[:-1] or [{"$match": {}}], *args, **kwargs):
+            target.replace_one({"_id": document["_id"]}, document, upsert=True)
+        return iter(())
+
+    monkeypatch.setattr(mongomock.Collection, "aggregate", aggregate_with_merge)
+
+
+def backdate(collection, seconds):
+    """Move the catalog back in time, as if the backups were taken seconds ago"""
+    catalog = collection.database["tools_backups"]
+    for entry in catalog.find():
+        catalog.update_one({"_id": entry["_id"]}, {"$set": {"createdAt": entry["createdAt"] - timedelta(seconds=seconds)}})
+
+
+def test_restore_applies_the_deltas_in_order(collection, merge_stage):
+    old = datetime.utcnow() - timedelta(days=1)
+    collection.insert_many([tool(number, old) for number in range(3)])
+    assert backup_incremental(collection, "tools")[1] == 'base'
+    backdate(collection, 60)
+    first = list_backups(collection, "tools")[0]["createdAt"]
+
+    collection.update_one({"name": "Tool 1"}, {"$set": {"description": "Edited", "updatedAt": datetime.utcnow()}})
+    collection.insert_one(tool(3, datetime.utcnow()))
+    name, kind, count, _ = backup_incremental(collection, "tools")
+    assert (kind, count) == ('delta', 2)
+
+    chain = restore_backup(collection, "tools", "restored")
+    assert chain == [entry["_id"] for entry in list_backups(collection, "tools")]
+    restored = {document["name"]: document for document in collection.database.restored.find()}
+    assert sorted(restored) == ["Tool 0", "Tool 1", "Tool 2", "Tool 3"]
+    assert restored["Tool 1"]["description"] == "Edited"
+
+    chain = restore_backup(collection, "tools", "as_before", at=first)
+    assert len(chain) == 1
+    assert collection.database.as_before.count_documents({}) == 3
+    assert "description" not in collection.database.as_before.find_one({"name": "Tool 1"})
+
+
+def test_backups_in_the_same_millisecond_get_distinct_names(collection, monkeypatch):
+    collection.insert_many([tool(number, datetime.utcnow()) for number in range(3)])
+    now = datetime(2024, 1, 31, 12, 0, 0, 123456)
+    monkeypatch.setattr(backup, "datetime", type("FrozenDatetime", (datetime,), {"now": classmethod(lambda cls: now)}))
+
+    first = backup_incremental(collection, "tools", max_deltas=0)[0]
+    second = backup_incremental(collection, "tools", max_deltas=0)[0]
+
+    assert first == "tools_backup_20240131_120000_123"
+    assert second == "tools_backup_20240131_120000_123_2"
+    assert collection.database[first].count_documents({}) == collection.database[second].count_documents({}) == 3
+
+
+def test_refused_out_falls_back_to_streaming(collection, monkeypatch):
+    collection.insert_many([tool(number, datetime.utcnow()) for number in range(5)])
+    streamed = []
+
+    def refuse_out(*args, **kwargs):
+        raise OperationFailure("$out is not allowed")
+
+    def stream(source, name, match=None):
+        # mongomock can't return raw BSON, so the copy itself is left to the real server
+        streamed.append((name, match))
+        return source.count_documents(match or {}), 0
+
+    monkeypatch.setattr(backup, "backup_server", refuse_out)
+    monkeypatch.setattr(backup, "backup_stream", stream)
+
+    name, kind, count, _ = backup_incremental(collection, "tools")
+
+    assert (kind, count) == ('base', 5)
+    assert streamed == [(name, None)]
+    assert [entry["_id"] for entry in list_backups(collection, "tools")] == [name]
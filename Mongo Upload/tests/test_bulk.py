@@ -0,0 +1,263 @@
+"""BulkWriter stats and commit order on mongomock, and its retries against a scripted stub collection"""
+import threading
+
+import mongomock
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError, OperationFailure
+
+from smart_ingest import bulk
+from smart_ingest.bulk import DUPLICATE_KEY_ERROR, BatchSizer, BulkWriter, WritePool, new_stats
+from smart_ingest.dedup import DedupIndex
+
+
+def tool(name, website=None):
+    return {"name": name, "website": website or f"https://{name}.example.com"}
+
+
+@pytest.fixture
+def collection():
+    collection = mongomock.MongoClient().db.tools
+    collection.create_index("name", unique=True)
+    collection.insert_one(tool("stored"))
+    return collection
+
+
+def counts(stats):
+    return {key: stats[key] for key in ('processed', 'new', 'skipped', 'failed', 'write_failed')}
+
+
+@pytest.mark.parametrize("insert", [False, True])
+def test_stats_for_new_and_stored_tools(collection, insert):
+    stats = new_stats()
+    writer = BulkWriter(collection, stats, batch_size=2, insert=insert)
+    for name in ("a", "stored", "b"):
+        writer.add(tool(name))
+    writer.close()
+
+    assert counts(stats) == {'processed': 3, 'new': 2, 'skipped': 1, 'failed': 0, 'write_failed': 0}
+    assert collection.count_documents({}) == 3
+
+
+@pytest.mark.parametrize("insert", [False, True])
+def test_a_batch_that_fails_counts_every_tool_as_failed(collection, insert):
+    stats = new_stats()
+    index = DedupIndex()
+    writer = BulkWriter(collection, stats, batch_size=2, insert=insert, index=index)
+    writer.add(tool("a"))
+    writer.add(dict(tool("b"), **{"$bad": 1}))  # Rejected by the driver before it is sent
+    writer.add(tool("c"))
+    writer.close()
+
+    assert counts(stats) == {'processed': 1, 'new': 1, 'skipped': 0, 'failed': 2, 'write_failed': 2}
+    # Failed tools leave the dedup index, so a rerun tries them again
+    assert not index.contains(tool("a")) and not index.contains(tool("b"))
+    assert index.contains(tool("c"))
+
+
+def test_insert_folds_a_partial_bulk_write_error(collection):
+    stats = new_stats()
+    written = []
+    writer = BulkWriter(collection, stats, batch_size=10, insert=True, on_written=written.extend)
+    for name in ("a", "stored", "b", "a"):
+        writer.add(tool(name))
+    writer.close()
+
+    # The unique index rejects both copies; the other inserts still went through
+    assert counts(stats) == {'processed': 4, 'new': 2, 'skipped': 2, 'failed': 0, 'write_failed': 0}
+    assert [written_tool["name"] for written_tool in written] == ["a", "b"]
+    assert sorted(collection.distinct("name")) == ["a", "b", "stored"]
+
+
+def test_commits_follow_positions_including_skipped_and_duplicate_tools(collection):
+    stats = new_stats()
+    commits = []
+    index = DedupIndex()
+    index.add(tool("known"))
+    writer = BulkWriter(collection, stats, batch_size=2, insert=True, index=index, on_commit=commits.append)
+    writer.add(tool("a"), 1)
+    writer.add(tool("known"), 2)  # Skipped by the index, never queued
+    writer.add(tool("stored"), 3)  # Fills the batch, where it is a duplicate key
+    writer.add(tool("known"), 4)
+    writer.flush()  # Nothing queued: commits at once
+    writer.add(tool("b"), 5)
+    writer.close()
+
+    assert commits == [3, 4, 5]
+    assert counts(stats) == {'processed': 5, 'new': 2, 'skipped': 3, 'failed': 0, 'write_failed': 0}
+
+
+class HeldCollection:
+    """A collection whose first bulk_write waits until released, so later batches finish first"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.release = threading.Event()
+        self.calls = 0
+        self.finished = []
+        self._lock = threading.Lock()
+
+    def bulk_write(self, operations, ordered=True):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            assert self.release.wait(5)
+        try:
+            return self.collection.bulk_write(operations, ordered=ordered)
+        finally:
+            with self._lock:
+                self.finished.append(first)
+
+
+def test_commits_wait_for_earlier_batches_in_flight(collection):
+    held = HeldCollection(collection)
+    commits = []
+    pool = WritePool(workers=3)
+    writer = BulkWriter(held, new_stats(), batch_size=2, insert=True, pool=pool, on_commit=commits.append)
+    try:
+        for position, name in enumerate(["a", "b", "c", "stored", "d", "e"], 1):
+            writer.add(tool(name), position)
+        for _ in range(500):
+            if len(held.finished) == 2:
+                break
+            threading.Event().wait(0.01)
+        # The second and third batches are written, but the first isn't
+        assert held.finished == [False, False]
+        assert commits == []
+        held.release.set()
+        writer.close()
+    finally:
+        held.release.set()
+        pool.shutdown()
+
+    assert commits == [6]
+    assert sorted(collection.distinct("name")) == ["a", "b", "c", "d", "e", "stored"]
+
+
+class Result:
+    def __init__(self, inserted_count=0, upserted_ids=None):
+        self.inserted_count = inserted_count
+        self.upserted_ids = upserted_ids or {}
+        self.upserted_count = len(self.upserted_ids)
+
+
+class ScriptedCollection:
+    """A stub collection whose bulk_writes return or raise the given outcomes in turn"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.calls.append(len(operations))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def write_error(index, code):
+    return {'index': index, 'code': code, 'errmsg': f"error {code}"}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(bulk, "retry_delay", lambda attempt: 0)
+
+
+def write(collection, names, **options):
+    stats = new_stats()
+    writer = BulkWriter(collection, stats, batch_size=len(names), **options)
+    for name in names:
+        writer.add(tool(name))
+    writer.close()
+    return counts(stats)
+
+
+def test_auto_reconnect_sends_the_batch_again():
+    collection = ScriptedCollection(AutoReconnect("primary stepped down"), Result(upserted_ids={0: 1, 1: 2}))
+
+    assert write(collection, ["a", "b"]) == {'processed': 2, 'new': 2, 'skipped': 0, 'failed': 0, 'write_failed': 0}
+    assert collection.calls == [2, 2]
+
+
+def test_only_transient_write_errors_are_retried():
+    collection = ScriptedCollection(
+        BulkWriteError({'nUpserted': 1, 'upserted': [{'index': 0, '_id': 1}],
+                        'writeErrors': [write_error(1, 91), write_error(2, 121)]}),
+        Result(upserted_ids={0: 2})
+    )
+
+    assert write(collection, ["a", "b", "c"]) == {'processed': 2, 'new': 2, 'skipped': 0, 'failed': 1,
+                                                  'write_failed': 1}
+    assert collection.calls == [3, 1]
+
+
+def test_a_write_concern_error_resends_the_applied_upserts():
+    collection = ScriptedCollection(
+        BulkWriteError({'nUpserted': 2, 'upserted': [{'index': 0, '_id': 1}, {'index': 1, '_id': 2}],
+                        'writeErrors': [], 'writeConcernErrors': [{'code': 64, 'errmsg': "waiting for replication"}]}),
+        Result()  # Both upserts now find their tools
+    )
+
+    assert write(collection, ["a", "b"]) == {'processed': 2, 'new': 2, 'skipped': 0, 'failed': 0, 'write_failed': 0}
+    assert collection.calls == [2, 2]
+
+
+def test_a_second_insert_copy_counts_as_skipped():
+    collection = ScriptedCollection(
+        BulkWriteError({'nInserted': 2, 'writeErrors': [],
+                        'writeConcernErrors': [{'code': 64, 'errmsg': "waiting for replication"}]}),
+        # The resent inserts keep their _ids, so the copies already applied are duplicate keys
+        BulkWriteError({'nInserted': 0, 'writeErrors': [write_error(0, DUPLICATE_KEY_ERROR),
+                                                        write_error(1, DUPLICATE_KEY_ERROR)]})
+    )
+
+    assert write(collection, ["a", "b"], insert=True) == {'processed': 2, 'new': 2, 'skipped': 0, 'failed': 0,
+                                                          'write_failed': 0}
+    collection = ScriptedCollection(
+        BulkWriteError({'nInserted': 1, 'writeErrors': [write_error(1, DUPLICATE_KEY_ERROR)]})
+    )
+
+    assert write(collection, ["a", "a"], insert=True) == {'processed': 2, 'new': 1, 'skipped': 1, 'failed': 0,
+                                                          'write_failed': 0}
+
+
+def test_retries_stop_at_the_limit():
+    collection = ScriptedCollection(*[AutoReconnect("no primary")] * 3)
+
+    assert write(collection, ["a", "b"], retries=2) == {'processed': 0, 'new': 0, 'skipped': 0, 'failed': 2,
+                                                        'write_failed': 2}
+    assert collection.calls == [2, 2, 2]
+
+
+def test_a_permanent_error_is_not_retried():
+    collection = ScriptedCollection(OperationFailure("not authorized", code=13))
+
+    assert write(collection, ["a"])['failed'] == 1
+    assert collection.calls == [1]
+
+
+def test_batch_sizer_follows_latency_within_its_bounds():
+    sizer = BatchSizer(initial=100, target_seconds=1.0, minimum=50, maximum=140)
+    sizer.observe(100, 0.1)
+    assert sizer.size == 126
+    sizer.observe(126, 0.1)
+    assert sizer.size == 140  # Capped at the maximum
+    sizer.observe(140, 0.7)
+    assert sizer.size == 140  # Between half and the whole target: unchanged
+    sizer.observe(10, 5.0)
+    assert sizer.size == 140  # A short final batch says little
+    sizer.observe(140, 2.0)
+    assert sizer.size == 70
+    sizer.shrink()
+    assert sizer.size == 50  # Not below the minimum
+    sizer.shrink()
+    assert sizer.size == 50
+
+
+def test_batch_sizer_keeps_batches_under_the_command_size():
+    sizer = BatchSizer(initial=1000, minimum=1)
+    sizer.observe(1000, 0.01, sample={"description": "x" * (1024 * 1024)})
+    # About 1MB per tool: at most 15 fit into 16MB
+    assert sizer.size == 15
@@ -0,0 +1,127 @@
+"""The parse cache must give the same blocks as parsing the file, and fall back to parsing when it is damaged"""
+from datetime import datetime
+
+import pytest
+
+from smart_ingest import cache, sources
+from smart_ingest.cache import HEADER, ParseCache
+from smart_ingest.sources import AIRTABLE, CONVERTED, SourceFile
+from synthetic import airtable_records, converted_tools, write_airtable_file, write_converted_file
+
+RECORDS = 40
+BLOCK_SIZE = 6
+FIRST_RUN = datetime(2024, 1, 1, 12, 0, 0)
+LATER_RUN = datetime(2024, 6, 1, 8, 30, 0)
+
+
+class Clock:
+    """Stands in for datetime in the readers, so both paths stamp the same updatedAt"""
+
+    now = FIRST_RUN
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    Clock.now = FIRST_RUN
+    monkeypatch.setattr(sources, "datetime", Clock)
+    monkeypatch.setattr(cache, "datetime", Clock)
+    return Clock
+
+
+@pytest.fixture(params=[AIRTABLE, CONVERTED], ids=lambda source_format: source_format.name)
+def source_path(request, tmp_path):
+    """A file whose 4th and 17th records fail to transform"""
+    if request.param is AIRTABLE:
+        items = airtable_records(RECORDS, seed=3)
+        write = write_airtable_file
+    else:
+        items = converted_tools(RECORDS, seed=3)
+        write = write_converted_file
+    items[3] = "not a tool"
+    items[16] = ["nor", "this"]
+    path = tmp_path / f"{request.param.name}.json"
+    write(path, items)
+    return path, request.param
+
+
+def read(source_file, start=0):
+    """Flatten the blocks into positions and tools, with the records that failed"""
+    failed = []
+    ends = []
+    tools = []
+    for end, block in source_file.transformed_blocks(BLOCK_SIZE, start, lambda record, error: failed.append(record)):
+        ends.append(end)
+        tools.extend(block)
+    return ends[-1] if ends else start, tools, failed
+
+
+def test_cached_blocks_match_a_plain_parse(source_path, tmp_path, clock):
+    path, source_format = source_path
+    parse_cache = ParseCache(tmp_path / 'cache')
+    first = read(SourceFile(path, source_format, parse_cache))
+    assert list((tmp_path / 'cache').iterdir())
+
+    clock.now = LATER_RUN
+    cached_file = parse_cache.open(SourceFile(path, source_format))
+    assert cached_file is not None and cached_file.count == RECORDS
+    cached_file.close()
+    for start in (0, 1, 7, RECORDS - 1, RECORDS):
+        cached = read(SourceFile(path, source_format, parse_cache), start)
+        parsed = read(SourceFile(path, source_format), start)
+        assert cached == parsed
+        end, tools, failed = cached
+        assert end == RECORDS
+        assert [position for position, _ in tools] == [
+            position for position in range(start + 1, RECORDS + 1) if position not in (4, 17)
+        ]
+        # Failed records are replayed from the cache and reported again
+        assert failed == [record for position, record in ((4, "not a tool"), (17, ["nor", "this"]))
+                          if position > start]
+
+    # The first run's timestamps were refilled with the later run's
+    assert first[1][0][1]["updatedAt"] == FIRST_RUN
+    _, tools, _ = read(SourceFile(path, source_format, parse_cache))
+    assert all(tool["updatedAt"] == LATER_RUN for _, tool in tools)
+
+
+def damage_truncated(cache_path):
+    data = cache_path.read_bytes()
+    cache_path.write_bytes(data[:len(data) // 2])
+
+
+def damage_header(cache_path):
+    data = cache_path.read_bytes()
+    cache_path.write_bytes(b'NOTCACHE' + data[8:])
+
+
+def damage_empty(cache_path):
+    cache_path.write_bytes(b'')
+
+
+def damage_count(cache_path):
+    data = bytearray(cache_path.read_bytes())
+    magic, version, count, index_offset = HEADER.unpack_from(data, 0)
+    HEADER.pack_into(data, 0, magic, version, count + 1, index_offset)
+    cache_path.write_bytes(bytes(data))
+
+
+@pytest.mark.parametrize("damage", [damage_truncated, damage_header, damage_empty, damage_count])
+def test_a_damaged_cache_falls_back_to_parsing(source_path, tmp_path, damage):
+    path, source_format = source_path
+    parse_cache = ParseCache(tmp_path / 'cache')
+    read(SourceFile(path, source_format, parse_cache))
+    [cache_path] = (tmp_path / 'cache').iterdir()
+    damage(cache_path)
+
+    source_file = SourceFile(path, source_format, parse_cache)
+    assert parse_cache.open(source_file) is None
+    assert source_file.count() == RECORDS
+    assert read(source_file) == read(SourceFile(path, source_format))
+    # The full pass wrote a good entry again
+    cached_file = parse_cache.open(source_file)
+    assert cached_file is not None and cached_file.count == RECORDS
+    cached_file.close()
@@ -0,0 +1,45 @@
+"""category_stats increments and rebuild, on mongomock"""
+import mongomock
+import pytest
+
+from smart_ingest.categories import CategoryStats, normalize_label, rebuild
+
+TOOLS = [
+    {"name": "a", "category": "Image Generation", "tags": ["AI", "ai ", "Art"], "status": "approved"},
+    {"name": "b", "category": "image  generation", "tags": ["A I", "Straße"], "status": "pending"},
+    {"name": "c", "category": " IMAGE GENERATION　", "tags": ["STRASSE", "art"], "status": "approved"},
+    {"name": "d", "tags": [], "status": "approved"},
+    {"name": "e", "category": "Writing", "status": "approved"},
+    {"name": "f", "category": "Writing", "tags": ["Art", None], "status": "approved"}
+]
+
+
+# The keys normalizeLabel in services/categoryStats.js gives
+@pytest.mark.parametrize("label, key", [
+    (" Image  GENERATION ", "image generation"),
+    ("Image　Generation﻿", "image generation"),
+    ("ＡＩ", "ai"),
+    ("Straße", "straße"),
+    ("a\x1cb", "a\x1cb"),
+    (None, "")
+])
+def test_normalize_label_matches_the_server(label, key):
+    assert normalize_label(label) == key
+
+
+def counts(stats_collection):
+    return {document["_id"]: (document["count"], document["approved"]) for document in stats_collection.find()}
+
+
+def test_rebuild_counts_like_the_increments():
+    client = mongomock.MongoClient()
+    rebuilt = client.db.rebuilt
+    rebuilt.insert_many([dict(tool) for tool in TOOLS])
+    CategoryStats(client.db.incremental_stats).record(TOOLS)
+
+    rebuild(rebuilt, client.db.rebuilt_stats, workers=2)
+
+    assert counts(client.db.rebuilt_stats) == counts(client.db.incremental_stats) == {
+        "category:image generation": (3, 2), "category:other": (1, 1), "category:writing": (2, 2),
+        "tag:ai": (1, 1), "tag:a i": (1, 0), "tag:art": (3, 3), "tag:straße": (1, 0), "tag:strasse": (1, 1), "total": (6, 5)
+    }
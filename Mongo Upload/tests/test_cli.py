@@ -0,0 +1,31 @@
+"""The smart_ingest command line"""
+import json
+
+import pytest
+
+from smart_ingest import cli
+from smart_ingest.plan import KeySnapshot
+
+
+def refuse_connection():
+    raise AssertionError("connected to MongoDB")
+
+
+def test_offline_plan_runs_without_mongodb(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cli, "connect", refuse_connection)
+    KeySnapshot().save()
+    source = tmp_path / "tools.json"
+    source.write_text(json.dumps({"tools": [{"name": "Alpha", "website": "https://alpha.example.com"}]}))
+
+    assert cli.main(["upload", "--plan", "--offline", "--no-cache", str(source)]) == 0
+    assert json.loads((tmp_path / ".ingest_plan.json").read_text())["totals"]["inserts"] == 1
+
+
+@pytest.mark.parametrize("argv", [["upload", "--plan"], ["backup", "list"]])
+def test_other_commands_connect(tmp_path, monkeypatch, capsys, argv):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cli, "connect", refuse_connection)
+
+    assert cli.main(argv) == 1
+    assert "connected to MongoDB" in capsys.readouterr().out
@@ -0,0 +1,23 @@
+"""Dedup keys"""
+import pytest
+
+from smart_ingest.dedup import DedupIndex, canonical_url
+
+
+@pytest.mark.parametrize("url, key", [
+    ("https://x.ai/", "x.ai"),
+    ("http://www.X.AI:80/?utm_source=feed#top", "x.ai"),
+    ("HTTPS://GitHub.com/Owner/Repo/", "github.com/Owner/Repo"),
+    ("example.com/path?b=2&a=1", "example.com/path?a=1&b=2"),
+    ("", "")
+])
+def test_canonical_url(url, key):
+    assert canonical_url(url) == key
+
+
+def test_paths_differing_in_case_are_different_tools():
+    index = DedupIndex()
+    index.add({"name": "Repo", "website": "https://github.com/Owner/Repo"})
+
+    assert index.contains({"name": "Other repo", "website": "https://GITHUB.com/Owner/Repo"})
+    assert not index.contains({"name": "Other repo", "website": "https://github.com/owner/repo"})
@@ -0,0 +1,79 @@
+"""Exports of a mongomock collection, read back"""
+import gzip
+import json
+import random
+from datetime import datetime
+
+import mongomock
+import pytest
+from bson import ObjectId, json_util
+
+from smart_ingest import ranges
+from smart_ingest.export import export_tools
+
+TOOLS = 50
+WORKERS = 3
+
+
+@pytest.fixture
+def collection():
+    # Inserted out of _id order, so the export must sort rather than follow insertion
+    ids = sorted(ObjectId() for _ in range(TOOLS))
+    order = list(range(TOOLS))
+    random.Random(5).shuffle(order)
+    collection = mongomock.MongoClient().db.tools
+    collection.insert_many([
+        {"_id": ids[i], "name": f"Tool {i}", "website": f"https://tool{i}.example.com/", "category": "Writing",
+         "submittedBy": ObjectId(), "rating": {"average": 4.5, "count": i},
+         "createdAt": datetime(2024, 1, 2, 3, 4, 5, 678000), "scrapedData": {"features": ["Fast"]}}
+        for i in order
+    ])
+    return collection
+
+
+@pytest.fixture(params=[1, WORKERS], ids=["one range", "several ranges"])
+def expected_ranges(request, monkeypatch):
+    """Small enough a range size that the 50 tools are split between the workers"""
+    if request.param > 1:
+        monkeypatch.setattr(ranges, "MIN_RANGE_DOCUMENTS", 5)
+    return request.param
+
+
+def test_jsonl_restores_the_documents(collection, tmp_path, expected_ranges):
+    path = tmp_path / "tools.jsonl.gz"
+
+    summary = export_tools(collection, path, workers=WORKERS, batch_size=7)
+
+    # One gzip member per part, read back as a single stream
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        exported = [json_util.loads(line) for line in file]
+    assert summary["ranges"] == expected_ranges
+    assert summary["documents"] == TOOLS
+    assert exported == list(collection.find().sort("_id", 1))
+
+
+@pytest.mark.parametrize("name", ["snapshot.json", "snapshot.json.gz"])
+def test_converted_is_an_uploadable_file(collection, tmp_path, expected_ranges, name):
+    path = tmp_path / name
+
+    summary = export_tools(collection, path, workers=WORKERS, batch_size=7)
+
+    opener = gzip.open if name.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as file:
+        tools = json.load(file)["tools"]
+    assert summary["ranges"] == expected_ranges
+    assert [tool["name"] for tool in tools] == [f"Tool {i}" for i in range(TOOLS)]
+    assert tools[0]["createdAt"] == "2024-01-02 03:04:05"
+    assert "_id" not in tools[0] and "scrapedData" not in tools[0]
+
+
+def test_a_query_is_split_over_its_own_documents(collection, tmp_path, monkeypatch):
+    monkeypatch.setattr(ranges, "MIN_RANGE_DOCUMENTS", 5)
+    path = tmp_path / "some.jsonl"
+    query = {"rating.count": {"$gte": 20}}
+
+    summary = export_tools(collection, path, workers=WORKERS, batch_size=4, query=query)
+
+    exported = [json_util.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert summary["ranges"] == WORKERS
+    assert [tool["name"] for tool in exported] == [f"Tool {i}" for i in range(20, TOOLS)]
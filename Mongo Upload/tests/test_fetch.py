@@ -0,0 +1,92 @@
+"""HttpClient against a local http.server"""
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from smart_ingest.fetch import MAX_REDIRECTS, HttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+    active = 0
+    most_active = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests.append((self.command, self.path))
+            cls.active += 1
+            cls.most_active = max(cls.most_active, cls.active)
+        try:
+            if self.path == '/slow':
+                time.sleep(0.05)
+            if self.path.startswith('/loop'):
+                self.send_response(302)
+                self.send_header('Location', '/loop')
+            elif self.path == '/moved':
+                self.send_response(301)
+                self.send_header('Location', '/page')
+            elif self.path == '/missing':
+                self.send_response(404)
+            else:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=latin-1')
+            self.end_headers()
+            if self.command == 'GET' and self.path == '/page':
+                self.wfile.write('café'.encode('latin-1'))
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    do_GET = reply
+    do_HEAD = reply
+
+
+def make_handler():
+    return type('Handler', (Handler,), {'requests': [], 'active': 0, 'most_active': 0, 'lock': threading.Lock()})
+
+
+def fetch(*requests, **options):
+    async def run():
+        async with HttpClient(**options) as client:
+            return await asyncio.gather(*(client.request(*request) for request in requests))
+    return asyncio.run(run())
+
+
+def test_redirects_are_followed_keeping_the_method(http_server):
+    handler = make_handler()
+    base = http_server(handler)
+
+    head, get = fetch(('HEAD', f"{base}/moved"), ('GET', f"{base}/moved"))
+
+    assert head.status == 200 and head.url == f"{base}/page" and head.body == b''
+    assert head.redirects == [(301, f"{base}/moved")]
+    assert get.text() == 'café'
+    assert ('HEAD', '/page') in handler.requests
+
+
+def test_errors_are_returned_not_raised(http_server):
+    base = http_server(make_handler())
+
+    missing, loop, refused = fetch(('GET', f"{base}/missing"), ('GET', f"{base}/loop"),
+                                   ('GET', "http://127.0.0.1:1/"), timeout=3)
+
+    assert missing.status == 404 and not missing.ok and missing.error is None
+    assert loop.status is None and len(loop.redirects) == MAX_REDIRECTS + 1
+    assert loop.error == f"More than {MAX_REDIRECTS} redirects"
+    assert refused.status is None and refused.error
+
+
+def test_requests_to_a_host_are_limited(http_server):
+    handler = make_handler()
+    base = http_server(handler)
+
+    responses = fetch(*[('GET', f"{base}/slow")] * 12, concurrency=8, per_host=3)
+
+    assert all(response.ok for response in responses)
+    assert 1 < handler.most_active <= 3
@@ -0,0 +1,42 @@
+"""State files are replaced whole and read back as None when damaged"""
+import gzip
+
+import pytest
+
+from smart_ingest.files import atomic_open, read_json, write_atomic
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(tmp_path, compress):
+    path = tmp_path / "state.json"
+    write_atomic(path, '{"files": {"a": 1}}', compress)
+
+    assert read_json(path, compress) == {"files": {"a": 1}}
+    assert [entry.name for entry in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_an_interrupted_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "state.json"
+    write_atomic(path, '{"version": 1}')
+
+    with pytest.raises(RuntimeError):
+        with atomic_open(path) as file:
+            file.write('{"version": ')
+            raise RuntimeError("interrupted")
+
+    assert read_json(path) == {"version": 1}
+    assert [entry.name for entry in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_missing_or_damaged_files_read_as_none(tmp_path):
+    truncated = tmp_path / "truncated.json.gz"
+    truncated.write_bytes(gzip.compress(b'{"tools": {}}')[:12])
+    not_gzip = tmp_path / "plain.json.gz"
+    not_gzip.write_text('{"tools": {}}', encoding='utf-8')
+    not_json = tmp_path / "broken.json"
+    not_json.write_text('{"files": ', encoding='utf-8')
+
+    assert read_json(tmp_path / "missing.json") is None
+    assert read_json(truncated, compress=True) is None
+    assert read_json(not_gzip, compress=True) is None
+    assert read_json(not_json) is None
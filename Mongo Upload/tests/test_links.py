@@ -0,0 +1,129 @@
+"""The link checker against a local http.server, on mongomock"""
+from http.server import BaseHTTPRequestHandler
+
+import mongomock
+import pytest
+
+from smart_ingest.links import LinkCache, check_links, interleave_hosts
+
+SMALL = 1000
+LARGE = 2_000_000
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def empty(self, status, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def reply(self):
+        self.requests.append((self.command, self.path, self.headers.get('Range')))
+        if self.path.startswith('/nohead') and self.command == 'HEAD':
+            return self.empty(405)
+        if self.path == '/gone':
+            return self.empty(404)
+        if self.path == '/old':
+            return self.empty(301, Location='/site')
+        size = LARGE if 'big' in self.path else SMALL
+        content_type = 'image/png' if self.path.endswith('.png') else 'text/html'
+        if self.command == 'GET' and self.headers.get('Range') == 'bytes=0-0':
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes 0-0/{size}')
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', '1')
+            self.end_headers()
+            self.wfile.write(b'x')
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        if self.command == 'GET':
+            self.wfile.write(b'x' * size)
+
+    do_GET = reply
+    do_HEAD = reply
+
+
+@pytest.fixture
+def tools(http_server, tmp_path):
+    handler = type('Handler', (Handler,), {'requests': []})
+    base = http_server(handler)
+    collection = mongomock.MongoClient().db.tools
+    collection.insert_many([
+        {"name": "a", "website": f"{base}/site", "image": f"{base}/a.png"},
+        {"name": "b", "website": f"{base}/old", "image": f"{base}/big.png"},
+        {"name": "c", "website": f"{base}/gone", "image": f"{base}/nohead/c.png"},
+        {"name": "d", "website": f"{base}/nohead/big", "image": f"{base}/page"},
+        {"name": "e", "website": "http://127.0.0.1:1/refused", "image": [{"url": "gallery.png"}]},
+        {"name": "f", "website": f"{base}/site", "image": f"{base}/a.png"}
+    ])
+    return collection, handler.requests, base, tmp_path / 'links.json.gz'
+
+
+def health(collection, name):
+    return collection.find_one({"name": name})["linkHealth"]
+
+
+def test_without_confirm_nothing_is_requested(tools):
+    collection, requests, _, path = tools
+
+    assert check_links(collection, path=path) == {"due": 9}
+    assert requests == []
+
+
+def test_link_states(tools):
+    collection, requests, base, path = tools
+
+    summary = check_links(collection, confirm=True, path=path, timeout=3)
+
+    assert summary["updated"] == 6
+    assert summary["website"] == {"ok": 3, "redirected": 1, "broken": 2}
+    assert summary["image"] == {"ok": 3, "oversized": 1, "not_image": 1, "invalid": 1}
+    assert health(collection, "b")["website"]["url"] == f"{base}/site"
+    assert health(collection, "b")["image"]["bytes"] == LARGE
+    assert health(collection, "c")["website"]["status"] == 404
+    assert health(collection, "e")["website"]["error"]
+    assert health(collection, "e")["image"] == {"state": "invalid"}
+    # HEAD rejected: the size comes from a one byte GET
+    assert ('GET', '/nohead/c.png', 'bytes=0-0') in requests
+    assert health(collection, "c")["image"]["state"] == "ok"
+    # Each distinct URL is checked once however many tools share it
+    assert requests.count(('HEAD', '/a.png', None)) == 1
+
+
+def test_rerun_uses_the_cache_and_writes_only_changes(tools):
+    collection, requests, _, path = tools
+    check_links(collection, confirm=True, path=path, timeout=3)
+    updated_at = {tool["name"]: tool["updatedAt"] for tool in collection.find()}
+    requested = len(requests)
+
+    summary = check_links(collection, confirm=True, path=path)
+
+    assert summary["due"] == 0 and summary["updated"] == 0
+    assert len(requests) == requested
+    assert {tool["name"]: tool["updatedAt"] for tool in collection.find()} == updated_at
+
+
+def test_failures_expire_before_working_links(tools):
+    collection, _, base, path = tools
+    check_links(collection, confirm=True, path=path, timeout=3)
+    cache = LinkCache.load(path)
+    day_later = max(entry['checked'] for entry in cache.entries.values()) + 86400 * 1000 + 1
+
+    assert not cache.is_fresh(f"{base}/gone", now=day_later)
+    assert cache.is_fresh(f"{base}/site", now=day_later)
+
+
+def test_interleave_hosts_alternates():
+    urls = ["http://a.com/1", "http://a.com/2", "http://a.com/3", "http://b.com/1"]
+
+    assert interleave_hosts(urls) == ["http://a.com/1", "http://b.com/1", "http://a.com/2", "http://a.com/3"]
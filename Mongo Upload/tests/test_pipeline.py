@@ -0,0 +1,39 @@
+"""The serial upload path, on mongomock"""
+import mongomock
+
+from smart_ingest.dedup import DedupIndex
+from smart_ingest.pipeline import process_source_file
+from smart_ingest.sources import CONVERTED
+
+
+def tool(number):
+    return {"name": f"Tool {number}", "website": f"https://tool{number}.example.com/", "category": "Writing"}
+
+
+class BrokenSourceFile:
+    """A source file whose second block fails to read"""
+
+    path = "broken.json"
+    format = CONVERTED
+    cache = None
+
+    def __init__(self, tools):
+        self.tools = tools
+
+    def transformed_blocks(self, batch_size, start=0, on_error=None):
+        yield len(self.tools), list(enumerate(self.tools, 1))
+        raise ValueError("Unexpected end of file")
+
+
+def test_tools_queued_before_a_read_error_are_written():
+    collection = mongomock.MongoClient().db.tools
+    index = DedupIndex()
+    stats = {'failed_files': []}
+    # Two repeats keep the block below the batch size, so its tools are still queued when reading fails
+    tools = [tool(number) for number in range(8)] + [tool(0), tool(1)]
+
+    assert not process_source_file(BrokenSourceFile(tools), collection, stats, batch_size=len(tools), index=index)
+
+    stored = {document["name"] for document in collection.find()}
+    assert stored == {f"Tool {number}" for number in range(8)}
+    assert all(index.contains(document) for document in collection.find())
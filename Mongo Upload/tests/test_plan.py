@@ -0,0 +1,68 @@
+"""The --plan key snapshot, on mongomock"""
+import time
+
+import mongomock
+from bson import ObjectId
+
+from smart_ingest.dedup import FULL_SCAN_DAYS
+from smart_ingest.plan import KeySnapshot
+
+
+def tool(name, _id=None):
+    return {"_id": _id or ObjectId(), "name": name, "website": f"https://{name.lower()}.example.com/",
+            "category": "Writing"}
+
+
+def synced(collection, path):
+    snapshot = KeySnapshot(path)
+    snapshot.sync(collection)
+    snapshot.save()
+    return KeySnapshot.load(path)
+
+
+def test_sync_scans_only_new_tools(tmp_path):
+    collection = mongomock.MongoClient().db.tools
+    collection.insert_many([tool("Alpha"), tool("Beta")])
+    snapshot = synced(collection, tmp_path / "snapshot.json.gz")
+
+    collection.insert_one(tool("Gamma"))
+
+    assert snapshot.sync(collection) == 1
+    assert snapshot.index.names == {"alpha", "beta", "gamma"}
+    assert snapshot.categories["Writing"] == 3
+
+
+def test_sync_rescans_when_deletions_are_offset_by_inserts(tmp_path):
+    collection = mongomock.MongoClient().db.tools
+    collection.insert_many([tool("Alpha"), tool("Beta")])
+    snapshot = synced(collection, tmp_path / "snapshot.json.gz")
+
+    collection.delete_one({"name": "Beta"})
+    collection.insert_one(tool("Gamma"))
+
+    assert snapshot.sync(collection) == 2
+    assert snapshot.index.names == {"alpha", "gamma"}
+    assert snapshot.count == 2
+
+
+def test_sync_finds_tools_below_the_newest_id(tmp_path):
+    collection = mongomock.MongoClient().db.tools
+    older = ObjectId()
+    collection.insert_many([tool("Alpha"), tool("Beta")])
+    snapshot = synced(collection, tmp_path / "snapshot.json.gz")
+
+    collection.insert_one(tool("Delta", older))
+
+    assert snapshot.sync(collection) == 3
+    assert "delta" in snapshot.index.names
+
+
+def test_sync_rescans_periodically(tmp_path):
+    collection = mongomock.MongoClient().db.tools
+    collection.insert_many([tool("Alpha"), tool("Beta")])
+    snapshot = synced(collection, tmp_path / "snapshot.json.gz")
+    assert snapshot.sync(collection) == 0
+
+    snapshot.full_scan_at = time.time() - FULL_SCAN_DAYS * 86400
+
+    assert snapshot.sync(collection) == 2
@@ -0,0 +1,48 @@
+"""Loading Bulk Prompts into smartprompts, on mongomock"""
+import json
+
+import mongomock
+import pytest
+
+from smart_ingest.prompts import PROMPT_INDEX_NAME, load_prompts
+
+
+def prompt(title, content="Write about {topic}"):
+    return {"title": title, "content": content, "description": "A prompt", "category": "Marketing",
+            "variables": [{"name": "topic", "description": "The topic"}]}
+
+
+@pytest.fixture
+def database():
+    database = mongomock.MongoClient().db
+    database.users.insert_one({"role": "admin"})
+    return database
+
+
+@pytest.fixture
+def prompt_file(tmp_path):
+    path = tmp_path / "prompts.json"
+    path.write_text(json.dumps({"prompts": [prompt("One"), prompt(" one "), {"prompts": [prompt("Two")]}]}))
+    return path
+
+
+def test_confirm_creates_the_unique_hash_index_first(database, prompt_file):
+    stats = load_prompts(database.smartprompts, database.users, [prompt_file], confirm=True)
+
+    index = database.smartprompts.index_information()[PROMPT_INDEX_NAME]
+    assert index["key"] == [("contentHash", 1)] and index["unique"]
+    assert (stats["new"], stats["skipped"]) == (2, 1)
+
+
+def test_rerun_adds_nothing(database, prompt_file):
+    load_prompts(database.smartprompts, database.users, [prompt_file], confirm=True)
+
+    stats = load_prompts(database.smartprompts, database.users, [prompt_file], confirm=True)
+
+    assert (stats["new"], stats["skipped"]) == (0, 3)
+    assert database.smartprompts.count_documents({}) == 2
+
+
+def test_without_confirm_no_index_is_created(database, prompt_file):
+    assert load_prompts(database.smartprompts, database.users, [prompt_file]) is None
+    assert PROMPT_INDEX_NAME not in database.smartprompts.index_information()
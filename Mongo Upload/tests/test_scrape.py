@@ -0,0 +1,151 @@
+"""The scrapedData refresh against a local http.server, on mongomock"""
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler
+
+import mongomock
+import pytest
+
+from smart_ingest import scrape
+from smart_ingest.scrape import SCRAPE_INDEX_NAME, parse_page, refresh_scraped_data
+
+PAGE = """<html><head><title> Tool  X </title><meta name="description" content="Does X"></head>
+<body><nav><ul><li>Login to your account now</li><li>Home</li></ul></nav>
+<main><p>This is a long paragraph about the tool that is definitely over fifty characters.
+<p>Second paragraph, which is also long enough to be kept by the filter here.
+<section class="features"><ul><li>Generates images from text prompts<li>Upscales to 4K resolution</ul></section>
+<script>var x = "<li>not a feature at all really</li>";</script></main></body></html>"""
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.hits.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/gone':
+            self.send_response(404)
+            self.end_headers()
+        elif self.path == '/moved':
+            self.send_response(301)
+            self.send_header('Location', '/page')
+            self.end_headers()
+        elif self.path == '/pdf':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.end_headers()
+            self.wfile.write(b'%PDF')
+        elif self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            body = PAGE.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+@pytest.fixture
+def tools(http_server):
+    handler = type('Handler', (Handler,), {'hits': []})
+    base = http_server(handler)
+    collection = mongomock.MongoClient().db.tools
+    old = datetime.utcnow() - timedelta(days=60)
+    collection.insert_many([
+        {"name": "page", "website": f"{base}/page"},
+        {"name": "gone", "website": f"{base}/gone"},
+        {"name": "moved", "website": f"{base}/moved"},
+        {"name": "pdf", "website": f"{base}/pdf"},
+        {"name": "old", "website": f"{base}/old", "scrapedData": {"lastScraped": old}},
+        {"name": "fresh", "website": f"{base}/fresh", "scrapedData": {"lastScraped": datetime.utcnow()}},
+        {"name": "no website", "website": ""}
+    ])
+    return collection, handler.hits
+
+
+def scraped(collection, name):
+    return collection.find_one({"name": name})
+
+
+def test_parse_page_reads_like_the_server_scraper():
+    page = parse_page(PAGE)
+
+    assert page["metadata"] == {"title": "Tool X", "metaDescription": "Does X"}
+    # As in websiteScraper.js, an element whose class mentions features is one line, before the list items
+    assert page["features"] == ["Generates images from text prompts Upscales to 4K resolution",
+                                "Generates images from text prompts", "Upscales to 4K resolution"]
+    assert page["extendedDescription"] == (
+        "This is a long paragraph about the tool that is definitely over fifty characters.\n\n"
+        "Second paragraph, which is also long enough to be kept by the filter here.")
+
+
+def test_without_confirm_nothing_is_fetched(tools):
+    collection, hits = tools
+
+    assert refresh_scraped_data(collection) == {"due": 5}
+    assert hits == []
+    assert SCRAPE_INDEX_NAME not in collection.index_information()
+
+
+def test_never_scraped_tools_go_first(tools):
+    collection, hits = tools
+
+    stats = refresh_scraped_data(collection, confirm=True, limit=4, concurrency=1)
+
+    assert stats["queued"] == 4
+    assert "/old" not in [path for path, _ in hits]
+
+
+def test_results_and_failures_are_stored(tools):
+    collection, hits = tools
+
+    stats = refresh_scraped_data(collection, confirm=True)
+
+    assert (stats["queued"], stats["updated"], stats["failed"], stats["written"]) == (5, 3, 2, 5)
+    assert scraped(collection, "moved")["scrapedData"]["features"] == parse_page(PAGE)["features"]
+    assert scraped(collection, "page")["scrapedData"]["etag"] == ETAG
+    assert scraped(collection, "gone")["scrapedData"]["error"] == "HTTP 404"
+    assert scraped(collection, "pdf")["scrapedData"]["error"] == "Not an HTML page (application/pdf)"
+    for name in ("page", "gone", "moved", "pdf", "old"):
+        tool = scraped(collection, name)
+        assert tool["updatedAt"] == tool["scrapedData"]["lastScraped"]
+    assert "/fresh" not in [path for path, _ in hits]
+    assert refresh_scraped_data(collection, confirm=True)["queued"] == 0
+
+
+def test_unchanged_pages_answer_304(tools):
+    collection, hits = tools
+    refresh_scraped_data(collection, confirm=True)
+    features = scraped(collection, "page")["scrapedData"]["features"]
+    collection.update_many({}, {"$set": {"scrapedData.lastScraped": datetime(2020, 1, 1)}})
+
+    stats = refresh_scraped_data(collection, confirm=True)
+
+    # fresh is due now too and scraped for the first time
+    assert (stats["not_modified"], stats["updated"]) == (3, 1)
+    assert ("/page", ETAG) in hits
+    tool = scraped(collection, "page")
+    assert tool["scrapedData"]["features"] == features
+    assert tool["scrapedData"]["lastScraped"] > datetime(2020, 1, 1)
+    assert tool["updatedAt"] == tool["scrapedData"]["lastScraped"]
+
+
+def test_a_tool_that_raises_is_recorded_and_the_run_finishes(tools, monkeypatch):
+    collection, _ = tools
+
+    def broken_parser(html):
+        raise ValueError("Bad markup")
+
+    monkeypatch.setattr(scrape, "parse_page", broken_parser)
+
+    # One slot: every task fails, which must not leave the queue without consumers
+    stats = refresh_scraped_data(collection, confirm=True, concurrency=1)
+
+    assert (stats["queued"], stats["updated"], stats["failed"]) == (5, 0, 5)
+    assert scraped(collection, "page")["scrapedData"]["error"] == "ValueError: Bad markup"
+    assert SCRAPE_INDEX_NAME in collection.index_information()
@@ -0,0 +1,65 @@
+"""NearDuplicateIndex sync against mongomock"""
+import mongomock
+from bson import ObjectId
+
+from smart_ingest.similarity import NearDuplicateIndex
+
+DESCRIPTION = "An assistant that writes marketing copy for {} from a short product brief"
+
+
+def tool(name, _id=None):
+    return {"_id": _id or ObjectId(), "name": name, "description": DESCRIPTION.format(name)}
+
+
+def synced(collection, path):
+    index = NearDuplicateIndex(path)
+    index.sync(collection)
+    index.save()
+    return NearDuplicateIndex.load(path)
+
+
+def test_sync_hashes_only_new_tools(tmp_path):
+    collection = mongomock.MongoClient().db.tools
+    collection.insert_many([tool("Alpha"), tool("Beta")])
+    index = synced(collection, tmp_path / "signatures.json.gz")
+
+    collection.insert_one(tool("Gamma"))
+
+    assert index.sync(collection) == 1
+    assert len(index) == 3
+
+
+def test_sync_forgets_deleted_tools(tmp_path):
+    collection = mongomock.MongoClient().db.tools
+    collection.insert_many([tool("Alpha"), tool("Beta")])
+    index = synced(collection, tmp_path / "signatures.json.gz")
+
+    collection.delete_one({"name": "Beta"})
+
+    assert index.sync(collection) == 1
+    assert list(index.names.values()) == ["Alpha"]
+    assert index.count == 1
+
+
+def test_sync_finds_tools_below_the_newest_id(tmp_path):
+    collection = mongomock.MongoClient().db.tools
+    older = ObjectId()
+    collection.insert_many([tool("Alpha"), tool("Beta")])
+    index = synced(collection, tmp_path / "signatures.json.gz")
+
+    collection.insert_one(tool("Delta", older))
+
+    assert index.sync(collection) == 3
+    assert sorted(index.names.values()) == ["Alpha", "Beta", "Delta"]
+
+
+def test_sync_rescans_when_deletions_are_offset_by_inserts(tmp_path):
+    collection = mongomock.MongoClient().db.tools
+    collection.insert_many([tool("Alpha"), tool("Beta")])
+    index = synced(collection, tmp_path / "signatures.json.gz")
+
+    collection.delete_one({"name": "Beta"})
+    collection.insert_one(tool("Gamma"))
+
+    assert index.sync(collection) == 2
+    assert sorted(index.names.values()) == ["Alpha", "Gamma"]
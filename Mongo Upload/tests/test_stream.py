@@ -0,0 +1,89 @@
+"""_Scanner and iter_json_items, read a few characters at a time so values split across chunks"""
+import io
+import json
+
+import pytest
+
+from smart_ingest import stream
+from smart_ingest.stream import _Scanner, iter_blocks, iter_json_items
+
+ITEMS = [
+    {"name": "Tool \"one\"", "note": "tab\tnewline\nslash\\ é中 \U0001F600"},
+    12345678901234567890,
+    -0.000123e-45,
+    3.25,
+    [],
+    {},
+    "",
+    True,
+    None,
+    "\\u0041 is not an escape here"
+]
+
+
+class SmallReads:
+    """A text file that returns at most size characters per read"""
+
+    def __init__(self, text, size):
+        self.file = io.StringIO(text)
+        self.size = size
+
+    def read(self, size=-1):
+        return self.file.read(self.size)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_values_split_across_chunks(size):
+    text = json.dumps(ITEMS, indent=1)
+    assert list(_Scanner(SmallReads(text, size)).array_items()) == ITEMS
+
+
+@pytest.mark.parametrize("size", [1, 3])
+def test_a_number_at_the_end_of_a_chunk_is_not_cut_short(size):
+    scanner = _Scanner(SmallReads("[1234567, 89]", size))
+    assert list(scanner.array_items()) == [1234567, 89]
+
+
+@pytest.mark.parametrize("text", ["[]", " [ \n ] ", '{"tools": []}'])
+def test_empty_arrays(text):
+    scanner = _Scanner(SmallReads(text, 2))
+    if text.startswith('{'):
+        assert scanner.seek_key("tools")
+    assert list(scanner.array_items()) == []
+
+
+@pytest.mark.parametrize("text", ['{}', '{"meta": {"tools": [1]}, "count": 2}'])
+def test_a_missing_key(text):
+    assert not _Scanner(SmallReads(text, 3)).seek_key("tools")
+
+
+def test_a_key_after_other_fields():
+    text = '{"meta": {"tools": [0], "s": "]}"}, "tools": [{"name": "a"}, {"name": "b"}]}'
+    scanner = _Scanner(SmallReads(text, 4))
+    assert scanner.seek_key("tools")
+    assert list(scanner.array_items()) == [{"name": "a"}, {"name": "b"}]
+
+
+@pytest.mark.parametrize("text", ["[1 2]", "[1,", '{"tools" []}'])
+def test_malformed_input_raises(text):
+    scanner = _Scanner(SmallReads(text, 2))
+    with pytest.raises(ValueError):
+        if text.startswith('{'):
+            scanner.seek_key("tools")
+        list(scanner.array_items())
+
+
+def test_files_with_a_byte_order_mark(tmp_path, monkeypatch):
+    monkeypatch.setattr(stream, "ijson", None)
+    airtable = tmp_path / "airtable.json"
+    airtable.write_bytes(b'\xef\xbb\xbf' + json.dumps(ITEMS).encode('utf-8'))
+    converted = tmp_path / "converted.json"
+    converted.write_bytes(b'\xef\xbb\xbf' + json.dumps({"tools": ITEMS}).encode('utf-8'))
+
+    assert list(iter_json_items(airtable)) == ITEMS
+    assert list(iter_json_items(converted, "tools")) == ITEMS
+
+
+def test_iter_blocks():
+    assert list(iter_blocks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_blocks([], 2)) == []
@@ -1,4 +1,5 @@
 import mongoose from 'mongoose';
+import { categoryStatsPlugin } from '../services/categoryStats.js';
 
 const toolSchema = new mongoose.Schema({
   name: {
@@ -45,6 +46,28 @@ const toolSchema = new mongoose.Schema({
     lastScraped: {
       type: Date,
       default: null
+    },
+    // Validators and last error of the batch refresh ("Mongo Upload/smart_ingest/scrape.py")
+    etag: String,
+    lastModified: String,
+    error: String
+  },
+  // Written by the link checker ("Mongo Upload/smart_ingest/links.py")
+  linkHealth: {
+    website: {
+      state: String,
+      status: Number,
+      url: String,
+      error: String,
+      checkedAt: Date
+    },
+    image: {
+      state: String,
+      status: Number,
+      url: String,
+      bytes: Number,
+      error: String,
+      checkedAt: Date
     }
   },
   features: [{
@@ -94,6 +117,9 @@ toolSchema.index({ status: 1 });
 toolSchema.index({ favoritedBy: 1 });
 toolSchema.index({ favoriteCount: -1 });
 
+// Keep the precomputed category and tag counts in step with tool writes
+toolSchema.plugin(categoryStatsPlugin);
+
 const Tool = mongoose.model('Tool', toolSchema);
 
 export default Tool;
@@ -1,6 +1,7 @@
 import express from 'express';
 import Category from '../models/Category.js';
 import Tool from '../models/Tool.js';
+import { approvedCategoryCounts } from '../services/categoryStats.js';
 
 const router = express.Router();
 
@@ -29,6 +30,12 @@ router.get('/all', async (req, res) => {
       throw new Error('Database connection failed');
     }
 
+    // Precomputed counts when they are current, otherwise group the tools
+    const precomputed = await approvedCategoryCounts(Tool);
+    if (precomputed) {
+      return res.json(precomputed);
+    }
+
     // Get all categories with their counts
     const categoryStats = await Tool.aggregate([
       { $match: { status: 'approved' } },
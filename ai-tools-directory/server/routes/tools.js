@@ -5,6 +5,10 @@ import { scrapeWebsiteData } from '../services/websiteScraper.js';
 
 const router = express.Router();
 
+// The optional unique name_dedup/website_dedup indexes (python -m smart_ingest indexes)
+// reject tools whose name or website differs from a stored one only in case
+const isDuplicateToolError = (error) => error?.code === 11000;
+
 const buildQuery = (queryParams) => {
   const { category, status = 'approved', search } = queryParams;
   const query = { status };
@@ -171,6 +175,9 @@ router.post('/', authenticate, async (req, res) => {
     await tool.save();
     res.status(201).json(tool);
   } catch (error) {
+    if (isDuplicateToolError(error)) {
+      return res.status(409).json({ message: 'A tool with this name or website already exists' });
+    }
     console.error('Submit tool error:', error);
     res.status(500).json({ message: 'Server error', error: error.message });
   }
@@ -214,6 +221,9 @@ router.put('/:id', authenticate, async (req, res) => {
     await tool.save();
     res.json(tool);
   } catch (error) {
+    if (isDuplicateToolError(error)) {
+      return res.status(409).json({ message: 'A tool with this name or website already exists' });
+    }
     console.error('Update tool error:', error);
     res.status(500).json({ message: 'Server error', error: error.message });
   }
@@ -0,0 +1,144 @@
+import mongoose from 'mongoose';
+
+// Precomputed category and tag counts, shared with the Python upload
+// ("Mongo Upload/smart_ingest/categories.py"), which also rebuilds them:
+//   python -m smart_ingest stats rebuild
+// One document per normalized category or tag, plus a "total" document
+// counting every tool. The counts are only trusted while the total matches
+// the tools collection and nothing has marked them stale.
+export const CATEGORY_STATS_COLLECTION = 'category_stats';
+const TOTAL_ID = 'total';
+
+// Same key as normalize_label in the upload's categories.py, which also rebuilds the
+// stats: NFKC, collapsed whitespace, toLowerCase (not Python's casefold)
+export const normalizeLabel = (label) =>
+  String(label ?? '').normalize('NFKC').trim().split(/\s+/).join(' ').toLowerCase();
+
+const statsCollection = () => mongoose.connection.db.collection(CATEGORY_STATS_COLLECTION);
+
+// The stats a tool counts towards: its category and each distinct tag
+const toolLabels = (tool) => {
+  const labels = new Map();
+  const category = tool.category || 'Other';
+  const categoryKey = normalizeLabel(category);
+  if (categoryKey) {
+    labels.set(`category:${categoryKey}`, { kind: 'category', key: categoryKey, name: String(category).trim() });
+  }
+  for (const tag of tool.tags || []) {
+    if (typeof tag !== 'string') continue;
+    const key = normalizeLabel(tag);
+    if (key && !labels.has(`tag:${key}`)) {
+      labels.set(`tag:${key}`, { kind: 'tag', key, name: tag.trim() });
+    }
+  }
+  return labels;
+};
+
+export async function markCategoryStatsStale() {
+  try {
+    await statsCollection().updateOne({ _id: TOTAL_ID }, { $set: { stale: true } }, { upsert: true });
+  } catch (error) {
+    console.error('Error marking category stats stale:', error);
+  }
+}
+
+// $inc the stats by the difference of each [before, after] pair of tool states (null when absent)
+export async function applyToolChanges(changes) {
+  const deltas = new Map();
+  const add = (id, fields, count, approved) => {
+    const delta = deltas.get(id) || { fields, count: 0, approved: 0 };
+    delta.count += count;
+    delta.approved += approved;
+    deltas.set(id, delta);
+  };
+  for (const [before, after] of changes) {
+    for (const [tool, sign] of [[before, -1], [after, 1]]) {
+      if (!tool) continue;
+      const approved = tool.status === 'approved' ? sign : 0;
+      add(TOTAL_ID, { kind: TOTAL_ID }, sign, approved);
+      for (const [id, fields] of toolLabels(tool)) {
+        add(id, fields, sign, approved);
+      }
+    }
+  }
+
+  const updatedAt = new Date();
+  const operations = [...deltas]
+    .filter(([, delta]) => delta.count || delta.approved)
+    .map(([id, delta]) => ({
+      updateOne: {
+        filter: { _id: id },
+        update: {
+          $inc: { count: delta.count, approved: delta.approved },
+          $set: { updatedAt },
+          $setOnInsert: delta.fields
+        },
+        upsert: true
+      }
+    }));
+  if (operations.length === 0) return;
+  try {
+    await statsCollection().bulkWrite(operations, { ordered: false });
+  } catch (error) {
+    console.error('Error updating category stats:', error);
+    await markCategoryStatsStale();
+  }
+}
+
+// [{ category, count }] of approved tools, sorted by category, or null when the stats can't be trusted
+export async function approvedCategoryCounts(Tool) {
+  const stats = statsCollection();
+  const total = await stats.findOne({ _id: TOTAL_ID });
+  if (!total || total.stale || total.count !== await Tool.estimatedDocumentCount()) {
+    return null;
+  }
+  const categories = await stats
+    .find({ kind: 'category', approved: { $gt: 0 } })
+    .sort({ name: 1 })
+    .toArray();
+  return categories.map(({ name, approved }) => ({ category: name, count: approved }));
+}
+
+// Tool model hooks keeping the stats in step with writes made through Mongoose
+export function categoryStatsPlugin(schema) {
+  const snapshot = (tool) => ({ category: tool.category, tags: [...(tool.tags || [])], status: tool.status });
+
+  // Remember what a loaded tool counted towards, so a save can apply the difference
+  schema.post('init', function () {
+    this.$locals.statsBefore = snapshot(this);
+  });
+  schema.pre('save', function () {
+    this.$locals.statsWasNew = this.isNew;
+  });
+  schema.post('save', async function () {
+    await applyToolChanges([[this.$locals.statsWasNew ? null : this.$locals.statsBefore, this]]);
+    this.$locals.statsBefore = snapshot(this);
+  });
+  schema.post('insertMany', async function (tools) {
+    await applyToolChanges(tools.map((tool) => [null, tool]));
+  });
+
+  schema.pre('findOneAndUpdate', async function () {
+    this._statsBefore = await this.model.findOne(this.getFilter()).lean();
+  });
+  schema.post('findOneAndUpdate', async function () {
+    const before = this._statsBefore;
+    if (!before) {
+      // Either nothing matched or an upsert created a tool we didn't see before
+      if (this.getOptions().upsert) await markCategoryStatsStale();
+      return;
+    }
+    const after = await this.model.findById(before._id).lean();
+    await applyToolChanges([[before, after]]);
+  });
+  schema.post('findOneAndDelete', async function (tool) {
+    if (tool) await applyToolChanges([[tool, null]]);
+  });
+  schema.post('deleteOne', { document: true, query: false }, async function () {
+    await applyToolChanges([[this, null]]);
+  });
+
+  // Bulk query writes don't say which tools they changed
+  schema.pre(['updateOne', 'updateMany', 'replaceOne', 'deleteMany'], markCategoryStatsStale);
+  schema.pre('deleteOne', { document: false, query: true }, markCategoryStatsStale);
+}